@@ -0,0 +1,94 @@
+"""
+Load-time benchmark comparing the legacy pickle files with the memory-mappable model artifacts.
+The legacy files are regenerated from the current artifacts into a temporary directory, so both formats hold the same model.
+Run from the backend directory:  python -m benchmarks.bench_model_load
+"""
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import numpy as np
+from logistic_regression import LogisticRegression
+from naive_bayes import NaiveBayes
+from model_store import load_model
+from word_freq_index import WordFreqIndex, vocabulary_file
+import logistic_regression
+import naive_bayes
+
+
+def write_legacy_files(directory):
+    """
+    Write the current artifacts in the legacy pickle layout into the given directory
+    """
+    logistic_regression_params = load_model(logistic_regression.PARAMETERS_FILE)
+    word_freqs = WordFreqIndex.load(vocabulary_file(logistic_regression.PARAMETERS_FILE, logistic_regression_params.metadata)).to_freq_dict()
+    theta = np.array(logistic_regression_params['theta'])
+    naive_bayes_params = load_model(naive_bayes.PARAMETERS_FILE)
+    naive_bayes_index = WordFreqIndex.load(vocabulary_file(naive_bayes.PARAMETERS_FILE, naive_bayes_params.metadata))
+    log_likelihood = {word: np.float64(value) for word, value in zip(naive_bayes_index.words, naive_bayes_params['log_likelihood'].tolist())}
+
+    with open(os.path.join(directory, "word_freqs.json"), "wb") as file:
+        pickle.dump(word_freqs, file)
+    with open(os.path.join(directory, "word_freqs_naive_bayes.json"), "wb") as file:
+        pickle.dump(naive_bayes_index.to_freq_dict(), file)
+    with open(os.path.join(directory, "parameters.json"), "wb") as file:
+        pickle.dump({'theta': theta}, file)
+    with open(os.path.join(directory, "parameters_naive_bayes.json"), "wb") as file:
+        pickle.dump({'log_prior': np.array(naive_bayes_params['log_prior']), 'log_likelihood': log_likelihood}, file)
+
+
+def load_legacy(directory):
+    """
+    Replicate the work done by the legacy load() of both classifiers: unpickle all four files
+    """
+    for name in ("word_freqs.json", "parameters.json", "word_freqs_naive_bayes.json", "parameters_naive_bayes.json"):
+        with open(os.path.join(directory, name), "rb") as file:
+            pickle.load(file)
+
+
+def load_artifacts():
+    for classifier_class in (LogisticRegression, NaiveBayes):
+        classifier_class().load()
+
+
+def load_artifacts_and_predict():
+    for classifier_class in (LogisticRegression, NaiveBayes):
+        classifier = classifier_class()
+        classifier.load()
+        classifier.predict_batch(["warm up"])
+
+
+def time_function(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(repeat=20):
+    """
+    :return: A dictionary with the best load time (in seconds) of each format
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        write_legacy_files(directory)
+        return {
+            'legacy_pickle_load': time_function(lambda: load_legacy(directory), repeat),
+            'artifact_open': time_function(load_artifacts, repeat),
+            'artifact_open_and_first_prediction': time_function(load_artifacts_and_predict, repeat),
+        }
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    results = run()
+    for name, seconds in results.items():
+        print(f"{name:36s} {seconds * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark of the OCR pre-processing stage: for every fixture image and every pre-processing configuration, report the OCR latency, the
+extracted text and the resulting polarity, so that a sound latency / accuracy trade-off can be chosen. Requires the tesseract binary.
+Run from the backend directory:  python -m benchmarks.bench_ocr
+"""
+import os
+import time
+import pytesseract
+from image_scanner import OcrOptions, recognize_text
+from logistic_regression import LogisticRegression
+from benchmarks.fixture_server import FIXTURE_IMAGES_DIRECTORY
+
+CONFIGURATIONS = {
+    'original (no pre-processing, default)': None,
+    'grayscale': OcrOptions(grayscale=True),
+    'grayscale, 2.5 MP budget': OcrOptions(grayscale=True, max_pixels=2500000),
+    'grayscale, 1 MP budget': OcrOptions(grayscale=True, max_pixels=1000000),
+    'grayscale, 150 DPI': OcrOptions(grayscale=True, target_dpi=150),
+    'binarized, 1 MP budget': OcrOptions(max_pixels=1000000, binarize=True),
+    'cropped to text, 1 MP budget': OcrOptions(max_pixels=1000000, crop_to_text=True),
+    'cropped, binarized, psm 6': OcrOptions(max_pixels=1000000, binarize=True, crop_to_text=True, page_segmentation_mode=6),
+}
+
+
+def fixture_images(directory=FIXTURE_IMAGES_DIRECTORY):
+    """
+    :return: A list of pairs (file name, encoded image bytes)
+    """
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(('.png', '.jpg', '.jpeg')):
+            with open(os.path.join(directory, name), 'rb') as file:
+                images.append((name, file.read()))
+    return images
+
+
+def run(images, classifier=None, repeat=3):
+    """
+    :return: A list of dictionaries with the image, configuration, best latency, extracted text and polarity of every run
+    """
+    results = []
+    for name, image_bytes in images:
+        for configuration, options in CONFIGURATIONS.items():
+            best = float('inf')
+            text = ''
+            for _ in range(repeat):
+                start = time.perf_counter()
+                text = recognize_text(image_bytes, options)
+                best = min(best, time.perf_counter() - start)
+            results.append({
+                'image': name,
+                'configuration': configuration,
+                'seconds': best,
+                'text': ' '.join(text.split()),
+                'polarity': classifier.predict_text_polarity(text) if classifier is not None else None,
+            })
+    return results
+
+
+def main():
+    try:
+        pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError:
+        print("The tesseract binary is not installed; the OCR benchmark cannot run.")
+        return
+
+    classifier = LogisticRegression()
+    classifier.load()
+
+    for result in run(fixture_images(), classifier):
+        print(f"{result['image']:22s} {result['configuration']:36s} {result['seconds'] * 1000:8.1f} ms  "
+              f"{result['polarity']:8s}  {result['text'][:60]!r}")
+
+
+if __name__ == '__main__':
+    main()
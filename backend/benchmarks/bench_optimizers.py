@@ -0,0 +1,68 @@
+"""
+Benchmark comparing the original fixed-step gradient descent (alpha = 1e-9, 1500 iterations, unscaled features) with the optimizers working
+on standardized features: wall-clock training time, final cost and training accuracy.
+Run from the backend directory:  python -m benchmarks.bench_optimizers
+"""
+import time
+import numpy as np
+from nltk.corpus import twitter_samples
+from optimizers import GradientDescent, MiniBatchSGD, NewtonSolver, FeatureScaler, cost
+from utils import preprocess_corpus
+from word_freq_index import WordFreqIndex
+
+
+def training_features(texts, labels):
+    """
+    Build the (N, 3) feature matrix used by the logistic regression classifier
+    :return: x: Matrix of features
+             y: Labels, as a column vector
+    """
+    token_lists, word_freqs = preprocess_corpus(texts, labels, workers=1)
+    x = np.ones((len(texts), 3))
+    x[:, 1:] = WordFreqIndex.from_freq_dict(word_freqs).batch_features(token_lists)
+    return x, np.reshape(np.asarray(labels, dtype=np.float64), (-1, 1))
+
+
+def accuracy(x, y, theta):
+    return float(np.mean((np.dot(x, theta) > 0) == (y > 0.5)))
+
+
+def run(x, y):
+    """
+    :return: A dictionary mapping each optimizer name to its training time, iterations, final cost and training accuracy
+    """
+    scaled_x = FeatureScaler().fit(x).transform(x)
+    configurations = [
+        ("legacy gradient descent", GradientDescent(alpha=1e-9, num_iterations=1500), x),
+        ("mini-batch SGD", MiniBatchSGD(), scaled_x),
+        ("newton", NewtonSolver(), scaled_x),
+    ]
+
+    results = {}
+    for name, optimizer, features in configurations:
+        start = time.perf_counter()
+        _, theta, iterations = optimizer.minimize(features, y, np.zeros((3, 1)))
+        seconds = time.perf_counter() - start
+        results[name] = {
+            'seconds': seconds,
+            'iterations': iterations,
+            'cost': cost(features, y, theta),
+            'accuracy': accuracy(features, y, theta),
+        }
+    return results
+
+
+def main():
+    train_x = twitter_samples.strings('positive_tweets.json')[:4000] + twitter_samples.strings('negative_tweets.json')[:4000]
+    train_y = [1] * 4000 + [0] * 4000
+    x, y = training_features(train_x, train_y)
+
+    results = run(x, y)
+    legacy_seconds = results["legacy gradient descent"]['seconds']
+    for name, result in results.items():
+        print(f"{name:24s} {result['seconds'] * 1000:9.2f} ms ({legacy_seconds / result['seconds']:7.1f}x)  "
+              f"iterations = {result['iterations']:5d}  cost = {result['cost']:.6f}  accuracy = {result['accuracy']:.4f}")
+
+
+if __name__ == '__main__':
+    main()
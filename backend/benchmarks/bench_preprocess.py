@@ -0,0 +1,86 @@
+"""
+Micro-benchmark comparing the original per-call preprocess_text implementation with the cached Preprocessor engine.
+Run from the backend directory:  python -m benchmarks.bench_preprocess
+"""
+import re
+import string
+import time
+from nltk.corpus import stopwords
+from nltk.corpus import twitter_samples
+from nltk.stem import PorterStemmer
+from nltk.tokenize import TweetTokenizer
+from utils import Preprocessor
+
+
+def legacy_preprocess_text(text):
+    """
+    Verbatim copy of the original preprocess_text, which rebuilds the tokenizer, stemmer and stopword list on every call
+    """
+    text = re.sub(r'\$\w*', '', text)
+    text = re.sub(r'^RT[\s]+', '', text)
+    text = re.sub(r'https?:\/\/.*[\r\n]*', '', text)
+    text = re.sub(r'#', '', text)
+
+    tokenizer = TweetTokenizer(preserve_case=False, strip_handles=True, reduce_len=True)
+    text_tokens = tokenizer.tokenize(text)
+
+    stopwords_english = stopwords.words('english')
+    stemmer = PorterStemmer()
+
+    text_clean = []
+    for word in text_tokens:
+        if word not in stopwords_english and word not in string.punctuation:
+            text_clean.append(stemmer.stem(word))
+
+    return text_clean
+
+
+def time_function(function, texts, repeat=3):
+    """
+    :return: The best wall-clock time (in seconds) out of `repeat` runs of function over all texts
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            function(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(texts, repeat=3):
+    """
+    Check that both implementations agree token-for-token, then time them over the given texts
+    :return: A dictionary with the throughput (texts per second) of each implementation and the resulting speedup
+    """
+    preprocessor = Preprocessor()
+
+    for text in texts:
+        expected = legacy_preprocess_text(text)
+        actual = preprocessor.preprocess(text)
+        if expected != actual:
+            raise AssertionError(f"Preprocessor output differs for {text!r}: {actual} != {expected}")
+
+    legacy_time = time_function(legacy_preprocess_text, texts, repeat)
+    cached_time = time_function(preprocessor.preprocess, texts, repeat)
+
+    return {
+        'texts': len(texts),
+        'legacy_texts_per_second': len(texts) / legacy_time,
+        'cached_texts_per_second': len(texts) / cached_time,
+        'speedup': legacy_time / cached_time,
+    }
+
+
+def main():
+    texts = twitter_samples.strings('positive_tweets.json') + twitter_samples.strings('negative_tweets.json')
+    results = run(texts)
+
+    print(f"Texts:                  {results['texts']}")
+    print(f"Legacy preprocess_text: {results['legacy_texts_per_second']:.0f} texts/s")
+    print(f"Cached Preprocessor:    {results['cached_texts_per_second']:.0f} texts/s")
+    print(f"Speedup:                {results['speedup']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
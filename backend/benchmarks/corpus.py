@@ -0,0 +1,132 @@
+"""
+Synthetic tweet corpus for running the benchmarks offline, without the NLTK Twitter sample or stopword downloads.
+The generated tweets mimic the features the preprocessing has to deal with (handles, URLs, hashtags, retweet markers, stock tickers,
+emoticons, elongated words and punctuation), and their sentiment words are biased towards their label, so that the trained models
+behave like models trained on real tweets.
+"""
+import random
+from nltk.corpus import stopwords
+from utils import Preprocessor, set_default_preprocessor
+
+# Copy of the NLTK English stopword list, used when the stopwords corpus has not been downloaded
+FALLBACK_STOP_WORDS = (
+    'i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', "you're", "you've", "you'll", "you'd", 'your', 'yours', 'yourself',
+    'yourselves', 'he', 'him', 'his', 'himself', 'she', "she's", 'her', 'hers', 'herself', 'it', "it's", 'its', 'itself', 'they', 'them',
+    'their', 'theirs', 'themselves', 'what', 'which', 'who', 'whom', 'this', 'that', "that'll", 'these', 'those', 'am', 'is', 'are', 'was',
+    'were', 'be', 'been', 'being', 'have', 'has', 'had', 'having', 'do', 'does', 'did', 'doing', 'a', 'an', 'the', 'and', 'but', 'if', 'or',
+    'because', 'as', 'until', 'while', 'of', 'at', 'by', 'for', 'with', 'about', 'against', 'between', 'into', 'through', 'during', 'before',
+    'after', 'above', 'below', 'to', 'from', 'up', 'down', 'in', 'out', 'on', 'off', 'over', 'under', 'again', 'further', 'then', 'once',
+    'here', 'there', 'when', 'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'other', 'some', 'such', 'no', 'nor',
+    'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very', 's', 't', 'can', 'will', 'just', 'don', "don't", 'should', "should've", 'now',
+    'd', 'll', 'm', 'o', 're', 've', 'y', 'ain', 'aren', "aren't", 'couldn', "couldn't", 'didn', "didn't", 'doesn', "doesn't", 'hadn',
+    "hadn't", 'hasn', "hasn't", 'haven', "haven't", 'isn', "isn't", 'ma', 'mightn', "mightn't", 'mustn', "mustn't", 'needn', "needn't", 'shan',
+    "shan't", 'shouldn', "shouldn't", 'wasn', "wasn't", 'weren', "weren't", 'won', "won't", 'wouldn', "wouldn't",
+)
+
+POSITIVE_WORDS = (
+    'love', 'great', 'happy', 'awesome', 'amazing', 'thanks', 'good', 'best', 'beautiful', 'fun', 'excited', 'nice', 'lovely', 'glad',
+    'enjoy', 'perfect', 'wonderful', 'cute', 'welcome', 'friends', 'smile', 'win', 'brilliant', 'congratulations', 'cool', 'yay',
+)
+NEGATIVE_WORDS = (
+    'sad', 'miss', 'sorry', 'bad', 'hate', 'tired', 'sick', 'worst', 'ugh', 'cry', 'hurt', 'lonely', 'fail', 'annoying', 'broken', 'angry',
+    'boring', 'late', 'lost', 'pain', 'scared', 'stupid', 'upset', 'wrong', 'awful', 'disappointed',
+)
+NEUTRAL_WORDS = (
+    'today', 'tomorrow', 'morning', 'night', 'weekend', 'work', 'school', 'home', 'phone', 'game', 'music', 'movie', 'coffee', 'weather',
+    'people', 'time', 'week', 'day', 'follow', 'tweet', 'video', 'photo', 'party', 'bus', 'train', 'dinner', 'lunch', 'book', 'city',
+    'summer', 'birthday', 'team', 'news', 'class', 'friday', 'monday', 'going', 'watching', 'waiting', 'reading', 'playing', 'looking',
+)
+FILLER_WORDS = ('i', 'the', 'a', 'to', 'so', 'and', 'is', 'my', 'it', 'this', 'for', 'with', 'you', 'just', 'at', 'on', 'that', 'be', 'we')
+POSITIVE_EMOTICONS = (':)', ':-)', ':D', ';)', '(:', ':p', '<3')
+NEGATIVE_EMOTICONS = (':(', ':-(', ":'(", 'D:', ':/', '):')
+PUNCTUATION = ('!', '!!', '?', '...', '.', ',', '-', '&')
+
+
+def _elongate(word, rng):
+    # Repeat the last character, as in "sooooo"; the tokenizer shortens such runs to three characters
+    return word + word[-1] * rng.randint(2, 5)
+
+
+def generate_tweet(rng, positive):
+    """
+    :param random.Random rng: The source of randomness
+    :param bool positive: The sentiment of the tweet
+    :return string: One synthetic tweet
+    """
+    sentiment_words, opposite_words = (POSITIVE_WORDS, NEGATIVE_WORDS) if positive else (NEGATIVE_WORDS, POSITIVE_WORDS)
+    emoticons = POSITIVE_EMOTICONS if positive else NEGATIVE_EMOTICONS
+
+    words = []
+    for _ in range(rng.randint(4, 16)):
+        draw = rng.random()
+        if draw < 0.3:
+            word = rng.choice(FILLER_WORDS)
+        elif draw < 0.6:
+            word = rng.choice(NEUTRAL_WORDS)
+        elif draw < 0.9:
+            word = rng.choice(sentiment_words)
+        else:
+            word = rng.choice(opposite_words)
+
+        if rng.random() < 0.05:
+            word = _elongate(word, rng)
+        if rng.random() < 0.1:
+            word = word.capitalize()
+        words.append(word)
+
+        if rng.random() < 0.1:
+            words.append(rng.choice(PUNCTUATION))
+
+    if rng.random() < 0.3:
+        words.insert(0, f"@user{rng.randint(1, 5000)}")
+    if rng.random() < 0.15:
+        words.append(f"#{rng.choice(NEUTRAL_WORDS + sentiment_words)}")
+    if rng.random() < 0.05:
+        words.append(f"${rng.choice(('AAPL', 'GOOG', 'TSLA', 'MSFT'))}")
+    if rng.random() < 0.7:
+        words.append(rng.choice(emoticons))
+
+    tweet = ' '.join(words)
+    if rng.random() < 0.1:
+        tweet = "RT " + tweet
+    if rng.random() < 0.15:
+        tweet += f" https://t.co/{rng.getrandbits(40):010x}"
+    return tweet
+
+
+def generate_corpus(size, seed=0):
+    """
+    Generate a balanced, labelled corpus; the same size and seed always give the same corpus
+    :param int size: The number of tweets; half of them are positive
+    :param int seed: The seed of the random generator
+    :return: texts: A list of tweets, the positive ones first, like the NLTK sample splits
+             labels: A list corresponding to the sentiment of each tweet (0 for negative and 1 for positive)
+    """
+    rng = random.Random(seed)
+    positive_count = size // 2
+    negative_count = size - positive_count
+
+    texts = [generate_tweet(rng, True) for _ in range(positive_count)] + [generate_tweet(rng, False) for _ in range(negative_count)]
+    labels = [1] * positive_count + [0] * negative_count
+    return texts, labels
+
+
+def offline_preprocessor():
+    """
+    :return Preprocessor: A preprocessor using the NLTK stopword list when it is available, and the bundled copy of it otherwise
+    """
+    try:
+        stop_words = stopwords.words('english')
+    except LookupError:
+        stop_words = FALLBACK_STOP_WORDS
+    return Preprocessor(stop_words=stop_words)
+
+
+def use_offline_preprocessor():
+    """
+    Make preprocess_text (and so the classifiers) work without the NLTK stopwords download
+    :return Preprocessor: The installed preprocessor
+    """
+    preprocessor = offline_preprocessor()
+    set_default_preprocessor(preprocessor)
+    return preprocessor
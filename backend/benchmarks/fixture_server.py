@@ -0,0 +1,88 @@
+"""
+Local HTTP stand-in for remote image hosts, serving the fixture images so that the image pipeline can be exercised offline.
+
+    with FixtureServer() as server:
+        ImageScanner(server.url("positive_caption.png")).get_text_from_image()
+
+Besides the files of the fixture directory, the server answers two special paths:
+    /slow/<name>  - serves <name> after sleeping for `delay` seconds (for timeout checks)
+    /large        - streams `large_size` bytes without a Content-Length header (for size limit checks)
+    /trickle      - streams 1 KB every `trickle_interval` seconds, without end (for download deadline checks)
+"""
+import functools
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_IMAGES_DIRECTORY = os.path.join(os.path.dirname(__file__), "fixtures", "images")
+
+
+class _FixtureRequestHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/slow/"):
+            time.sleep(self.server.delay)
+            self.path = self.path[len("/slow"):]
+        elif self.path == "/large":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.end_headers()
+            chunk = b"\0" * 65536
+            for _ in range(self.server.large_size // len(chunk) + 1):
+                try:
+                    self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+            return
+        elif self.path == "/trickle":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.end_headers()
+            while True:
+                time.sleep(self.server.trickle_interval)
+                try:
+                    self.wfile.write(b"\0" * 1024)
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    def __init__(self, directory=FIXTURE_IMAGES_DIRECTORY, delay=2.0, large_size=64 * 1024 * 1024, trickle_interval=0.1):
+        """
+        :param string directory: The directory whose files are served
+        :param delay: Seconds slept before answering a /slow/ request
+        :param int large_size: Number of bytes streamed by /large
+        :param trickle_interval: Seconds between two chunks of /trickle
+        """
+        handler = functools.partial(_FixtureRequestHandler, directory=directory)
+        self.__server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.__server.daemon_threads = True
+        self.__server.delay = delay
+        self.__server.large_size = large_size
+        self.__server.trickle_interval = trickle_interval
+        self.__thread = None
+
+    def url(self, path):
+        host, port = self.__server.server_address
+        return f"http://{host}:{port}/{path.lstrip('/')}"
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,55 @@
+"""
+Generate the fixture images used by the offline image benchmarks.
+Run from the backend directory:  python -m benchmarks.fixtures.make_images
+"""
+import os
+from PIL import Image, ImageDraw, ImageFont
+
+IMAGES_DIRECTORY = os.path.join(os.path.dirname(__file__), "images")
+
+# Each fixture: file name, image size, background colour, text colour, font size, text lines
+FIXTURES = [
+    ("positive_caption.png", (900, 160), "white", "black", 40,
+     ["I love this beautiful day,", "thank you all so much!"]),
+    ("negative_caption.png", (900, 160), "white", "black", 40,
+     ["This is terrible, I am so sad", "and disappointed right now."]),
+    ("screenshot_large.png", (2400, 1600), (236, 240, 245), (30, 30, 30), 44,
+     ["Had the best weekend with my friends, great food and", "amazing weather. So happy and grateful for all of you!",
+      "", "Can't wait to do it again next week. Love you guys!"]),
+    ("photo_large.jpg", (3000, 2000), None, (255, 255, 255), 96,
+     ["Worst service ever.", "Never coming back, so angry!"]),
+]
+
+
+def make_image(size, background, text_colour, font_size, lines):
+    if background is None:
+        # Photo-like background: a colour gradient, with the text in a dark box in the middle
+        width, height = size
+        image = Image.linear_gradient("L").resize(size).convert("RGB")
+        rotated = image.getchannel(0).transpose(Image.Transpose.ROTATE_90).resize(size)
+        image = Image.merge("RGB", (image.getchannel(0), rotated, Image.new("L", size, 120)))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((width // 6, height // 3, width * 5 // 6, height * 2 // 3), fill=(20, 20, 40))
+        origin = (width // 6 + font_size, height // 3 + font_size)
+    else:
+        image = Image.new("RGB", size, background)
+        draw = ImageDraw.Draw(image)
+        origin = (size[0] // 20, size[1] // 10)
+
+    font = ImageFont.load_default(size=font_size)
+    x, y = origin
+    for line in lines:
+        draw.text((x, y), line, fill=text_colour, font=font)
+        y += int(font_size * 1.5)
+    return image
+
+
+def main():
+    os.makedirs(IMAGES_DIRECTORY, exist_ok=True)
+    for name, size, background, text_colour, font_size, lines in FIXTURES:
+        image = make_image(size, background, text_colour, font_size, lines)
+        image.save(os.path.join(IMAGES_DIRECTORY, name), quality=90)
+
+
+if __name__ == '__main__':
+    main()
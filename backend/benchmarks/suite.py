@@ -0,0 +1,342 @@
+"""
+Reproducible benchmark suite of the hot paths: preprocessing, word frequency counting, training, loading and prediction (single and batched)
+of both classifiers, and the OCR of the fixture images. It runs offline on a synthetic tweet corpus, writes machine-readable results and flags
+the benchmarks which got slower than a stored baseline.
+Run from the backend directory:
+
+    python -m benchmarks.suite                              # run everything, compare with benchmarks/baseline.json if it exists
+    python -m benchmarks.suite --quick --only predict       # smaller corpus, fewer repetitions, only the prediction benchmarks
+    python -m benchmarks.suite --output results.json        # also write the results as JSON
+    python -m benchmarks.suite --save-baseline              # store the results as the new baseline
+
+The exit status is 1 when a regression is found, so the suite can gate a CI job. Baselines are only comparable on the same machine.
+"""
+import argparse
+import datetime
+import fnmatch
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import pytesseract
+from image_scanner import ImageScanner
+from logistic_regression import LogisticRegression
+from naive_bayes import NaiveBayes
+from utils import preprocess_text, build_word_freq_dict
+from benchmarks.bench_ocr import fixture_images
+from benchmarks.corpus import generate_corpus, use_offline_preprocessor
+from benchmarks.fixture_server import FixtureServer
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# A benchmark is flagged when its time per operation grows by more than this fraction of the baseline
+DEFAULT_THRESHOLD = 0.25
+
+CLASSIFIERS = {
+    'logistic_regression': LogisticRegression,
+    'naive_bayes': NaiveBayes,
+}
+
+
+class SkipBenchmark(Exception):
+    """
+    Raised by a benchmark whose requirements (e.g. the tesseract binary) are missing
+    """
+
+
+class Workload:
+    """
+    The data shared by all benchmarks: a synthetic training and test corpus, and a scratch directory in which the models are trained
+    """
+
+    def __init__(self, corpus_size, seed, directory):
+        self.train_x, self.train_y = generate_corpus(corpus_size, seed)
+        self.test_x, self.test_y = generate_corpus(max(corpus_size // 4, 2), seed + 1)
+        self.directory = directory
+        self.__trained = set()
+        self.__fixture_server = None
+
+    def trained(self, name):
+        """
+        :param string name: A key of CLASSIFIERS
+        :return: A classifier of the given kind loaded from model artifacts trained on the synthetic corpus; trained on first use
+        """
+        if name not in self.__trained:
+            CLASSIFIERS[name](training_workers=1).execute(self.train_x, self.train_y)
+            self.__trained.add(name)
+        classifier = CLASSIFIERS[name]()
+        classifier.load()
+        return classifier
+
+    def fixture_server(self):
+        """
+        :return FixtureServer: A local HTTP server for the fixture images; started on first use
+        """
+        if self.__fixture_server is None:
+            self.__fixture_server = FixtureServer().start()
+        return self.__fixture_server
+
+    def close(self):
+        if self.__fixture_server is not None:
+            self.__fixture_server.stop()
+
+
+# Each benchmark receives the workload and returns a pair (function to be timed, number of operations done by one call of the function)
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@benchmark('preprocess_text')
+def _preprocess_text(workload):
+    texts = workload.test_x
+
+    def run():
+        for text in texts:
+            preprocess_text(text)
+    return run, len(texts)
+
+
+@benchmark('build_word_freq_dict')
+def _build_word_freq_dict(workload):
+    return lambda: build_word_freq_dict(workload.train_x, workload.train_y), len(workload.train_x)
+
+
+def _register_classifier_benchmarks(name):
+    @benchmark(f'{name}.train')
+    def _train(workload):
+        # The artifacts of the timed trainings are overwritten with identical ones, so later benchmarks are not affected
+        workload.trained(name)
+        return lambda: CLASSIFIERS[name](training_workers=1).execute(workload.train_x, workload.train_y), 1
+
+    @benchmark(f'{name}.load')
+    def _load(workload):
+        workload.trained(name)
+        return lambda: CLASSIFIERS[name]().load(), 1
+
+    @benchmark(f'{name}.predict')
+    def _predict(workload):
+        classifier = workload.trained(name)
+        texts = workload.test_x
+
+        def run():
+            for text in texts:
+                classifier.predict_text_polarity(text)
+        return run, len(texts)
+
+    @benchmark(f'{name}.predict_batch')
+    def _predict_batch(workload):
+        classifier = workload.trained(name)
+        return lambda: classifier.predict_batch(workload.test_x), len(workload.test_x)
+
+
+for _classifier_name in CLASSIFIERS:
+    _register_classifier_benchmarks(_classifier_name)
+
+
+@benchmark('image_scanner.ocr')
+def _image_scanner_ocr(workload):
+    try:
+        pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError:
+        raise SkipBenchmark("the tesseract binary is not installed")
+
+    # The images are served by a local HTTP server, so the whole ImageScanner path (download + OCR) is timed; the OCR cache is disabled
+    server = workload.fixture_server()
+    names = [name for name, _ in fixture_images()]
+
+    def run():
+        for name in names:
+            ImageScanner(server.url(name), cache=None).get_text_from_image()
+    return run, len(names)
+
+
+def measure(function, repeat):
+    """
+    Time function like timeit does: one untimed warm-up call, then `repeat` timed calls with the garbage collector disabled
+    :return: A list with the duration of each timed call, in seconds
+    """
+    function()
+
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return timings
+
+
+def calibrate(repeat=5):
+    """
+    Time a fixed pure Python workload, as a measure of the speed of the machine at the time of the run
+    :return: The best duration of the workload, in seconds
+    """
+    def workload():
+        total = 0
+        for i in range(200000):
+            total += i % 7
+        return total
+    return min(measure(workload, repeat))
+
+
+def run(names, corpus_size=4000, seed=0, repeat=5):
+    """
+    Run the given benchmarks inside a scratch working directory, so that the model artifacts of the project are left untouched
+    :param names: The names of the benchmarks to be run, in order
+    :return: A dictionary with the configuration, the environment and the results of the run
+    """
+    use_offline_preprocessor()
+    calibration = calibrate()
+
+    results = {}
+    skipped = {}
+    working_directory = os.getcwd()
+    directory = tempfile.mkdtemp(prefix="sentiment-benchmarks-")
+    os.chdir(directory)
+    workload = Workload(corpus_size, seed, directory)
+    try:
+        for name in names:
+            try:
+                function, operations = BENCHMARKS[name](workload)
+            except SkipBenchmark as reason:
+                skipped[name] = str(reason)
+                continue
+
+            timings = measure(function, repeat)
+            results[name] = {
+                'operations': operations,
+                'best_seconds_per_op': min(timings) / operations,
+                'median_seconds_per_op': statistics.median(timings) / operations,
+                'repeat': repeat,
+            }
+    finally:
+        workload.close()
+        os.chdir(working_directory)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'configuration': {'corpus_size': corpus_size, 'seed': seed, 'repeat': repeat},
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'calibration_seconds': calibration,
+        },
+        'results': results,
+        'skipped': skipped,
+    }
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare the best time per operation of every benchmark with the baseline. When both runs have a calibration time, the ratios are divided
+    by the ratio of the calibration times, so that a machine which is slower as a whole (e.g. because of CPU frequency scaling or a noisy
+    neighbour) does not show up as a regression of every benchmark
+    :return: A dictionary mapping each benchmark present in both runs to {'baseline', 'current', 'ratio', 'regression'}
+    """
+    machine_ratio = 1.0
+    current_calibration = report['environment'].get('calibration_seconds')
+    baseline_calibration = baseline.get('environment', {}).get('calibration_seconds')
+    if current_calibration and baseline_calibration:
+        machine_ratio = current_calibration / baseline_calibration
+
+    comparison = {}
+    for name, result in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        ratio = result['best_seconds_per_op'] / previous['best_seconds_per_op'] / machine_ratio
+        comparison[name] = {
+            'baseline': previous['best_seconds_per_op'],
+            'current': result['best_seconds_per_op'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        }
+    return comparison
+
+
+def _format_seconds(seconds):
+    if seconds >= 1:
+        return f"{seconds:8.3f} s "
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:8.3f} ms"
+    return f"{seconds * 1e6:8.3f} us"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark suite of the sentiment analysis backend")
+    parser.add_argument('--only', action='append', default=[], help="Run only the benchmarks matching this pattern (substring or glob)")
+    parser.add_argument('--quick', action='store_true', help="Use a smaller corpus and fewer repetitions")
+    parser.add_argument('--corpus-size', type=int, default=None, help="Number of synthetic training tweets")
+    parser.add_argument('--repeat', type=int, default=None, help="Number of timed repetitions of each benchmark")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic corpus")
+    parser.add_argument('--output', default=None, help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="The baseline to compare with")
+    parser.add_argument('--save-baseline', action='store_true', help="Store the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown before a benchmark is flagged")
+    args = parser.parse_args(argv)
+
+    names = list(BENCHMARKS)
+    if args.only:
+        names = [name for name in names if any(pattern in name or fnmatch.fnmatch(name, pattern) for pattern in args.only)]
+
+    corpus_size = args.corpus_size or (1000 if args.quick else 4000)
+    repeat = args.repeat or (3 if args.quick else 5)
+    report = run(names, corpus_size=corpus_size, seed=args.seed, repeat=repeat)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        report['comparison'] = compare(report, baseline, args.threshold)
+        if baseline.get('configuration') != report['configuration']:
+            print(f"Warning: the baseline was recorded with {baseline.get('configuration')}, this run uses {report['configuration']}")
+
+    comparison = report.get('comparison', {})
+    for name, result in report['results'].items():
+        line = f"{name:36s} {_format_seconds(result['best_seconds_per_op'])} / op  (median {_format_seconds(result['median_seconds_per_op'])})"
+        if name in comparison:
+            line += f"  {comparison[name]['ratio']:5.2f}x baseline"
+            if comparison[name]['regression']:
+                line += "  REGRESSION"
+        print(line)
+    for name, reason in report['skipped'].items():
+        print(f"{name:36s} skipped: {reason}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    regressions = [name for name, entry in comparison.items() if entry['regression']]
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
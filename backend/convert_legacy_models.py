@@ -0,0 +1,74 @@
+"""
+Convert the pickled model files written by earlier versions of the classifiers (word_freqs.json, parameters.json, word_freqs_naive_bayes.json
+and parameters_naive_bayes.json) into the binary model artifact format.
+Pickle files can execute arbitrary code when loaded -> only convert files from a trusted source.
+Usage: python convert_legacy_models.py [directory]
+"""
+import os
+import pickle
+import sys
+import numpy as np
+from model_store import save_model
+from word_freq_index import WordFreqIndex
+import logistic_regression
+import naive_bayes
+
+LEGACY_WORD_FREQS_FILE = "word_freqs.json"
+LEGACY_PARAMETERS_FILE = "parameters.json"
+LEGACY_NAIVE_BAYES_WORD_FREQS_FILE = "word_freqs_naive_bayes.json"
+LEGACY_NAIVE_BAYES_PARAMETERS_FILE = "parameters_naive_bayes.json"
+
+
+def _load_pickle(path):
+    with open(path, "rb") as file:
+        return pickle.load(file)
+
+
+def convert_legacy_models(directory="."):
+    """
+    Convert the legacy pickle files found in the directory; the converted artifacts are written into the same directory
+    :param string directory: The directory containing the legacy files
+    :return: The list of written artifacts
+    """
+    def path(name):
+        return os.path.join(directory, name)
+
+    written = []
+
+    if os.path.exists(path(LEGACY_WORD_FREQS_FILE)):
+        word_index = WordFreqIndex.from_freq_dict(_load_pickle(path(LEGACY_WORD_FREQS_FILE)))
+        vocabulary_name = word_index.save_shared(directory)
+        written.append(path(vocabulary_name))
+
+        if os.path.exists(path(LEGACY_PARAMETERS_FILE)):
+            theta = np.asarray(_load_pickle(path(LEGACY_PARAMETERS_FILE))['theta'], dtype=np.float64)
+            save_model(path(logistic_regression.PARAMETERS_FILE), {'theta': theta},
+                       {'kind': 'logistic_regression', 'vocab_checksum': word_index.checksum, 'vocabulary_file': vocabulary_name})
+            written.append(path(logistic_regression.PARAMETERS_FILE))
+
+    if os.path.exists(path(LEGACY_NAIVE_BAYES_WORD_FREQS_FILE)):
+        # Both legacy files usually hold the same word frequencies -> the second one is then not written again
+        word_index = WordFreqIndex.from_freq_dict(_load_pickle(path(LEGACY_NAIVE_BAYES_WORD_FREQS_FILE)))
+        vocabulary_name = word_index.save_shared(directory)
+        if path(vocabulary_name) not in written:
+            written.append(path(vocabulary_name))
+
+        if os.path.exists(path(LEGACY_NAIVE_BAYES_PARAMETERS_FILE)):
+            params = _load_pickle(path(LEGACY_NAIVE_BAYES_PARAMETERS_FILE))
+
+            # Align the log likelihood of each word with its id in the vocabulary index
+            log_likelihood = np.array([params['log_likelihood'][word] for word in word_index.words], dtype=np.float64)
+            log_prior = np.atleast_1d(np.asarray(params['log_prior'], dtype=np.float64))
+            save_model(path(naive_bayes.PARAMETERS_FILE), {'log_prior': log_prior, 'log_likelihood': log_likelihood},
+                       {'kind': 'naive_bayes', 'vocab_checksum': word_index.checksum, 'vocabulary_file': vocabulary_name})
+            written.append(path(naive_bayes.PARAMETERS_FILE))
+
+    if not written:
+        raise FileNotFoundError(f"No legacy word frequency file found in '{directory}'")
+
+    return written
+
+
+if __name__ == '__main__':
+    for artifact in convert_legacy_models(sys.argv[1] if len(sys.argv) > 1 else "."):
+        print("Written " + artifact)
@@ -0,0 +1,356 @@
+"""
+Labelled training corpora read from local files (CSV/TSV, JSON Lines or plain text, optionally gzip-compressed), streamed in chunks so that a
+corpus larger than the memory can be counted and trained on, e.g.:
+
+    corpus = open_corpus('messages.csv', text_column='message', label_column='sentiment')
+    train_corpus, test_corpus = corpus.split(test_fraction=0.1)
+    NaiveBayes().execute(train_corpus)
+"""
+import csv
+import gzip
+import heapq
+import itertools
+import json
+import os
+import pickle
+import tempfile
+import zlib
+from collections import Counter
+import numpy as np
+from utils import preprocess_text, map_bounded, parse_label
+from word_freq_index import WordFreqIndex
+
+# Number of texts read, preprocessed and counted together
+DEFAULT_CHUNK_SIZE = 500
+
+# Default proportion of a corpus held out for testing by split()
+DEFAULT_TEST_FRACTION = 0.2
+
+# Default memory budget of the counting, as the number of distinct (word, label) pairs kept in memory; when it is exceeded the counts are
+# spilled to a sorted run on disk, and the runs are merged at the end (roughly 200 bytes per pair)
+DEFAULT_MAX_PAIRS = 1000000
+
+# Number of entries pickled together in a spilled run
+_RUN_BLOCK_SIZE = 10000
+
+
+class CorpusFormatError(ValueError):
+    """
+    Raised when a record of a corpus file cannot be read (missing column, invalid label, malformed JSON)
+    """
+
+
+def _open_text(path, encoding):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding=encoding, newline='')
+    return open(path, encoding=encoding, newline='')
+
+
+class CorpusReader:
+    """
+    A labelled corpus which can be read several times, record by record; subclasses implement records()
+    """
+
+    def records(self):
+        """
+        :return: An iterator of pairs (text, label), the label being 1.0 for a positive and 0.0 for a negative text
+        """
+        raise NotImplementedError
+
+    def __iter__(self):
+        return self.records()
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        :param int chunk_size: The number of texts of each chunk
+        :return: An iterator of pairs (texts, labels) of lists of at most chunk_size elements, in corpus order
+        """
+        records = self.records()
+        while True:
+            chunk = list(itertools.islice(records, chunk_size))
+            if not chunk:
+                return
+            texts, labels = zip(*chunk)
+            yield list(texts), list(labels)
+
+    def split(self, test_fraction=DEFAULT_TEST_FRACTION, seed=0):
+        """
+        Split the corpus into a training and a testing part, without reading it. Each text is assigned to a part by a hash of its content,
+        so the split is reproducible, and duplicates of a text always end up in the same part
+        :param float test_fraction: The proportion of the texts assigned to the testing part
+        :param int seed: Changes the assignment of the texts
+        :return: train_corpus, test_corpus: Two corpus readers
+        """
+        if not 0 <= test_fraction <= 1:
+            raise ValueError(f"The test fraction must be between 0 and 1, got {test_fraction}")
+        return SplitCorpus(self, False, test_fraction, seed), SplitCorpus(self, True, test_fraction, seed)
+
+
+class ListCorpus(CorpusReader):
+    """
+    A corpus held in memory, e.g. for small corpora or for tests
+    """
+
+    def __init__(self, texts, labels):
+        """
+        :param texts: A list of texts
+        :param labels: A list corresponding to the sentiment of each text (0 for negative and 1 for positive)
+        """
+        labels = np.reshape(labels, -1).tolist()
+        if len(texts) != len(labels):
+            raise ValueError(f"Got {len(texts)} texts and {len(labels)} labels")
+        self.__texts = texts
+        self.__labels = [parse_label(label) for label in labels]
+
+    def records(self):
+        return zip(self.__texts, self.__labels)
+
+
+class CsvCorpus(CorpusReader):
+    """
+    A CSV (or TSV) file with a header row, one text per row
+    """
+
+    def __init__(self, path, text_column='text', label_column='label', delimiter=None, encoding='utf-8'):
+        """
+        :param string path: The path of the file; a '.gz' suffix marks a gzip-compressed file
+        :param string text_column: The name of the column holding the texts
+        :param string label_column: The name of the column holding the labels (see parse_label)
+        :param string delimiter: The field delimiter; defaults to a tab for '.tsv' files and to a comma otherwise
+        :param string encoding: The encoding of the file
+        """
+        self.path = path
+        self.text_column = text_column
+        self.label_column = label_column
+        if delimiter is None:
+            delimiter = '\t' if path.endswith(('.tsv', '.tsv.gz')) else ','
+        self.delimiter = delimiter
+        self.encoding = encoding
+
+    def records(self):
+        with _open_text(self.path, self.encoding) as file:
+            reader = csv.DictReader(file, delimiter=self.delimiter)
+            for column in (self.text_column, self.label_column):
+                if column not in (reader.fieldnames or ()):
+                    raise CorpusFormatError(f"'{self.path}' has no column '{column}', found {reader.fieldnames}")
+
+            for row in reader:
+                try:
+                    label = parse_label(row[self.label_column])
+                except ValueError as error:
+                    raise CorpusFormatError(f"'{self.path}', line {reader.line_num}: {error}") from None
+                yield row[self.text_column], label
+
+
+class JsonlCorpus(CorpusReader):
+    """
+    A JSON Lines file, one JSON object per line holding a text and its label
+    """
+
+    def __init__(self, path, text_field='text', label_field='label', encoding='utf-8'):
+        """
+        :param string path: The path of the file; a '.gz' suffix marks a gzip-compressed file
+        :param string text_field: The key of the texts
+        :param string label_field: The key of the labels (see parse_label)
+        :param string encoding: The encoding of the file
+        """
+        self.path = path
+        self.text_field = text_field
+        self.label_field = label_field
+        self.encoding = encoding
+
+    def records(self):
+        with _open_text(self.path, self.encoding) as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    yield record[self.text_field], parse_label(record[self.label_field])
+                except (ValueError, KeyError, TypeError) as error:
+                    raise CorpusFormatError(f"'{self.path}', line {line_number}: {error!r}") from None
+
+
+class TextCorpus(CorpusReader):
+    """
+    A plain text file, one text per line, all of them with the same label (e.g. a file of positive and a file of negative messages)
+    """
+
+    def __init__(self, path, label, encoding='utf-8'):
+        """
+        :param string path: The path of the file; a '.gz' suffix marks a gzip-compressed file
+        :param label: The label of every text of the file (see parse_label)
+        :param string encoding: The encoding of the file
+        """
+        self.path = path
+        self.label = parse_label(label)
+        self.encoding = encoding
+
+    def records(self):
+        with _open_text(self.path, self.encoding) as file:
+            for line in file:
+                text = line.rstrip('\r\n')
+                if text.strip():
+                    yield text, self.label
+
+
+class ChainedCorpus(CorpusReader):
+    """
+    The concatenation of several corpora, e.g. of a positive and a negative TextCorpus
+    """
+
+    def __init__(self, *corpora):
+        self.corpora = corpora
+
+    def records(self):
+        return itertools.chain.from_iterable(corpus.records() for corpus in self.corpora)
+
+
+class SplitCorpus(CorpusReader):
+    """
+    The training or the testing part of a corpus; see CorpusReader.split
+    """
+
+    def __init__(self, corpus, test, test_fraction, seed):
+        self.corpus = corpus
+        self.test = test
+        self.test_fraction = test_fraction
+        self.seed = seed
+
+    def records(self):
+        threshold = self.test_fraction * 2 ** 32
+        prefix = f"{self.seed}:".encode('utf-8')
+        for text, label in self.corpus.records():
+            if (zlib.crc32(prefix + text.encode('utf-8')) < threshold) == self.test:
+                yield text, label
+
+
+def open_corpus(path, label=None, **options):
+    """
+    :param string path: The path of a '.csv', '.tsv', '.jsonl', '.ndjson' or '.txt' file, optionally with a '.gz' suffix
+    :param label: The label of every text of a plain text file; not used by the other formats
+    :param options: Further arguments of the reader (e.g. text_column and label_column of a CSV file)
+    :return CorpusReader: A reader of the file, selected by its extension
+    """
+    extension = os.path.splitext(path[:-3] if path.endswith('.gz') else path)[1].lower()
+    if extension in ('.csv', '.tsv'):
+        return CsvCorpus(path, **options)
+    if extension in ('.jsonl', '.ndjson'):
+        return JsonlCorpus(path, **options)
+    if extension == '.txt':
+        if label is None:
+            raise ValueError(f"The label of the texts of '{path}' must be given")
+        return TextCorpus(path, label, **options)
+    raise ValueError(f"Unsupported corpus format '{extension}' of '{path}', expected .csv, .tsv, .jsonl, .ndjson or .txt")
+
+
+def _preprocess_chunk(chunk):
+    texts, labels = chunk
+    return [preprocess_text(text) for text in texts], labels
+
+
+def preprocess_chunks(corpus, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Preprocess a corpus chunk by chunk, in a pool of worker processes; only a few chunks are in memory at any time
+    :param CorpusReader corpus: The corpus
+    :param int workers: The number of worker processes; defaults to the number of CPUs, and 1 processes the corpus in the current process
+    :param int chunk_size: The number of texts of each chunk
+    :return: An iterator of pairs (token_lists, labels), one per chunk, in corpus order
+    """
+    return map_bounded(_preprocess_chunk, corpus.iter_chunks(chunk_size), workers)
+
+
+def _count_chunk(chunk):
+    """
+    Preprocess one chunk of the corpus and count its (word, label) pairs and its texts per label; executed inside the worker processes
+    """
+    texts, labels = chunk
+    word_freqs = Counter()
+    for text, label in zip(texts, labels):
+        word_freqs.update([(word, label) for word in preprocess_text(text)])
+    positive = sum(1 for label in labels if label > 0)
+    return word_freqs, (len(labels) - positive, positive)
+
+
+def _write_run(directory, word_freqs):
+    # A run holds the counts sorted by (word, label), pickled in blocks so that it can be read back block by block during the merge
+    descriptor, path = tempfile.mkstemp(suffix='.run', dir=directory)
+    entries = sorted(word_freqs.items())
+    with os.fdopen(descriptor, 'wb') as file:
+        for i in range(0, len(entries), _RUN_BLOCK_SIZE):
+            pickle.dump(entries[i:i + _RUN_BLOCK_SIZE], file, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(path):
+    with open(path, 'rb') as file:
+        while True:
+            try:
+                block = pickle.load(file)
+            except EOFError:
+                return
+            yield from block
+
+
+def _merge_runs(paths, min_count):
+    """
+    :return WordFreqIndex: The index of the summed counts of the sorted runs, whose vocabulary is in sorted order
+    """
+    merged = heapq.merge(*[_read_run(path) for path in paths])
+    words = []
+    pos_counts = []
+    neg_counts = []
+    for word, entries in itertools.groupby(merged, key=lambda entry: entry[0][0]):
+        pos_count = neg_count = 0
+        for (_, label), count in entries:
+            if label > 0:
+                pos_count += count
+            else:
+                neg_count += count
+        if pos_count + neg_count >= min_count:
+            words.append(word)
+            pos_counts.append(pos_count)
+            neg_counts.append(neg_count)
+    return WordFreqIndex(words, pos_counts, neg_counts)
+
+
+def _prune(index, min_count):
+    if min_count <= 1:
+        return index
+    keep = (index.pos_counts + index.neg_counts) >= min_count
+    return WordFreqIndex([word for word, kept in zip(index.words, keep.tolist()) if kept], index.pos_counts[keep], index.neg_counts[keep])
+
+
+def count_corpus(corpus, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, max_pairs=DEFAULT_MAX_PAIRS, min_count=1, spill_directory=None):
+    """
+    Count the words of a corpus in one streaming pass, in bounded memory: the chunks are preprocessed and counted by a pool of worker
+    processes, and whenever more than max_pairs distinct (word, label) pairs are counted, the counts are spilled to a sorted run on disk.
+    The runs are merged at the end. Without spilling, the vocabulary is in order of first appearance, like with WordFreqIndex.from_freq_dict
+    :param CorpusReader corpus: The corpus
+    :param int workers: The number of worker processes; defaults to the number of CPUs, and 1 processes the corpus in the current process
+    :param int chunk_size: The number of texts of each chunk
+    :param int max_pairs: The memory budget, as the number of distinct (word, label) pairs counted in memory
+    :param int min_count: Words appearing fewer times in the whole corpus are left out of the vocabulary
+    :param string spill_directory: The directory of the spilled runs; defaults to the system temporary directory
+    :return: word_index: The WordFreqIndex of the corpus
+             document_counts: The number of negative and of positive texts
+    """
+    document_counts = np.zeros(2, dtype=np.int64)
+    word_freqs = Counter()
+
+    with tempfile.TemporaryDirectory(prefix='word_counts_', dir=spill_directory) as directory:
+        runs = []
+        for chunk_freqs, chunk_documents in map_bounded(_count_chunk, corpus.iter_chunks(chunk_size), workers):
+            word_freqs.update(chunk_freqs)
+            document_counts += chunk_documents
+            if len(word_freqs) > max_pairs:
+                runs.append(_write_run(directory, word_freqs))
+                word_freqs = Counter()
+
+        if not runs:
+            return _prune(WordFreqIndex.from_freq_dict(word_freqs), min_count), document_counts
+
+        if word_freqs:
+            runs.append(_write_run(directory, word_freqs))
+        del word_freqs
+        return _merge_runs(runs, min_count), document_counts
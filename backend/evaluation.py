@@ -0,0 +1,193 @@
+import os
+import numpy as np
+from utils import map_bounded
+
+# The classifier used by the worker processes of score_texts; set once per worker by the pool initializer
+_worker_classifier = None
+
+
+def _init_worker(classifier):
+    global _worker_classifier
+    _worker_classifier = classifier
+
+
+def _score_chunk(texts):
+    return _worker_classifier.predict_scores(texts)
+
+
+def score_texts(classifier, texts, workers=None, chunk_size=1000):
+    """
+    Score a list of texts through batched prediction, splitting it into chunks which are scored by a pool of worker processes.
+    The classifier is handed to each worker once, when the worker starts, and not once per chunk.
+    :param classifier: Any classifier implementing predict_scores(texts)
+    :param texts: A list of texts to be scored
+    :param int workers: The number of worker processes; defaults to the number of CPUs, and 1 scores the texts in the current process
+    :param int chunk_size: The number of texts scored by one batched prediction
+    :return: A vector with the score of each text, in the order of the input
+    """
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(chunks))
+
+    if workers <= 1:
+        scores = [classifier.predict_scores(chunk) for chunk in chunks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(classifier,)) as executor:
+            scores = list(executor.map(_score_chunk, chunks))
+
+    return np.concatenate(scores) if scores else np.zeros(0)
+
+
+def roc_curve(labels, scores):
+    """
+    :param labels: A vector of true labels (0 for negative and 1 for positive)
+    :param scores: A vector of scores, higher meaning more positive
+    :return: fpr: The false positive rate at each threshold
+             tpr: The true positive rate at each threshold
+             thresholds: The distinct scores, in decreasing order, used as thresholds (a text is positive if its score is >= the threshold)
+    """
+    labels = np.asarray(labels, dtype=np.float64).reshape(-1)
+    scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+
+    # Sort by decreasing score, and keep only the last position of each run of equal scores, where all of them are counted as positive
+    order = np.argsort(-scores, kind='mergesort')
+    scores = scores[order]
+    labels = labels[order]
+    last_of_run = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+
+    true_positives = np.cumsum(labels)[last_of_run]
+    false_positives = (last_of_run + 1) - true_positives
+
+    positives = true_positives[-1] if len(true_positives) else 0
+    negatives = false_positives[-1] if len(false_positives) else 0
+
+    # The curve starts at (0, 0), where no text is positive
+    tpr = np.r_[0, true_positives / positives] if positives else np.zeros(len(last_of_run) + 1)
+    fpr = np.r_[0, false_positives / negatives] if negatives else np.zeros(len(last_of_run) + 1)
+    thresholds = np.r_[np.inf, scores[last_of_run]]
+    return fpr, tpr, thresholds
+
+
+def roc_auc(fpr, tpr):
+    """
+    :return: The area under the ROC curve, by the trapezoidal rule
+    """
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+
+class EvaluationReport:
+    """
+    Quality metrics of a classifier over a labelled test set. Every metric is computed from vectors of the size of the test set.
+    """
+
+    def __init__(self, labels, scores, threshold):
+        """
+        :param labels: A vector of true labels (0 for negative and 1 for positive)
+        :param scores: A vector with the score of each text
+        :param threshold: The decision threshold of the classifier: a text is predicted as positive if its score is > threshold
+        """
+        self.labels = np.asarray(labels).reshape(-1).astype(bool)
+        self.scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        self.threshold = threshold
+        self.predictions = self.scores > threshold
+
+        # Confusion matrix, with the true labels on the rows and the predicted labels on the columns: [[TN, FP], [FN, TP]]
+        self.true_positives = int(np.count_nonzero(self.predictions & self.labels))
+        self.false_positives = int(np.count_nonzero(self.predictions & ~self.labels))
+        self.false_negatives = int(np.count_nonzero(~self.predictions & self.labels))
+        self.true_negatives = int(np.count_nonzero(~self.predictions & ~self.labels))
+        self.confusion_matrix = np.array([[self.true_negatives, self.false_positives], [self.false_negatives, self.true_positives]])
+
+        self.fpr, self.tpr, self.roc_thresholds = roc_curve(self.labels, self.scores)
+
+    @property
+    def size(self):
+        return len(self.labels)
+
+    @property
+    def accuracy(self):
+        return (self.true_positives + self.true_negatives) / self.size if self.size else 0.0
+
+    @property
+    def precision(self):
+        predicted_positives = self.true_positives + self.false_positives
+        return self.true_positives / predicted_positives if predicted_positives else 0.0
+
+    @property
+    def recall(self):
+        positives = self.true_positives + self.false_negatives
+        return self.true_positives / positives if positives else 0.0
+
+    @property
+    def f1(self):
+        return 2 * self.precision * self.recall / (self.precision + self.recall) if self.precision + self.recall else 0.0
+
+    @property
+    def auc(self):
+        return roc_auc(self.fpr, self.tpr)
+
+    def report_lines(self):
+        """
+        :return: The metrics as lines of text, in the format of the testing results file
+        """
+        return [
+            "Accuracy: " + str(self.accuracy),
+            f"Precision: {self.precision:.6f}, Recall: {self.recall:.6f}, F1: {self.f1:.6f}",
+            f"ROC AUC: {self.auc:.6f}",
+            f"Confusion matrix [[TN, FP], [FN, TP]]: {self.confusion_matrix.tolist()}",
+        ]
+
+    def summary(self):
+        """
+        :return: The metrics as a dictionary of plain Python values
+        """
+        return {
+            'size': self.size,
+            'accuracy': self.accuracy,
+            'precision': self.precision,
+            'recall': self.recall,
+            'f1': self.f1,
+            'auc': self.auc,
+            'confusion_matrix': self.confusion_matrix.tolist(),
+        }
+
+
+def evaluate(classifier, texts, labels, workers=None, chunk_size=1000):
+    """
+    Score a labelled test set with the given classifier and compute its quality metrics
+    :param classifier: Any classifier implementing predict_scores(texts) and a decision_threshold attribute
+    :param texts: A list of texts to be classified
+    :param labels: A list or vector corresponding to the sentiment of each text (0 for negative and 1 for positive)
+    :param int workers: The number of worker processes used for scoring (see score_texts)
+    :param int chunk_size: The number of texts scored by one batched prediction
+    :return EvaluationReport: The quality metrics of the classifier
+    """
+    scores = score_texts(classifier, texts, workers=workers, chunk_size=chunk_size)
+    return EvaluationReport(labels, scores, classifier.decision_threshold)
+
+
+def _score_labelled_chunk(chunk):
+    texts, labels = chunk
+    return _worker_classifier.predict_scores(texts), labels
+
+
+def evaluate_corpus(classifier, corpus, workers=None, chunk_size=1000):
+    """
+    Score a labelled test corpus streamed from disk (see corpus_readers) and compute the quality metrics of the classifier; only the
+    scores and the labels are kept in memory, not the texts
+    :param classifier: Any classifier implementing predict_scores(texts) and a decision_threshold attribute
+    :param CorpusReader corpus: The test corpus
+    :param int workers: The number of worker processes used for scoring; defaults to the number of CPUs
+    :param int chunk_size: The number of texts scored by one batched prediction
+    :return EvaluationReport: The quality metrics of the classifier
+    """
+    scores = []
+    labels = []
+    for chunk_scores, chunk_labels in map_bounded(_score_labelled_chunk, corpus.iter_chunks(chunk_size), workers,
+                                                  initializer=_init_worker, initargs=(classifier,)):
+        scores.append(chunk_scores)
+        labels.extend(chunk_labels)
+    return EvaluationReport(labels, np.concatenate(scores) if scores else np.zeros(0), classifier.decision_threshold)
@@ -0,0 +1,172 @@
+import hashlib
+import zlib
+import numpy as np
+
+# Default number of hash buckets; the model holds one positive and one negative count per bucket, whatever the size of the training corpus
+DEFAULT_BUCKETS = 2 ** 18
+
+# Default lengths of the n-grams turned into features: unigrams and bigrams of the preprocessed tokens
+DEFAULT_NGRAM_RANGE = (1, 2)
+
+
+class HashedFreqIndex:
+    """
+    Bounded-memory alternative to WordFreqIndex: instead of a vocabulary, the unigrams and bigrams of a text are hashed (CRC-32) into a fixed
+    number of buckets, and the positive and negative counts are kept per bucket. Training is a scatter-add over the bucket ids of the tokens,
+    scoring is a gather over them, and the memory of the model only depends on the number of buckets.
+    It offers the lookup and update methods of WordFreqIndex used by the classifiers; the buckets play the role of the word ids, and the
+    buckets which were never hit during training are treated like out-of-vocabulary words.
+    """
+
+    def __init__(self, n_buckets=DEFAULT_BUCKETS, ngram_range=DEFAULT_NGRAM_RANGE, pos_counts=None, neg_counts=None):
+        """
+        :param int n_buckets: The number of hash buckets
+        :param ngram_range: The pair (shortest, longest) of n-gram lengths turned into features
+        :param pos_counts: The number of times each bucket is hit by the n-grams of positive texts
+        :param neg_counts: The number of times each bucket is hit by the n-grams of negative texts
+        """
+        if n_buckets < 1:
+            raise ValueError(f"The number of hash buckets must be positive, got {n_buckets}")
+        if not 1 <= ngram_range[0] <= ngram_range[1]:
+            raise ValueError(f"Invalid n-gram range {tuple(ngram_range)}")
+
+        self.__n_buckets = int(n_buckets)
+        self.__ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.__pos_counts = np.zeros(self.__n_buckets, dtype=np.int64) if pos_counts is None else np.asarray(pos_counts, dtype=np.int64)
+        self.__neg_counts = np.zeros(self.__n_buckets, dtype=np.int64) if neg_counts is None else np.asarray(neg_counts, dtype=np.int64)
+        if self.__pos_counts.shape != (self.__n_buckets,) or self.__neg_counts.shape != (self.__n_buckets,):
+            raise ValueError(f"The count arrays must have one entry per bucket ({self.__n_buckets})")
+
+        # Number of buckets hit at least once, i.e. the size of the hashed vocabulary
+        self.__vocabulary_size = int(np.count_nonzero(self.__pos_counts + self.__neg_counts))
+
+    @classmethod
+    def from_token_lists(cls, token_lists, labels, n_buckets=DEFAULT_BUCKETS, ngram_range=DEFAULT_NGRAM_RANGE):
+        """
+        :param token_lists: A list of lists of preprocessed tokens
+        :param labels: A list corresponding to the sentiment of each text (0 for negative and 1 for positive)
+        :return HashedFreqIndex: The index counting the n-grams of the texts
+        """
+        index = cls(n_buckets, ngram_range)
+        index.update(token_lists, labels)
+        return index
+
+    @property
+    def n_buckets(self):
+        return self.__n_buckets
+
+    @property
+    def ngram_range(self):
+        return self.__ngram_range
+
+    @property
+    def checksum(self):
+        """
+        :return string: A digest of the hashing configuration, identifying which bucket every n-gram is counted in
+        """
+        configuration = f"crc32:{self.__n_buckets}:{self.__ngram_range[0]}-{self.__ngram_range[1]}"
+        return hashlib.blake2b(configuration.encode('utf-8'), digest_size=16).hexdigest()
+
+    def __len__(self):
+        return self.__n_buckets
+
+    @property
+    def vocabulary_size(self):
+        return self.__vocabulary_size
+
+    @property
+    def pos_counts(self):
+        return self.__pos_counts
+
+    @property
+    def neg_counts(self):
+        return self.__neg_counts
+
+    def pair_count(self):
+        """
+        :return: The number of (bucket, label) pairs with a non-zero frequency
+        """
+        return int(np.count_nonzero(self.__pos_counts) + np.count_nonzero(self.__neg_counts))
+
+    def ngrams(self, tokens):
+        """
+        :param tokens: A list of preprocessed tokens
+        :return: The n-grams of the tokens, each one as its tokens joined by a space (the tokenizer never produces tokens containing one)
+        """
+        shortest, longest = self.__ngram_range
+        return [' '.join(tokens[i:i + n]) for n in range(shortest, longest + 1) for i in range(len(tokens) - n + 1)]
+
+    def __buckets(self, tokens):
+        n_buckets = self.__n_buckets
+        return [zlib.crc32(ngram.encode('utf-8')) % n_buckets for ngram in self.ngrams(tokens)]
+
+    def unseen_words(self, token_lists):
+        """
+        :return: An empty list: the number of buckets is fixed, so an update never extends the arrays indexed by the bucket ids
+        """
+        return []
+
+    def update(self, token_lists, labels):
+        """
+        Add the n-grams of new labelled texts to the counts of their buckets
+        :param token_lists: A list of lists of preprocessed tokens
+        :param labels: A list corresponding to the sentiment of each text (0 for negative and 1 for positive)
+        :return: The ids of the buckets whose counts changed
+        """
+        bucket_ids = []
+        positive = []
+        for tokens, label in zip(token_lists, np.reshape(labels, -1).tolist()):
+            buckets = self.__buckets(tokens)
+            bucket_ids.extend(buckets)
+            positive.extend([label > 0] * len(buckets))
+        bucket_ids = np.array(bucket_ids, dtype=np.intp)
+        positive = np.array(positive, dtype=bool)
+
+        # Memory-mapped (read-only) counts are copied into memory on the first update
+        if not self.__pos_counts.flags.writeable:
+            self.__pos_counts = np.array(self.__pos_counts)
+            self.__neg_counts = np.array(self.__neg_counts)
+
+        np.add.at(self.__pos_counts, bucket_ids[positive], 1)
+        np.add.at(self.__neg_counts, bucket_ids[~positive], 1)
+
+        touched = np.unique(bucket_ids)
+        self.__vocabulary_size = int(np.count_nonzero(self.__pos_counts + self.__neg_counts))
+        return touched
+
+    def feature_ids(self, tokens):
+        """
+        :param tokens: A list of preprocessed tokens
+        :return: A list of pairs (n-gram, bucket), the bucket being None for the buckets which were never hit during training
+        """
+        features = []
+        for ngram in self.ngrams(tokens):
+            bucket = zlib.crc32(ngram.encode('utf-8')) % self.__n_buckets
+            features.append((ngram, bucket if self.__pos_counts[bucket] or self.__neg_counts[bucket] else None))
+        return features
+
+    def token_ids(self, tokens):
+        """
+        :param tokens: A list of preprocessed tokens
+        :return: The buckets of the n-grams of the tokens, skipping the buckets which were never hit during training
+        """
+        bucket_ids = np.array(self.__buckets(tokens), dtype=np.intp)
+        return bucket_ids[(self.__pos_counts[bucket_ids] + self.__neg_counts[bucket_ids]) > 0]
+
+    def batch_token_ids(self, token_lists):
+        """
+        :param token_lists: A list of lists of preprocessed tokens
+        :return: ids: The buckets of the n-grams of all texts which were hit during training, concatenated
+                 rows: The position in token_lists of the text each bucket belongs to
+        """
+        bucket_ids = []
+        rows = []
+        for row, tokens in enumerate(token_lists):
+            buckets = self.__buckets(tokens)
+            bucket_ids.extend(buckets)
+            rows.extend([row] * len(buckets))
+        bucket_ids = np.array(bucket_ids, dtype=np.intp)
+        rows = np.array(rows, dtype=np.intp)
+
+        seen = (self.__pos_counts[bucket_ids] + self.__neg_counts[bucket_ids]) > 0
+        return bucket_ids[seen], rows[seen]
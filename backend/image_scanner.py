@@ -1,17 +1,307 @@
 # Imports for image processing
+import hashlib
 import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import urllib3
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageChops
+from requests.adapters import HTTPAdapter
+from prediction_cache import PredictionCache
+from metrics import timed_stage
+
+# Seconds allowed for establishing the connection to the image host, and between two received chunks of the image
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+
+# Seconds allowed for the whole download: the read timeout alone does not bound a host sending a small chunk just often enough. The deadline is
+# checked after every chunk, so a download takes at most the deadline plus one read timeout
+DOWNLOAD_DEADLINE = 30
+
+# Images larger than this number of bytes are rejected without being downloaded completely
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+# Number of images which can be recognized at the same time; further requests wait for a free OCR worker
+OCR_WORKERS = os.cpu_count() or 1
+
+# Seconds after which a running Tesseract process is killed
+OCR_TIMEOUT = 30
+
+_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Resolution assumed for images which do not declare one (the usual screen resolution); it is only compared with OcrOptions.target_dpi,
+# which downscales images of a higher resolution and never upsamples the others
+DEFAULT_IMAGE_DPI = 72
+
+
+class ImageTooLargeError(ValueError):
+    """
+    Raised when an image exceeds the maximum download size
+    """
+
+
+class ImageDownloadError(IOError):
+    """
+    Raised when an image cannot be downloaded (connection failure, timeout, exceeded deadline or unsuccessful HTTP status)
+    """
+
+
+class ImageFormatError(ValueError):
+    """
+    Raised when the downloaded content is not an image which can be decoded
+    """
+
+
+class OcrError(RuntimeError):
+    """
+    Raised when Tesseract fails to recognize the text of an image, or exceeds its timeout
+    """
+
+
+_shared_lock = threading.Lock()
+_shared_session = None
+_shared_ocr_executor = None
+
+# OCR results keyed by the hash of the image bytes -> the same picture served from different URLs is only recognized once
+ocr_cache = PredictionCache(max_entries=2000, max_bytes=8 * 1024 * 1024, ttl=None)
+
+
+def get_session():
+    """
+    :return requests.Session: The process-wide HTTP session, whose connection pool is reused across image downloads
+    """
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+            _shared_session = requests.Session()
+            _shared_session.mount('http://', adapter)
+            _shared_session.mount('https://', adapter)
+        return _shared_session
+
+
+def get_ocr_executor():
+    """
+    :return ThreadPoolExecutor: The process-wide, bounded pool running the OCR of the images
+    """
+    global _shared_ocr_executor
+    with _shared_lock:
+        if _shared_ocr_executor is None:
+            _shared_ocr_executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix='ocr')
+        return _shared_ocr_executor
+
+
+class OcrOptions:
+    """
+    Pre-processing applied to an image before OCR, and the Tesseract settings. Tesseract's running time grows roughly with the number of
+    pixels, so reducing colour, resolution and area before recognition may trade a little accuracy for a drop in latency. Every step is
+    disabled by default: the trade-off depends on the images, and is measured with benchmarks.bench_ocr before a step is enabled.
+    """
+
+    def __init__(self, grayscale=False, max_pixels=None, target_dpi=None, binarize=False, crop_to_text=False, page_segmentation_mode=None):
+        """
+        :param bool grayscale: Flag indicating whether to convert the image to grayscale
+        :param int max_pixels: Images with more pixels are downscaled to this pixel budget; None disables the limit
+        :param int target_dpi: Images with a higher (declared) resolution are downscaled to this resolution, images with a lower one are left
+                               unchanged; None disables the limit
+        :param bool binarize: Flag indicating whether to convert the image to black and white, using Otsu's threshold
+        :param bool crop_to_text: Flag indicating whether to crop the image to the region which differs from its background colour
+        :param int page_segmentation_mode: The Tesseract page segmentation mode (--psm); None uses Tesseract's default
+        """
+        self.grayscale = grayscale
+        self.max_pixels = max_pixels
+        self.target_dpi = target_dpi
+        self.binarize = binarize
+        self.crop_to_text = crop_to_text
+        self.page_segmentation_mode = page_segmentation_mode
+
+    def cache_tag(self):
+        """
+        :return string: A description of the options, included in OCR cache keys since different options may recognize different text
+        """
+        return repr((self.grayscale, self.max_pixels, self.target_dpi, self.binarize, self.crop_to_text, self.page_segmentation_mode))
+
+    def tesseract_config(self):
+        """
+        :return string: The command line configuration passed to Tesseract
+        """
+        if self.page_segmentation_mode is None:
+            return ''
+        return f'--psm {int(self.page_segmentation_mode)}'
+
+    def prepare(self, image):
+        """
+        :param image: The decoded PIL image
+        :return: The pre-processed image; the image is only ever downscaled (to the pixel budget or the target resolution), never upsampled
+        """
+        if self.grayscale or self.binarize or self.crop_to_text:
+            image = image.convert('L')
+
+        if self.crop_to_text:
+            image = self.__crop_to_text(image)
+
+        scale = 1.0
+        if self.target_dpi is not None:
+            dpi = image.info.get('dpi', (DEFAULT_IMAGE_DPI, DEFAULT_IMAGE_DPI))[0] or DEFAULT_IMAGE_DPI
+            scale = min(scale, self.target_dpi / dpi)
+        if self.max_pixels is not None:
+            scale = min(scale, (self.max_pixels / (image.width * image.height)) ** 0.5)
+        if scale < 1.0:
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(size, Image.Resampling.LANCZOS)
+
+        if self.binarize:
+            threshold = _otsu_threshold(image.histogram())
+            image = image.point(lambda value: 255 if value > threshold else 0)
+
+        return image
+
+    @staticmethod
+    def __crop_to_text(image, margin=10, tolerance=40):
+        # The most frequent grey level is taken as the background; the text region is the bounding box of all pixels far enough from it
+        histogram = image.histogram()
+        background = histogram.index(max(histogram))
+        difference = ImageChops.difference(image, Image.new('L', image.size, background))
+        bounding_box = difference.point(lambda value: 255 if value > tolerance else 0).getbbox()
+        if bounding_box is None:
+            return image
+
+        left, top, right, bottom = bounding_box
+        return image.crop((max(0, left - margin), max(0, top - margin), min(image.width, right + margin), min(image.height, bottom + margin)))
+
+
+def _otsu_threshold(histogram):
+    """
+    :param histogram: The 256-bin histogram of a grayscale image
+    :return int: The grey level maximizing the between-class variance of the pixels below and above it
+    """
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background_count = 0
+    background_sum = 0
+    best_threshold, best_variance = 0, -1.0
+    for level, count in enumerate(histogram):
+        background_count += count
+        background_sum += level * count
+        foreground_count = total - background_count
+        if background_count == 0 or foreground_count == 0:
+            continue
+        mean_difference = background_sum / background_count - (weighted_total - background_sum) / foreground_count
+        variance = background_count * foreground_count * mean_difference * mean_difference
+        if variance > best_variance:
+            best_threshold, best_variance = level, variance
+    return best_threshold
+
+
+def recognize_text(image_bytes, options=None):
+    """
+    :param bytes image_bytes: The encoded image
+    :param OcrOptions options: The pre-processing and Tesseract settings; None passes the image to Tesseract unchanged
+    :return string: The text recognized in the image by Tesseract
+    """
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.load()
+    except (OSError, Image.DecompressionBombError) as error:
+        raise ImageFormatError(f"The content is not a supported image: {error}") from error
+
+    try:
+        if options is None:
+            return pytesseract.image_to_string(image, timeout=OCR_TIMEOUT)
+        return pytesseract.image_to_string(options.prepare(image), config=options.tesseract_config(), timeout=OCR_TIMEOUT)
+    except RuntimeError as error:
+        # TesseractError and the timeout of pytesseract; a missing tesseract binary (TesseractNotFoundError) is a server error, and not caught
+        raise OcrError(f"The text of the image could not be recognized: {error}") from error
+
+
+def _iter_received(response):
+    """
+    :param response: A streamed response
+    :return: An iterator of the parts of the body, each one returned as soon as it is received
+    """
+    # iter_content only returns complete chunks, which a host sending a few bytes at a time takes arbitrarily long to fill; read1 returns the
+    # received bytes after at most one read timeout, so that the download deadline is checked in time (read1 needs urllib3 2.3 or later)
+    read1 = getattr(response.raw, 'read1', None)
+    if read1 is None:
+        yield from response.iter_content(chunk_size=_DOWNLOAD_CHUNK_SIZE)
+        return
+    while True:
+        chunk = read1(_DOWNLOAD_CHUNK_SIZE, decode_content=True)
+        if not chunk:
+            return
+        yield chunk
 
 
 class ImageScanner:
-    def __init__(self, image_url):
+    def __init__(self, image_url, session=None, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_bytes=MAX_IMAGE_BYTES, ocr_executor=None,
+                 cache=ocr_cache, ocr_options=None, deadline=DOWNLOAD_DEADLINE, clock=time.monotonic):
+        """
+        :param string image_url: The URL of the image to be scanned
+        :param session: The HTTP session used for the download; defaults to the shared, pooled session
+        :param timeout: The pair (connect timeout, read timeout), in seconds
+        :param int max_bytes: The maximum size of the image, in bytes
+        :param ocr_executor: The executor running the OCR; defaults to the shared, bounded OCR pool
+        :param cache: The cache of OCR results keyed by image content; None disables caching
+        :param OcrOptions ocr_options: The pre-processing and Tesseract settings; None passes the image to Tesseract unchanged
+        :param deadline: Seconds allowed for the whole download; None disables the deadline
+        :param clock: Function returning the current time, in seconds
+        """
         self.__imageURL = image_url
+        self.__session = session if session is not None else get_session()
+        self.__timeout = timeout
+        self.__max_bytes = max_bytes
+        self.__ocr_executor = ocr_executor if ocr_executor is not None else get_ocr_executor()
+        self.__cache = cache
+        self.__ocr_options = ocr_options
+        self.__deadline = deadline
+        self.__clock = clock
+
+    def download_image(self):
+        """
+        Download the image, streaming it so that the download is aborted as soon as the maximum size or the deadline is exceeded
+        :return bytes: The encoded image
+        """
+        start = self.__clock()
+        try:
+            with self.__session.get(self.__imageURL, timeout=self.__timeout, stream=True) as response:
+                response.raise_for_status()
+
+                # Reject the image up front when the server announces its size
+                content_length = response.headers.get('Content-Length')
+                if content_length is not None and content_length.isdigit() and int(content_length) > self.__max_bytes:
+                    raise ImageTooLargeError(f"The image is {content_length} bytes, the limit is {self.__max_bytes} bytes")
+
+                content = bytearray()
+                for chunk in _iter_received(response):
+                    content += chunk
+                    if len(content) > self.__max_bytes:
+                        raise ImageTooLargeError(f"The image exceeds the limit of {self.__max_bytes} bytes")
+                    if self.__deadline is not None and self.__clock() - start > self.__deadline:
+                        raise ImageDownloadError(f"The image could not be downloaded within {self.__deadline} s")
+        except (requests.RequestException, urllib3.exceptions.HTTPError) as error:
+            raise ImageDownloadError(f"The image could not be downloaded: {error}") from error
+
+        return bytes(content)
 
     def get_text_from_image(self):
-        response = requests.get(self.__imageURL)
-        image = Image.open(io.BytesIO(response.content))
-        text = pytesseract.image_to_string(image)
+        with timed_stage('download'):
+            image_bytes = self.download_image()
+
+        cache_tag = self.__ocr_options.cache_tag() if self.__ocr_options is not None else ''
+        cache_key = hashlib.sha256(image_bytes + cache_tag.encode('utf-8')).digest()
+        if self.__cache is not None:
+            text = self.__cache.get(cache_key)
+            if text is not None:
+                return text
+
+        # Run the OCR on the bounded pool, so that concurrent image requests cannot start more Tesseract processes than there are workers
+        # The OCR stage includes the time spent waiting for a free worker
+        with timed_stage('ocr'):
+            text = self.__ocr_executor.submit(recognize_text, image_bytes, self.__ocr_options).result()
 
+        if self.__cache is not None:
+            self.__cache.put(cache_key, text)
         return text
@@ -1,14 +1,54 @@
-import pickle
-from nltk.corpus import twitter_samples
 import numpy as np
 import datetime
-from utils import preprocess_text, build_word_freq_dict
+import math
+import uuid
+from utils import preprocess_text, preprocess_corpus, twitter_sample_tweets
+from word_freq_index import WordFreqIndex, vocabulary_file, remove_unused_vocabularies
+from model_store import save_model, load_model, load_parameters
+from optimizers import NewtonSolver, GradientDescent, FeatureScaler
+from metrics import timed_stage
+from evaluation import evaluate, evaluate_corpus
+from corpus_readers import CorpusReader, count_corpus, preprocess_chunks
+
+PARAMETERS_FILE = "logistic_regression.model"
+
+# Texts whose logit, summed from the contribution table, is closer than this to 0 are scored again by the feature matrix path: the two sums
+# round differently, and the label of a text on the decision boundary must not depend on the path
+EXACT_SCORING_MARGIN = 1e-6
 
 
 class LogisticRegression:
-    def __init__(self):
-        self.__word_freqs = {}
+    # Texts whose predicted probability of being positive is above this threshold are classified as positive
+    decision_threshold = 0.5
+
+    # The files watched by a model registry, which reloads the model when one of them changes; the vocabulary artifact named by the parameters
+    # is written before them and never changed afterwards, so it needs no watching
+    artifact_files = (PARAMETERS_FILE,)
+
+    def __init__(self, training_workers=None, optimizer=None, online_optimizer=None, logit_table=True):
+        """
+        :param int training_workers: The number of processes used to preprocess the training corpus; defaults to the number of CPUs
+        :param optimizer: The optimizer used for training (see the optimizers module); defaults to Newton's method with a line search
+        :param online_optimizer: The optimizer adjusting the weights to the texts of an online update, starting from the current weights;
+                                 defaults to a few steps of gradient descent on the standardized features
+        :param bool logit_table: Flag indicating whether single texts are scored through the table of per-word logit contributions, rebuilt
+                                 every time the weights change; otherwise they are scored through a feature vector
+        """
+        # Identifies the trained / loaded parameters; changes every time the model is retrained or reloaded
+        self.__model_version = None
+        self.__word_index = WordFreqIndex()
         self.__theta = 0
+        self.__scaler = FeatureScaler.identity(3)
+        self.__training_workers = training_workers
+        self.__optimizer = optimizer if optimizer is not None else NewtonSolver()
+        self.__online_optimizer = online_optimizer if online_optimizer is not None else GradientDescent(alpha=0.1, num_iterations=10)
+
+        # The weights and the feature scaling are fixed between two updates, so the logit of a text is an intercept plus one constant per word:
+        #   z = [theta_0 - theta_1 * mean_1 / scale_1 - theta_2 * mean_2 / scale_2] + sum over the words of
+        #       [theta_1 / scale_1 * freq_pos(word) + theta_2 / scale_2 * freq_neg(word)]
+        # The pair (intercept, dictionary word -> contribution) is replaced as a whole when it is rebuilt
+        self.__use_logit_table = logit_table
+        self.__logit_table = (0.0, {})
 
     @staticmethod
     def __sigmoid(z):
@@ -18,182 +58,336 @@ class LogisticRegression:
         """
         return 1 / (1 + np.exp(-z))
 
-    def __gradient_descent(self, x, y, theta, alpha, num_iterations):
+    @staticmethod
+    def __scalar_sigmoid(z):
         """
-        :param x: Matrix of features
-        :param y: Corresponding labels of the input matrix x / target variable
-        :param theta: Weight vector
-        :param alpha: Learning rate
-        :param num_iterations: Number of iterations the model is trained for
-        :return: J: The final cost
-                 theta: The adjusted / final weight vector
+        :param float z: A real number
+        :return float: The sigmoid of z, computed without numpy and without overflowing for large negative values
         """
-        m = x.shape[0]
-        J = 0
-        for i in range(0, num_iterations):
-            # Get the dot product of x and theta
-            z = np.dot(x, theta)
+        if z >= 0:
+            return 1 / (1 + math.exp(-z))
+        exp_z = math.exp(z)
+        return exp_z / (1 + exp_z)
 
-            # Get the sigmoid of h
-            h = self.__sigmoid(z)
+    def __logit_weights(self):
+        """
+        :return: intercept: The logit of a text without any known word
+                 pos_weight, neg_weight: The contribution to the logit of one positive and of one negative count of a word, from the current
+                                         weights and feature scaling
+        """
+        theta = np.reshape(np.asarray(self.__theta, dtype=np.float64), -1)
+        mean = np.asarray(self.__scaler.mean, dtype=np.float64)
+        scale = np.asarray(self.__scaler.scale, dtype=np.float64)
 
-            # Calculate the value of the cost function
-            J = -1. / m * (np.dot(y.transpose(), np.log(h)) + np.dot((1 - y).transpose(), np.log(1 - h)))
+        # Fold the feature scaling into the weights of the two count features, and the bias and the shift by the means into the intercept
+        pos_weight = theta[1] / scale[1]
+        neg_weight = theta[2] / scale[2]
+        intercept = float(theta[0] * (1 - mean[0]) / scale[0] - pos_weight * mean[1] - neg_weight * mean[2])
+        return intercept, pos_weight, neg_weight
 
-            # Update the weights theta
-            theta = theta - (alpha / m) * np.dot(x.transpose(), (h - y))
+    def __compute_logit_table(self):
+        """
+        :return: intercept: The logit of a text without any known word
+                 contributions: A dictionary mapping every word of the vocabulary to its contribution to the logit, from the current weights,
+                                feature scaling and word counts
+        """
+        intercept, pos_weight, neg_weight = self.__logit_weights()
+        contributions = pos_weight * self.__word_index.pos_counts + neg_weight * self.__word_index.neg_counts
+        return intercept, dict(zip(self.__word_index.words, contributions.tolist()))
 
-        return float(J), theta
+    def __rebuild_logit_table(self):
+        # Called every time the weights or the word counts change
+        if self.__use_logit_table:
+            self.__logit_table = self.__compute_logit_table()
 
-    def __extract_features(self, text):
+    def explain(self, text):
         """
-        :param string text: A sequence of words to be analyzed
-        :return: x: A feature vector of dimension (1, 3) for the input text
+        :param string text: The text to be classified
+        :return: The explanation of the polarity of the text (see main.get_text_polarity), whose score is the probability of the text being
+                 positive, and whose intercept and token contributions add up to its logit
         """
-
-        # Preprocess text, removing stop words and punctuation, removing Twitter-specific features and stemming the words from the input text
         words_clean = preprocess_text(text)
-
+        if self.__use_logit_table:
+            intercept, contributions = self.__logit_table
+        else:
+            # Without the table, only the contributions of the words of the text are computed, not those of the whole vocabulary
+            intercept, pos_weight, neg_weight = self.__logit_weights()
+            pos_counts, neg_counts = self.__word_index.pos_counts, self.__word_index.neg_counts
+            contributions = {word: float(pos_weight * pos_counts[word_id] + neg_weight * neg_counts[word_id])
+                             for word, word_id in self.__word_index.feature_ids(words_clean) if word_id is not None}
+        probability = float(np.squeeze(self.__predict_tokens(words_clean)))
+        return {
+            'polarity': self.__polarity(probability),
+            'score': probability,
+            'score_kind': 'probability',
+            'intercept': intercept,
+            'tokens': [{'token': word, 'contribution': contributions.get(word, 0.0)} for word in words_clean],
+        }
+
+    def __features_from_words(self, words_clean):
+        """
+        :param words_clean: The preprocessed tokens of a text
+        :return: x: A feature vector of dimension (1, 3) for the text
+        """
         # Initialize a vector full of 0 values, of dimension 1 x 3
         x = np.zeros((1, 3))
 
         # Bias term is set to 1
         x[0, 0] = 1
 
-        # Loop through each word in the text
-        for word in words_clean:
-            # Increment the word count for the positive label 1
-            x[0, 1] += self.__word_freqs.get((word, 1.0), 0)
-
-            # Increment the word count for the negative label 0
-            x[0, 2] += self.__word_freqs.get((word, 0.0), 0)
+        # Sum up the positive and the negative counts of all words in the text, gathered through their vocabulary ids
+        x[0, 1], x[0, 2] = self.__word_index.features(words_clean)
 
         return x
 
-    def __train_model(self):
+    def __train_model(self, train_x=None, train_y=None):
         # Create a file for writing the results of the training; also mark the results with a timestamp, to keep track of trainings
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         result_file = open("training_results.txt", "a")
         result_file.write("Logistic Regression Training - " + timestamp + "\n")
 
-        # Retrieve the lists of positive and negative tweets from the NLTK sample
-        all_positive_tweets = twitter_samples.strings('positive_tweets.json')
-        all_negative_tweets = twitter_samples.strings('negative_tweets.json')
+        if isinstance(train_x, CorpusReader):
+            # Out-of-core training: count the words of the corpus in a streaming pass, then extract the features in a second pass
+            self.__word_index, document_counts = count_corpus(train_x, workers=self.__training_workers)
+            result_file.write("Corpus documents (negative, positive) = " + str(tuple(document_counts.tolist())) + "\n")
+            result_file.write("Word Frequency Dictionary size: " + str(self.__word_index.pair_count()) + "\n")
+            X, Y = self.__features_from_corpus(train_x)
+        else:
+            if train_x is None:
+                # Retrieve the lists of positive and negative tweets from the NLTK sample
+                all_positive_tweets, all_negative_tweets = twitter_sample_tweets()
 
-        # Split data for training
-        train_positive = all_positive_tweets[:4000]
-        train_negative = all_negative_tweets[:4000]
-        train_x = train_positive + train_negative
+                # Split data for training
+                train_positive = all_positive_tweets[:4000]
+                train_negative = all_negative_tweets[:4000]
+                train_x = train_positive + train_negative
 
-        # Create numpy array for the labels
-        train_y = np.append(np.ones((len(train_positive), 1)), np.zeros((len(train_negative), 1)), axis=0)
-        result_file.write("train_y.shape = " + str(train_y.shape) + "\n")
+                # Create numpy array for the labels
+                train_y = np.append(np.ones((len(train_positive), 1)), np.zeros((len(train_negative), 1)), axis=0)
+            else:
+                # Labels given by the caller (0 for negative and 1 for positive) -> Reshape them into a column vector
+                train_y = np.reshape(np.asarray(train_y, dtype=np.float64), (-1, 1))
+            result_file.write("train_y.shape = " + str(train_y.shape) + "\n")
 
-        # Create word frequency dictionary
-        self.__word_freqs = build_word_freq_dict(train_x, train_y)
+            # Preprocess every tweet once, in parallel, and create word frequency dictionary; convert it into the compact vocabulary index
+            token_lists, word_freqs = preprocess_corpus(train_x, train_y, workers=self.__training_workers)
+            self.__word_index = WordFreqIndex.from_freq_dict(word_freqs)
 
-        # Write the dictionary size
-        result_file.write("Word Frequency Dictionary size: " + str(len(self.__word_freqs.keys())) + "\n")
+            # Write the dictionary size
+            result_file.write("Word Frequency Dictionary size: " + str(self.__word_index.pair_count()) + "\n")
 
-        # Collect the features 'x' and stack them into a matrix 'X'
-        X = np.zeros((len(train_x), 3))
-        for i in range(len(train_x)):
-            X[i, :] = self.__extract_features(train_x[i])
+            # Collect the features 'x' of all texts into a matrix 'X', reusing the tokens of the preprocessing pass
+            X = self.__features_from_tokens(token_lists)
 
-        # Training labels corresponding to X
-        Y = train_y
+            # Training labels corresponding to X
+            Y = train_y
 
-        # Apply gradient descent
-        J, self.__theta = self.__gradient_descent(X, Y, np.zeros((3, 1)), 1e-9, 1500)
+        # Standardize the features, so that the optimizer works on a well conditioned problem; the scaling is stored together with the weights
+        self.__scaler = FeatureScaler().fit(X)
+
+        # Apply the optimizer
+        J, self.__theta, iterations = self.__optimizer.minimize(self.__scaler.transform(X), Y, np.zeros((3, 1)))
 
         # Write the training cost and the weights that will be used for the prediction
+        result_file.write(f"Optimizer: {self.__optimizer.name}, stopped after {iterations} iterations." + "\n")
         result_file.write(f"The cost after training is {J:.8f}." + "\n")
+        result_file.write(f"The feature scaling is mean = {self.__scaler.mean.tolist()}, scale = {self.__scaler.scale.tolist()}" + "\n")
         result_file.write(f"The resulting vector of weights is {[round(t, 8) for t in np.squeeze(self.__theta)]}" + "\n")
         result_file.write("\n")
         result_file.close()
 
-    def test_model(self):
+    def __features_from_corpus(self, corpus):
+        """
+        :param CorpusReader corpus: The training corpus, preprocessed again chunk by chunk; only the feature matrix is kept in memory
+        :return: X: A feature matrix of dimension (m, 3), one row per text of the corpus
+                 Y: The labels of the texts, as a column vector
+        """
+        features = []
+        labels = []
+        for token_lists, chunk_labels in preprocess_chunks(corpus, workers=self.__training_workers):
+            features.append(self.__features_from_tokens(token_lists))
+            labels.extend(chunk_labels)
+        X = np.concatenate(features) if features else np.zeros((0, 3))
+        return X, np.reshape(np.asarray(labels, dtype=np.float64), (-1, 1))
+
+    def test_model(self, test_x=None, test_y=None, workers=None):
         """
         Test the accuracy of the trained logistic regression algorithm
-        :return: accuracy: The accuracy of the algorithm, calculated as being the proportion of correctly calculated tweets out of the entire sample size
+        :param test_x: The texts used for testing, or a CorpusReader streaming them; defaults to the tweets of the NLTK sample which are not used
+                       for training
+        :param test_y: A list corresponding to the sentiment of each testing text (0 for negative and 1 for positive)
+        :param int workers: The number of processes scoring the test set; defaults to the number of CPUs
+        :return: accuracy: The accuracy of the algorithm, calculated as being the proportion of correctly calculated tweets out of the entire
+                           sample size
         """
         # Create a file for writing the results of the testing; also mark the results with a timestamp, to keep track of tests
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         result_file = open("testing_results.txt", "a")
         result_file.write("Logistic Regression Testing - " + timestamp + "\n")
 
-        # Retrieve the lists of positive and negative tweets from the NLTK sample
-        all_positive_tweets = twitter_samples.strings('positive_tweets.json')
-        all_negative_tweets = twitter_samples.strings('negative_tweets.json')
+        if isinstance(test_x, CorpusReader):
+            # Score a test corpus streamed from disk; only the scores and the labels are kept in memory
+            report = evaluate_corpus(self, test_x, workers=workers)
+        else:
+            if test_x is None:
+                # Retrieve the lists of positive and negative tweets from the NLTK sample
+                all_positive_tweets, all_negative_tweets = twitter_sample_tweets()
+
+                # Split the data into data for testing
+                test_positive = all_positive_tweets[4000:]
+                test_negative = all_negative_tweets[4000:]
 
-        # Split the data into data for testing
-        test_positive = all_positive_tweets[4000:]
-        test_negative = all_negative_tweets[4000:]
+                test_x = test_positive + test_negative
+                test_y = np.append(np.ones((len(test_positive), 1)), np.zeros((len(test_negative), 1)), axis=0)
+            else:
+                test_y = np.reshape(np.asarray(test_y, dtype=np.float64), (-1, 1))
 
-        test_x = test_positive + test_negative
-        test_y = np.append(np.ones((len(test_positive), 1)), np.zeros((len(test_negative), 1)), axis=0)
-        result_file.write("test_y.shape = " + str(test_y.shape) + "\n")
+            # Score the whole test set through batched prediction, in parallel chunks, and compute the quality metrics from the score vector
+            report = evaluate(self, test_x, test_y, workers=workers)
+        result_file.write("test_y.shape = " + str((report.size, 1)) + "\n")
 
         # Write the values of the weights used for calculation to the result file
         result_file.write(f"The weights used for prediction is {[round(t, 8) for t in np.squeeze(self.__theta)]}" + "\n")
 
-        # Create a list for storing prediction results
-        y_hat = []
-
-        for text in test_x:
-            # Get the label prediction for the text (between 0 and 1, with < 0.5 meaning negative, and > meaning positive sentiments)
-            y_prediction = self.__predict_text(text)
-
-            if y_prediction > 0.5:
-                # Positive prediction
-                y_hat.append(1)
-            else:
-                # Negative prediction
-                y_hat.append(0)
-
-        # Type conversions: y_hat is a list and test_y is an array -> Convert them both to list objects, so that equality operator can be used for comparison
-        y_hat = np.array(y_hat)
-        copy_test_y = test_y.reshape(-1)
-
-        # Calculate the accuracy of prediction
-        accuracy = np.sum((copy_test_y == y_hat).astype(int)) / len(copy_test_y)
-        result_file.write("Accuracy: " + str(accuracy) + "\n")
+        for line in report.report_lines():
+            result_file.write(line + "\n")
         result_file.close()
 
-        return accuracy
+        return report.accuracy
 
     def __write_results_to_file(self):
-        # Write the word frequency dictionary into a separate json file
-        pickle.dump(self.__word_freqs, open("word_freqs.json", "wb"))
+        # Write the word frequency index into its vocabulary artifact, shared with the other classifier when both hold the same counts
+        vocabulary_name = self.__word_index.save_shared()
 
-        # Write the prediction parameters into a separate file
-        params = {'theta': self.__theta}
-        pickle.dump(params, open("parameters.json", "wb"))
+        # Write the prediction parameters into a separate artifact, tied to the vocabulary they were trained on
+        params = {'theta': self.__theta, 'feature_mean': self.__scaler.mean, 'feature_scale': self.__scaler.scale}
+        metadata = {'kind': 'logistic_regression', 'vocab_checksum': self.__word_index.checksum, 'vocabulary_file': vocabulary_name}
+        save_model(PARAMETERS_FILE, params, metadata)
+        remove_unused_vocabularies()
 
-    def execute(self):
-        self.__train_model()
+    def execute(self, train_x=None, train_y=None):
+        """
+        Train the model and write it into the model artifacts
+        :param train_x: The texts used for training, or a CorpusReader streaming them from disk (see corpus_readers); defaults to the first 4000
+                        positive and 4000 negative tweets of the NLTK sample
+        :param train_y: A list corresponding to the sentiment of each training text (0 for negative and 1 for positive); not used with a
+                        CorpusReader
+        """
+        self.__train_model(train_x, train_y)
         self.__write_results_to_file()
+        self.__rebuild_logit_table()
+        self.__model_version = uuid.uuid4().hex
 
     def __load_data_from_files(self):
-        # Read the word frequency dictionary from the json file
-        self.__word_freqs = pickle.load(open("word_freqs.json", "rb"))
+        # Open the word frequency index the parameters were trained on; the counts are memory-mapped, not deserialized
+        self.__word_index = WordFreqIndex.load(vocabulary_file(PARAMETERS_FILE, load_model(PARAMETERS_FILE).metadata))
+
+        # Read the parameters from the appropriate artifact
+        params = load_parameters(PARAMETERS_FILE, 'logistic_regression', self.__word_index.checksum)
+        self.__theta = params['theta']
 
-        # Read the parameters from the appropriate file
-        self.__theta = pickle.load(open("parameters.json", "rb"))["theta"]
+        # Weights trained without feature scaling have no scaling arrays -> use the features as they are
+        if 'feature_mean' in params.arrays:
+            self.__scaler = FeatureScaler(params['feature_mean'], params['feature_scale'])
+        else:
+            self.__scaler = FeatureScaler.identity(3)
 
     def load(self):
         self.__load_data_from_files()
+        self.__rebuild_logit_table()
+        self.__model_version = uuid.uuid4().hex
+
+    def save(self):
+        """
+        Write the current state of the model (e.g. after online updates) into the model artifacts
+        """
+        self.__write_results_to_file()
+
+    def partial_fit(self, texts, labels):
+        """
+        Update the model with new labelled texts, without retraining: the word counts are updated in place (words seen for the first time are
+        added to the vocabulary), then the weights take a few optimizer steps on the new texts, starting from the current weights.
+        The feature scaling of the last full training is kept. Not thread-safe with respect to other updates; predictions may run concurrently.
+        :param texts: A list of texts
+        :param labels: A list corresponding to the sentiment of each text (0 for negative and 1 for positive)
+        """
+        token_lists = [preprocess_text(text) for text in texts]
+        y = np.reshape(np.asarray(labels, dtype=np.float64), (-1, 1))
+
+        self.__word_index.update(token_lists, y)
+
+        # The optimizer returns new weights, so predictions running meanwhile keep using the previous ones
+        X = self.__scaler.transform(self.__features_from_tokens(token_lists))
+        _, self.__theta, _ = self.__online_optimizer.minimize(X, y, np.array(self.__theta, dtype=np.float64).reshape(-1, 1))
+        self.__rebuild_logit_table()
+
+        self.__model_version = uuid.uuid4().hex
+
+    @property
+    def model_version(self):
+        """
+        :return string: The version of the parameters currently used for prediction; used to invalidate cached predictions
+        """
+        return self.__model_version
 
     def __predict_text(self, text):
-        # Extract the features of the text and store them into x
-        x = self.__extract_features(text)
+        # Preprocess text, removing stop words and punctuation, removing Twitter-specific features and stemming the words from the input text
+        words_clean = preprocess_text(text)
+        return self.__predict_tokens(words_clean)
+
+    def __predict_tokens(self, words_clean):
+        with timed_stage('score'):
+            if self.__use_logit_table:
+                # Sum the precomputed contributions of the words in plain Python: no feature vector and no numpy call for a single text
+                intercept, contributions = self.__logit_table
+                z = intercept
+                for word in words_clean:
+                    z += contributions.get(word, 0.0)
 
-        # Make the prediction by applying the sigmoid function using the calculated weights
-        return self.__sigmoid(np.dot(x, self.__theta))
+                # Away from the decision boundary, the sign of z gives the same label as the feature vector path
+                if abs(z) > EXACT_SCORING_MARGIN:
+                    return self.__scalar_sigmoid(z)
+
+            # Extract the features of the text and store them into x
+            x = self.__features_from_words(words_clean)
+
+            # Make the prediction by applying the sigmoid function using the calculated weights
+            return self.__sigmoid(np.dot(self.__scaler.transform(x), self.__theta))
+
+    def __features_from_tokens(self, token_lists):
+        """
+        :param token_lists: A list of lists of preprocessed tokens
+        :return: X: A feature matrix of dimension (len(token_lists), 3), one row per text
+        """
+        X = np.zeros((len(token_lists), 3))
+
+        # Bias term is set to 1 for every row
+        X[:, 0] = 1
+
+        X[:, 1:] = self.__word_index.batch_features(token_lists)
+
+        return X
+
+    def __predict_batch(self, texts):
+        token_lists = [preprocess_text(text) for text in texts]
+
+        with timed_stage('score_batch'):
+            # Build one feature matrix for the whole batch and apply the sigmoid function once
+            X = self.__features_from_tokens(token_lists)
+            return self.__sigmoid(np.dot(self.__scaler.transform(X), self.__theta)).reshape(-1)
+
+    def predict_scores(self, texts):
+        """
+        :param texts: A list of texts to be scored
+        :return: A vector with the probability of each text being positive, in the same order as the input
+        """
+        return self.__predict_batch(texts)
 
     def predict_text_polarity(self, text):
-        prediction = self.__predict_text(text)
+        return self.__polarity(self.__predict_text(text))
 
+    @staticmethod
+    def __polarity(prediction):
         if prediction > 0.5:
             return "POSITIVE"
         else:
@@ -201,3 +395,12 @@ class LogisticRegression:
                 return "NEUTRAL"
             else:
                 return "NEGATIVE"
+
+    def predict_batch(self, texts):
+        """
+        :param texts: A list of texts to be classified
+        :return: A list with the polarity of each text, in the same order as the input
+        """
+        predictions = self.__predict_batch(texts)
+        labels = np.where(predictions > 0.5, "POSITIVE", np.where(predictions == 0.5, "NEUTRAL", "NEGATIVE"))
+        return labels.tolist()
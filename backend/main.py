@@ -1,40 +1,477 @@
-from logistic_regression import LogisticRegression
-from naive_bayes import NaiveBayes
+import argparse
+import itertools
+import os
+import threading
+import time
 from flask import *
-from image_scanner import ImageScanner
+from prediction_cache import PredictionCache
+from utils import get_default_preprocessor, parse_label
+from metrics import registry, set_stage_timing
+from profiler import SamplingProfiler
+from segmentation import iter_segments, iter_decoded, DEFAULT_MAX_CHARS
+from model_registry import ModelRegistry, UnknownModelError, MODELS, DEFAULT_MODEL, DEFAULT_POLL_INTERVAL
+from online_learning import OnlineLearner, DEFAULT_SNAPSHOT_INTERVAL
+from micro_batching import MicroBatcher, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT
 
-app = Flask(__name__)
+# Number of segments of a streamed document scored together
+STREAM_BATCH_SIZE = 16
 
+# Largest number of concurrent single-text requests scored together by default: 1 disables the micro-batching, which only pays off under high
+# concurrency and otherwise adds latency; it is enabled with a larger size, e.g. DEFAULT_MAX_BATCH_SIZE
+DEFAULT_REQUEST_BATCH_SIZE = 1
 
-@app.route('/')
+# Texts scored once before the server accepts traffic, so that no request pays for the first-use initialization
+WARM_UP_TEXTS = [
+    "RT @user: I love this beautiful day, thank you so much! :) https://t.co/example #happy",
+    "This is terrible, I am so sad and disappointed right now :(",
+]
+
+api = Blueprint('api', __name__)
+
+REQUESTS_TOTAL = registry.counter('sentiment_requests_total', 'Number of handled requests', ('endpoint', 'status'))
+REQUEST_ERRORS = registry.counter('sentiment_request_errors_total', 'Number of requests which failed with a server error', ('endpoint',))
+REQUESTS_IN_FLIGHT = registry.gauge('sentiment_requests_in_flight', 'Number of requests currently being handled', ('endpoint',))
+REQUEST_SECONDS = registry.histogram('sentiment_request_seconds', 'Latency of the requests, in seconds', ('endpoint',))
+FEEDBACK_TEXTS = registry.counter('sentiment_feedback_texts_total', 'Number of labelled feedback texts received', ('label',))
+PREDICTION_CACHE_STATS = registry.gauge('sentiment_prediction_cache', 'Counters and size of the prediction cache', ('statistic',))
+WARM_UP_SECONDS = registry.gauge('sentiment_warm_up_seconds', 'Duration of each phase of the warm-up, in seconds', ('phase',))
+
+
+@api.route('/')
 def home():
     output = '<h1> API Reference - Endpoints Documentation'
+    output += '<p> Every polarity endpoint accepts an optional field with key "model" (or a "model" query parameter), which selects the '
+    output += 'classifier: "logistic_regression" (the default) or "naive_bayes" </p>'
     output += '<h3> /api/get_text_polarity </h3>'
     output += '<p> Method: [POST] </p>'
-    output += '<p> Input: JSON, containing at least one field with key "text", which contains the text to be analysed </p>'
-    output += '<p> Returns: JSON, containing a field with key "polarity", which contains the polarity of the given text</p>'
+    output += '<p> Input: JSON, containing at least one field with key "text", which contains the text to be analysed, and an optional field '
+    output += '"explain" which, set to true, asks for the contribution of each token to the score </p>'
+    output += '<p> Returns: JSON, containing a field with key "polarity", which contains the polarity of the given text; with "explain", also a '
+    output += 'field with key "explanation", which contains the same fields for every model: "score", the score of the text, "score_kind", '
+    output += 'what the score is ("probability" of being positive for logistic regression, "log_odds" of being positive for naive bayes), '
+    output += '"intercept", the part of the score which does not depend on the tokens, and "tokens", the list of the preprocessed tokens with '
+    output += 'their "contribution" to the score (to the logit of the probability for logistic regression)</p>'
+    output += '</br>'
+    output += '<h3> /api/get_text_polarity_batch </h3>'
+    output += '<p> Method: [POST] </p>'
+    output += '<p> Input: JSON, containing a field with key "texts", which contains the list of texts to be analysed </p>'
+    output += '<p> Returns: JSON, containing a field with key "polarities", which contains the polarity of each text, in the same order</p>'
+    output += '</br>'
+    output += '<h3> /api/get_text_polarity_stream </h3>'
+    output += '<p> Method: [POST] </p>'
+    output += '<p> Input: JSON, containing a field with key "text", which contains the document to be analysed, and optional fields "mode" '
+    output += '("sentence", the default, or "chunk") and "max_chars" (the maximum length of a segment, 1000 by default); or the document '
+    output += 'itself as a text/plain body, with the options as query parameters, which lets the server analyse it while it is uploaded </p>'
+    output += '<p> Returns: NDJSON, one line per sentence or chunk, as soon as it is analysed, containing the fields "index", "start" and "end" '
+    output += '(the character offsets of the segment in the document) and "polarity"; the last line contains a field with key "summary", '
+    output += 'which contains the number of segments of each polarity </p>'
+    output += '</br>'
+    output += '<h3> /api/feedback </h3>'
+    output += '<p> Method: [POST] </p>'
+    output += '<p> Input: JSON, containing either the fields "text" and "label", or the fields "texts" and "labels"; a label is 1, "POSITIVE" '
+    output += '(or "pos", "true") for a positive text, and 0, "NEGATIVE" (or "neg", "false") for a negative one, in any case. With an '
+    output += 'optional field "flush" set to true, the feedback is applied before the response is sent </p>'
+    output += '<p> Returns: JSON, containing the number of texts waiting to be applied to the models, and the model versions if flushed</p>'
+    output += '</br>'
+    output += '<h3> /api/models </h3>'
+    output += '<p> Method: [GET] </p>'
+    output += '<p> Returns: JSON, containing the default model and the version of every served model</p>'
+    output += '</br>'
+    output += '<h3> /api/cache_stats </h3>'
+    output += '<p> Method: [GET] </p>'
+    output += '<p> Returns: JSON, containing the hit, miss and eviction counters and the size of the prediction cache</p>'
+    output += '</br>'
+    output += '<h3> /api/batching_stats </h3>'
+    output += '<p> Method: [GET] </p>'
+    output += '<p> Returns: JSON, containing the limits of the micro-batching of concurrent /api/get_text_polarity requests (maximum batch size '
+    output += 'and wait), the number of queued texts, and the number, mean size and mean wait of the flushed batches</p>'
+    output += '</br>'
+    output += '<h3> /metrics </h3>'
+    output += '<p> Method: [GET] </p>'
+    output += '<p> Returns: Per-stage latency histograms, request counts, error counts and in-flight gauges, in Prometheus text format</p>'
     output += '</br>'
     return output
 
 
-@app.route('/api/get_text_polarity', methods=['POST'])
+def requested_classifier(data_json):
+    """
+    :param data_json: The JSON body of the request
+    :return: The current classifier of the model named by the request, or of the default model; the same object is used for the whole request
+    """
+    model = data_json.get('model') if isinstance(data_json, dict) else None
+    return current_app.config['MODEL_REGISTRY'].get(model or request.args.get('model'))
+
+
+@api.route('/api/get_text_polarity', methods=['POST'])
 def get_text_polarity():
+    prediction_cache = current_app.config['PREDICTION_CACHE']
     data_json = request.get_json()
+    classifier = requested_classifier(data_json)
     text = data_json['text']
-    text_polarity = classifier.predict_text_polarity(text)
+
+    # Explanations bypass the prediction cache: they are larger than the polarity, and only requested while inspecting a model.
+    # Every classifier explains a text with the same fields:
+    #   score       - the score the polarity is decided on
+    #   score_kind  - what the score is: 'probability' (logistic regression) or 'log_odds' (naive bayes) of the text being positive
+    #   intercept   - the part of the log odds (the logit) which does not depend on the tokens
+    #   tokens      - the preprocessed tokens, in order, each one as {'token', 'contribution'}: its addition to the log odds, 0 when unknown
+    if data_json.get('explain'):
+        explanation = classifier.explain(text)
+        return jsonify({'polarity': explanation.pop('polarity'), 'explanation': explanation})
+
+    cache_key = prediction_cache.make_key(text, classifier.model_version)
+
+    # Texts of concurrent requests are scored together by the micro-batching scheduler, unless it is disabled
+    micro_batcher = current_app.config['MICRO_BATCHER']
+    if micro_batcher is not None:
+        text_polarity = prediction_cache.get_or_compute(cache_key, lambda: micro_batcher.predict(classifier, text))
+    else:
+        text_polarity = prediction_cache.get_or_compute(cache_key, lambda: classifier.predict_text_polarity(text))
     return jsonify({'polarity': text_polarity})
 
 
-@app.route('/api/get_image_text_polarity', methods=['POST'])
+@api.route('/api/get_text_polarity_batch', methods=['POST'])
+def get_text_polarity_batch():
+    prediction_cache = current_app.config['PREDICTION_CACHE']
+    data_json = request.get_json()
+    classifier = requested_classifier(data_json)
+    try:
+        texts = texts_from_json(data_json)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    return jsonify({'polarities': cached_polarities(classifier, prediction_cache, texts)})
+
+
+def texts_from_json(data_json):
+    """
+    :param data_json: The JSON body of a batch request
+    :return: The list of texts of the request
+    """
+    if not isinstance(data_json, dict):
+        raise ValueError("Expected a JSON object")
+
+    texts = data_json.get('texts')
+    # A single string would otherwise be taken as a list of one-character texts
+    if not isinstance(texts, list):
+        raise ValueError('The field "texts" must be a list')
+    if not all(isinstance(text, str) for text in texts):
+        raise ValueError("Every text must be a string")
+    return texts
+
+
+def cached_polarities(classifier, prediction_cache, texts):
+    """
+    Answer the texts seen before from the cache, and score all the remaining ones in a single batch
+    :return: A list with the polarity of each text, in the same order as the input
+    """
+    model_version = classifier.model_version
+    cache_keys = [prediction_cache.make_key(text, model_version) for text in texts]
+    text_polarities = [prediction_cache.get(cache_key) for cache_key in cache_keys]
+    misses = [i for i, polarity in enumerate(text_polarities) if polarity is None]
+    if misses:
+        for i, polarity in zip(misses, classifier.predict_batch([texts[i] for i in misses])):
+            text_polarities[i] = polarity
+            prediction_cache.put(cache_keys[i], polarity)
+    return text_polarities
+
+
+def stream_polarities(classifier, prediction_cache, segments, batch_size=STREAM_BATCH_SIZE):
+    """
+    Generator pipeline scoring the segments of a document in small batches
+    :param segments: An iterable of tuples (start, end, segment)
+    :return: A generator of NDJSON lines, one per segment, followed by a summary line
+    """
+    summary = {}
+    index = 0
+    batch = []
+    for segment in itertools.chain(segments, [None]):
+        if segment is not None:
+            batch.append(segment)
+            if len(batch) < batch_size:
+                continue
+        if not batch:
+            break
+
+        for (start, end, _), polarity in zip(batch, cached_polarities(classifier, prediction_cache, [text for _, _, text in batch])):
+            summary[polarity] = summary.get(polarity, 0) + 1
+            yield json.dumps({'index': index, 'start': start, 'end': end, 'polarity': polarity}) + '\n'
+            index += 1
+        batch = []
+
+    yield json.dumps({'summary': {'segments': index, **summary}}) + '\n'
+
+
+@api.route('/api/get_text_polarity_stream', methods=['POST'])
+def get_text_polarity_stream():
+    prediction_cache = current_app.config['PREDICTION_CACHE']
+
+    # A text/plain body is decoded and segmented while it is read, so the server never holds the whole document
+    if request.mimetype == 'text/plain':
+        options = request.args
+        classifier = requested_classifier(None)
+        charset = request.mimetype_params.get('charset', 'utf-8')
+        try:
+            blocks = iter_decoded(request.stream, charset)
+        except LookupError:
+            # Checked before the response starts: once the headers of the stream are sent, the error could not be reported anymore
+            return jsonify({'error': f"Unknown charset '{charset}'"}), 400
+    else:
+        options = request.get_json()
+        classifier = requested_classifier(options)
+        blocks = [options['text']]
+
+    try:
+        segments = iter_segments(blocks, options.get('mode', 'sentence'), int(options.get('max_chars', DEFAULT_MAX_CHARS)))
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+    lines = stream_polarities(classifier, prediction_cache, segments)
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+
+@api.route('/api/get_image_text_polarity', methods=['POST'])
 def get_image_text_polarity():
+    # The OCR stack (requests, Pillow, pytesseract) is imported by the first image request, so that serving only texts never loads it
+    from image_scanner import ImageScanner, ImageTooLargeError, ImageDownloadError, ImageFormatError, OcrError
+
+    prediction_cache = current_app.config['PREDICTION_CACHE']
     data_json = request.get_json()
+    classifier = requested_classifier(data_json)
     image_url = data_json['image_url']
-    image_scanner = ImageScanner(image_url)
-    text_polarity = classifier.predict_text_polarity(image_scanner.get_text_from_image())
+    try:
+        # The image behind a URL may change, so results are not cached by URL: the image is downloaded on every request, and only its OCR
+        # (cached by the content of the image) and the polarity of the recognized text are cached
+        text = ImageScanner(image_url).get_text_from_image()
+    except ImageTooLargeError as error:
+        return jsonify({'error': str(error)}), 413
+    except ImageDownloadError as error:
+        return jsonify({'error': str(error)}), 502
+    except ImageFormatError as error:
+        return jsonify({'error': str(error)}), 422
+    except OcrError as error:
+        return jsonify({'error': str(error)}), 502
+
+    cache_key = prediction_cache.make_key(text, classifier.model_version)
+    text_polarity = prediction_cache.get_or_compute(cache_key, lambda: classifier.predict_text_polarity(text))
     return jsonify({'polarity': text_polarity})
 
 
-classifier = LogisticRegression()
-classifier.load()
-app.run()
+def feedback_from_json(data_json):
+    """
+    :param data_json: The JSON body of a feedback request
+    :return: texts: The list of texts of the request
+             labels: The list of their labels, parsed with parse_label
+    """
+    if not isinstance(data_json, dict):
+        raise ValueError("Expected a JSON object")
+
+    if 'texts' in data_json or 'labels' in data_json:
+        texts, labels = data_json.get('texts'), data_json.get('labels')
+        # A single string would otherwise be taken as a list of one-character texts
+        if not isinstance(texts, list) or not isinstance(labels, list):
+            raise ValueError('The fields "texts" and "labels" must both be lists')
+    elif 'text' in data_json and 'label' in data_json:
+        texts, labels = [data_json['text']], [data_json['label']]
+    else:
+        raise ValueError('Expected either the fields "text" and "label", or the fields "texts" and "labels"')
+
+    if not all(isinstance(text, str) for text in texts):
+        raise ValueError("Every text must be a string")
+    if len(texts) != len(labels):
+        raise ValueError(f"Got {len(texts)} texts and {len(labels)} labels")
+    return texts, [parse_label(label) for label in labels]
+
+
+@api.route('/api/feedback', methods=['POST'])
+def post_feedback():
+    online_learner = current_app.config['ONLINE_LEARNER']
+    data_json = request.get_json()
+
+    try:
+        texts, labels = feedback_from_json(data_json)
+        pending = online_learner.submit(texts, labels)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+    for label in labels:
+        FEEDBACK_TEXTS.inc('POSITIVE' if label else 'NEGATIVE')
+
+    if data_json.get('flush'):
+        return jsonify({'pending': 0, 'models': online_learner.flush()})
+    return jsonify({'pending': pending}), 202
+
+
+@api.route('/api/models', methods=['GET'])
+def get_models():
+    model_registry = current_app.config['MODEL_REGISTRY']
+    return jsonify({'default': model_registry.default, 'models': model_registry.versions()})
+
+
+@api.app_errorhandler(UnknownModelError)
+def handle_unknown_model(error):
+    return jsonify({'error': str(error)}), 400
+
+
+@api.route('/api/cache_stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(current_app.config['PREDICTION_CACHE'].stats())
+
+
+@api.route('/api/batching_stats', methods=['GET'])
+def get_batching_stats():
+    micro_batcher = current_app.config['MICRO_BATCHER']
+    return jsonify(micro_batcher.stats() if micro_batcher is not None else {'enabled': False})
+
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    for statistic, value in current_app.config['PREDICTION_CACHE'].stats().items():
+        PREDICTION_CACHE_STATS.set(value, statistic)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@api.before_app_request
+def start_request_metrics():
+    g.metrics_endpoint = request.endpoint or 'unknown'
+    g.metrics_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc(g.metrics_endpoint)
+
+    # The processing stages are only timed on the request path (see metrics.stage_timing_enabled)
+    set_stage_timing(True)
+
+    # The sampling profiler is only started for requests asking for it, and only when profiling is enabled for the server
+    if current_app.config['PROFILING_ENABLED'] and request.headers.get('X-Profile') == '1':
+        g.profiler = SamplingProfiler(threading.get_ident()).start()
+
+
+@api.after_app_request
+def record_request_metrics(response):
+    REQUESTS_TOTAL.inc(g.metrics_endpoint, str(response.status_code))
+    if response.status_code >= 500:
+        REQUEST_ERRORS.inc(g.metrics_endpoint)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+
+        # The body of a streamed response is only produced while it is sent, so it cannot carry the profile
+        body = response.get_json(silent=True) if not response.is_streamed else None
+        if isinstance(body, dict):
+            body['profile'] = {'samples': profiler.sample_count, 'stacks': profiler.collapsed()}
+            response.set_data(json.dumps(body))
+    return response
+
+
+@api.teardown_app_request
+def finish_request_metrics(error):
+    if 'metrics_start' in g:
+        REQUESTS_IN_FLIGHT.dec(g.metrics_endpoint)
+        REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_start, g.metrics_endpoint)
+    set_stage_timing(False)
+
+
+def warm_up(model_registry):
+    """
+    Initialize everything which is otherwise created lazily by the first request: the preprocessing resources (stopword corpus, tokenizer,
+    stemmer), the vocabulary of every served model and the prediction code paths. The duration of each phase is exported as a metric.
+    :param ModelRegistry model_registry: The registry holding the served classifiers
+    :return: A dictionary mapping each phase ('preprocessor', then the name of each model) to the number of seconds it took
+    """
+    timings = {}
+    start = time.perf_counter()
+    get_default_preprocessor()
+    timings['preprocessor'] = time.perf_counter() - start
+
+    for name, classifier in model_registry.classifiers().items():
+        start = time.perf_counter()
+        for text in WARM_UP_TEXTS:
+            classifier.predict_text_polarity(text)
+        classifier.predict_batch(WARM_UP_TEXTS)
+        timings[name] = time.perf_counter() - start
+
+    for phase, seconds in timings.items():
+        WARM_UP_SECONDS.set(seconds, phase)
+    return timings
+
+
+def create_app(classifier=None, model=None, profiling=None, poll_interval=None, snapshot_interval=None, max_batch_size=None,
+               max_batch_wait=None):
+    """
+    Application factory
+    :param classifier: An already loaded classifier, served as the only model; when None, all models are loaded into a model registry
+    :param string model: The name of the default model (or of the given classifier); defaults to the SENTIMENT_MODEL environment variable,
+                         or logistic regression
+    :param bool profiling: Flag allowing clients to profile single requests with the "X-Profile: 1" header; defaults to the
+                           SENTIMENT_PROFILING environment variable
+    :param poll_interval: Seconds between two checks of the model artifacts for changes, 0 disabling the reloads; defaults to the
+                          SENTIMENT_POLL_INTERVAL environment variable
+    :param snapshot_interval: Seconds between two snapshots of the models updated from feedback, 0 disabling the snapshots; defaults to the
+                              SENTIMENT_SNAPSHOT_INTERVAL environment variable
+    :param int max_batch_size: The largest number of texts of concurrent single-text requests scored together, 1 disabling the
+                               micro-batching; defaults to the SENTIMENT_MAX_BATCH_SIZE environment variable, or 1
+    :param max_batch_wait: Seconds a single-text request waits at most to be batched with others; defaults to the SENTIMENT_MAX_BATCH_WAIT
+                           environment variable
+    :return Flask: The WSGI application
+    """
+    model = model or os.environ.get('SENTIMENT_MODEL', DEFAULT_MODEL)
+    if poll_interval is None:
+        poll_interval = float(os.environ.get('SENTIMENT_POLL_INTERVAL', DEFAULT_POLL_INTERVAL))
+
+    if classifier is None:
+        model_registry = ModelRegistry(default=model, poll_interval=poll_interval, watch=poll_interval > 0).load_all()
+    else:
+        model_registry = ModelRegistry([model], default=model, poll_interval=poll_interval, watch=poll_interval > 0)
+        model_registry.put(model, classifier)
+
+    app = Flask(__name__)
+    app.config['MODEL_REGISTRY'] = model_registry
+
+    if snapshot_interval is None:
+        snapshot_interval = float(os.environ.get('SENTIMENT_SNAPSHOT_INTERVAL', DEFAULT_SNAPSHOT_INTERVAL))
+    app.config['ONLINE_LEARNER'] = OnlineLearner(model_registry, snapshot_interval=snapshot_interval or None)
+    app.config['PREDICTION_CACHE'] = PredictionCache()
+
+    if max_batch_size is None:
+        max_batch_size = int(os.environ.get('SENTIMENT_MAX_BATCH_SIZE', DEFAULT_REQUEST_BATCH_SIZE))
+    if max_batch_wait is None:
+        max_batch_wait = float(os.environ.get('SENTIMENT_MAX_BATCH_WAIT', DEFAULT_MAX_WAIT))
+    app.config['MICRO_BATCHER'] = MicroBatcher(max_batch_size, max_batch_wait) if max_batch_size > 1 else None
+    app.config['PROFILING_ENABLED'] = profiling if profiling is not None else os.environ.get('SENTIMENT_PROFILING') == '1'
+    app.register_blueprint(api)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sentiment analysis API server")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to listen on (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=5000, help="Port to listen on (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes (default: %(default)s)")
+    parser.add_argument('--model', choices=sorted(MODELS), default=os.environ.get('SENTIMENT_MODEL', DEFAULT_MODEL),
+                        help="Classifier used by requests which do not select one (default: %(default)s)")
+    parser.add_argument('--poll-interval', type=float, default=None,
+                        help=f"Seconds between two checks of the model artifacts for changes, 0 disables the reloads "
+                             f"(default: {DEFAULT_POLL_INTERVAL})")
+    parser.add_argument('--max-batch-size', type=int, default=None,
+                        help=f"Largest number of concurrent single-text requests scored together, e.g. {DEFAULT_MAX_BATCH_SIZE}; "
+                             f"1 disables the batching (default: {DEFAULT_REQUEST_BATCH_SIZE})")
+    parser.add_argument('--max-batch-wait', type=float, default=None,
+                        help=f"Seconds a single-text request waits at most to be batched with others (default: {DEFAULT_MAX_WAIT})")
+    parser.add_argument('--profiling', action='store_true', help="Allow profiling single requests with the 'X-Profile: 1' header")
+    args = parser.parse_args(argv)
+
+    # Load and warm up the models once, before forking, so that the worker processes share their memory pages copy-on-write; each worker
+    # watches the model artifacts with its own thread, started by its first request
+    app = create_app(model=args.model, profiling=args.profiling or None, poll_interval=args.poll_interval, max_batch_size=args.max_batch_size,
+                     max_batch_wait=args.max_batch_wait)
+    model_registry = app.config['MODEL_REGISTRY']
+    timings = warm_up(model_registry)
+    phases = ', '.join(f"{phase} {seconds * 1000:.1f} ms" for phase, seconds in timings.items())
+    print(f"Loaded {', '.join(model_registry.names)} (default: {model_registry.default}), "
+          f"warm-up took {sum(timings.values()) * 1000:.1f} ms ({phases})")
+
+    from server import serve
+    serve(app, args.host, args.port, args.workers)
+
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import bisect
+import math
+import threading
+import time
+
+# Histogram bucket upper bounds, in seconds, covering the range from sub-millisecond scoring up to multi-second OCR
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = [(name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')) for name, value in pairs]
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        with self._lock:
+            items = sorted(self._values.items())
+            for label_values, value in items:
+                lines.extend(self._render_value(label_values, value))
+        return lines
+
+    def _render_value(self, label_values, value):
+        return [f'{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    """
+    A value which only increases (e.g. the number of handled requests)
+    """
+    type_name = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+
+class Gauge(Counter):
+    """
+    A value which can go up and down (e.g. the number of requests in flight)
+    """
+    type_name = 'gauge'
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values (e.g. latencies), counted in cumulative buckets
+    """
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        # Each series holds [count per bucket (the last one being +Inf), sum of the observed values]
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *label_values):
+        with self._lock:
+            series = self._values.get(label_values)
+            return sum(series[0]) if series is not None else 0
+
+    def _render_value(self, label_values, series):
+        counts, total = series
+        lines = []
+        cumulative = 0
+        for upper_bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            labels = _format_labels(self.label_names, label_values, [('le', _format_value(upper_bound))])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.label_names, label_values)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics, rendered together in the Prometheus text exposition format.
+    Metrics live in the memory of the process -> with several worker processes, each worker reports its own values.
+    """
+
+    def __init__(self):
+        self.__metrics = {}
+        self.__lock = threading.Lock()
+
+    def __register(self, metric_class, name, *args, **kwargs):
+        with self.__lock:
+            if name not in self.__metrics:
+                self.__metrics[name] = metric_class(name, *args, **kwargs)
+            return self.__metrics[name]
+
+    def counter(self, name, documentation, label_names=()):
+        return self.__register(Counter, name, documentation, label_names)
+
+    def gauge(self, name, documentation, label_names=()):
+        return self.__register(Gauge, name, documentation, label_names)
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self.__register(Histogram, name, documentation, label_names, buckets=buckets)
+
+    def render(self):
+        """
+        :return string: All metrics, in the Prometheus text exposition format (version 0.0.4)
+        """
+        with self.__lock:
+            metrics = list(self.__metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+# Latency of the stages of the hot path: text cleaning, tokenizing, stop word filtering + stemming, scoring, image download and OCR
+STAGE_SECONDS = registry.histogram('sentiment_stage_seconds', 'Latency of each processing stage, in seconds', ('stage',))
+
+# The stages are only timed in the threads serving a request: training, evaluation and the benchmarks run the same code on whole corpora, where
+# the clock reads and the locked histogram updates would slow them down noticeably
+_stage_timing = threading.local()
+
+
+def stage_timing_enabled():
+    """
+    :return bool: Flag indicating whether the stages executed by the current thread are timed
+    """
+    return getattr(_stage_timing, 'enabled', False)
+
+
+def set_stage_timing(enabled):
+    """
+    Enable or disable the timing of the stages executed by the current thread (enabled by the server for the duration of each request)
+    :param bool enabled: Flag indicating whether the stages are timed
+    :return bool: The previous value of the flag
+    """
+    previous = stage_timing_enabled()
+    _stage_timing.enabled = enabled
+    return previous
+
+
+def observe_stage(stage, seconds):
+    """
+    Record the duration of one execution of a processing stage
+    :param string stage: The name of the stage
+    :param seconds: The duration, in seconds
+    """
+    STAGE_SECONDS.observe(seconds, stage)
+
+
+class timed_stage:
+    """
+    Context manager recording the duration of the enclosed block as one execution of a processing stage, when the stages executed by the
+    current thread are timed
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter() if stage_timing_enabled() else None
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.start is not None:
+            STAGE_SECONDS.observe(time.perf_counter() - self.start, self.stage)
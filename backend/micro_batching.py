@@ -0,0 +1,207 @@
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from metrics import registry, set_stage_timing
+
+# Largest number of texts scored together by one flush
+DEFAULT_MAX_BATCH_SIZE = 32
+
+# Seconds a text waits at most for other texts to be batched with it
+DEFAULT_MAX_WAIT = 0.002
+
+# Seconds predict() waits at most for the scoring thread before it scores the text itself
+DEFAULT_RESULT_TIMEOUT = 1.0
+
+BATCH_SIZE = registry.histogram('sentiment_micro_batch_size', 'Number of texts scored together by the micro-batching scheduler', (),
+                                buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+BATCH_WAIT_SECONDS = registry.histogram('sentiment_micro_batch_wait_seconds', 'Time a text waits in the micro-batching queue, in seconds')
+
+
+class MicroBatcher:
+    """
+    Scheduler collecting the texts of concurrent single-text requests into batches, scored by one batched prediction from a background
+    thread. A queue is flushed as soon as it holds max_batch_size texts, or when its oldest text has waited long enough. The wait adapts to the
+    load: it is max_wait scaled by how full the previous batch was, so under low load a text is scored almost immediately, and under high load
+    texts wait up to max_wait for a full batch. Texts for different classifiers (models or versions) are batched separately.
+    A text arriving while no other one is being predicted skips the queue, so batching only adds latency when there is concurrency to exploit.
+    """
+
+    def __init__(self, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT, clock=time.monotonic):
+        """
+        :param int max_batch_size: The largest number of texts scored together
+        :param max_wait: Seconds a text waits at most for other texts to be batched with it
+        :param clock: Function returning the current time, in seconds
+        """
+        if max_batch_size < 1:
+            raise ValueError(f"The maximum batch size must be positive, got {max_batch_size}")
+        if max_wait < 0:
+            raise ValueError(f"The maximum wait must not be negative, got {max_wait}")
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.__clock = clock
+
+        # One queue per classifier, each one a list of tuples (text, future, enqueue time); the dictionary is keyed by the id of the classifier
+        self.__queues = {}
+        self.__condition = threading.Condition()
+
+        # Fill ratio of the previous batch, scaling the wait of the next one
+        self.__last_fill = 1.0
+
+        # Number of predict() calls which have not returned yet
+        self.__in_flight = 0
+
+        self.__direct = 0
+        self.__batches = 0
+        self.__texts = 0
+        self.__largest_batch = 0
+        self.__full_batches = 0
+        self.__total_wait = 0.0
+
+        # Like the watcher of the model registry, the scoring thread is started by the process which receives the requests
+        self.__worker_pid = None
+
+    def submit(self, classifier, text):
+        """
+        Queue a text for the next batch of the classifier
+        :param classifier: Any classifier implementing predict_batch(texts) and predict_text_polarity(text)
+        :param string text: The text to be classified
+        :return Future: A future resolved with the polarity of the text
+        """
+        if self.__worker_pid != os.getpid():
+            self.__start_worker()
+
+        future = Future()
+        with self.__condition:
+            queue = self.__queues.setdefault(id(classifier), (classifier, []))[1]
+            queue.append((text, future, self.__clock()))
+            # Wake the scoring thread for the first text of a queue (to start its timer) and for a full batch
+            if len(queue) == 1 or len(queue) >= self.max_batch_size:
+                self.__condition.notify()
+        return future
+
+    def predict(self, classifier, text, timeout=DEFAULT_RESULT_TIMEOUT):
+        """
+        :param timeout: Seconds to wait at most for the scoring thread; after that the text is scored by the calling thread
+        :return string: The polarity of the text, scored together with the texts of concurrent calls; when no other call is in flight, the
+                        text is scored at once by the calling thread, through predict_text_polarity
+        """
+        with self.__condition:
+            idle = self.__in_flight == 0
+            self.__in_flight += 1
+            self.__direct += idle
+        try:
+            if idle:
+                return classifier.predict_text_polarity(text)
+
+            future = self.submit(classifier, text)
+            try:
+                return future.result(timeout)
+            except concurrent.futures.TimeoutError:
+                # A cancelled text is skipped by the scoring thread; the cancellation fails when its batch is already being scored, and then the
+                # result of the batch is ignored
+                future.cancel()
+                print(f"No batch result after {timeout} s, scoring the text in the request thread", file=sys.stderr)
+                return classifier.predict_text_polarity(text)
+        finally:
+            with self.__condition:
+                self.__in_flight -= 1
+
+    def stats(self):
+        """
+        :return: A dictionary with the limits of the scheduler, the number of queued texts and of texts which skipped the queue, and the
+                 number and sizes of the flushed batches
+        """
+        with self.__condition:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'queued': sum(len(queue) for _, queue in self.__queues.values()),
+                'direct': self.__direct,
+                'batches': self.__batches,
+                'texts': self.__texts,
+                'mean_batch_size': self.__texts / self.__batches if self.__batches else 0.0,
+                'largest_batch': self.__largest_batch,
+                'full_batches': self.__full_batches,
+                'mean_wait_ms': self.__total_wait / self.__texts * 1000 if self.__texts else 0.0,
+            }
+
+    def __start_worker(self):
+        with self.__condition:
+            if self.__worker_pid == os.getpid():
+                return
+            self.__worker_pid = os.getpid()
+            # Texts queued by the parent of a forked worker have no scoring thread to wait for
+            self.__queues = {}
+            threading.Thread(target=self.__run, name='micro-batcher', daemon=True).start()
+
+    def __next_batch(self):
+        """
+        Wait until a queue is ready to be flushed
+        :return: The classifier of the queue and the entries of the batch
+        """
+        with self.__condition:
+            while True:
+                wait = self.max_wait * self.__last_fill
+                now = self.__clock()
+                timeout = None
+                for key, (classifier, queue) in list(self.__queues.items()):
+                    if not queue:
+                        continue
+                    remaining = queue[0][2] + wait - now
+                    if len(queue) >= self.max_batch_size or remaining <= 0:
+                        batch = queue[:self.max_batch_size]
+                        del queue[:self.max_batch_size]
+                        if not queue:
+                            del self.__queues[key]
+                        return classifier, batch
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                self.__condition.wait(timeout)
+
+    def __run(self):
+        # Any error is reported to the texts of the current batch, and the thread goes on with the next one: it must never die while texts
+        # are queued
+        # The thread only scores the texts of requests, so its stages are timed like those of the request threads
+        set_stage_timing(True)
+        while True:
+            batch = []
+            try:
+                classifier, batch = self.__next_batch()
+                self.__score(classifier, batch)
+            except Exception as error:
+                print(f"Scoring a batch of {len(batch)} texts failed: {error!r}", file=sys.stderr)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def __score(self, classifier, batch):
+        start = self.__clock()
+        # Texts whose caller stopped waiting (see predict) are cancelled, and not scored; the others can no longer be cancelled
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        # A single text is scored like a direct request, through the single-text path of the classifier, which is faster than a batch of one
+        if len(batch) == 1:
+            polarities = [classifier.predict_text_polarity(batch[0][0])]
+        else:
+            polarities = list(classifier.predict_batch([text for text, _, _ in batch]))
+        if len(polarities) != len(batch):
+            raise ValueError(f"Got {len(polarities)} polarities for {len(batch)} texts")
+        for (_, future, _), polarity in zip(batch, polarities):
+            future.set_result(polarity)
+
+        waits = [start - enqueued for _, _, enqueued in batch]
+        BATCH_SIZE.observe(len(batch))
+        for wait in waits:
+            BATCH_WAIT_SECONDS.observe(wait)
+        with self.__condition:
+            self.__last_fill = len(batch) / self.max_batch_size
+            self.__batches += 1
+            self.__texts += len(batch)
+            self.__largest_batch = max(self.__largest_batch, len(batch))
+            self.__full_batches += len(batch) == self.max_batch_size
+            self.__total_wait += sum(waits)
@@ -0,0 +1,249 @@
+import contextlib
+import os
+import sys
+import threading
+from logistic_regression import LogisticRegression
+from naive_bayes import NaiveBayes
+
+# Classifiers which can be served, selected by name; every one of them implements load(), predict_text_polarity(text), predict_batch(texts),
+# predict_scores(texts), model_version and artifact_files
+MODELS = {
+    'logistic_regression': LogisticRegression,
+    'naive_bayes': NaiveBayes,
+}
+DEFAULT_MODEL = 'logistic_regression'
+
+# Seconds between two checks of the model artifacts for changes
+DEFAULT_POLL_INTERVAL = 2.0
+
+# File locked by a process while it reads, updates and writes back the model artifacts, so that the snapshots of several worker processes
+# are applied one after the other
+ARTIFACT_LOCK_FILE = "models.lock"
+
+
+class UnknownModelError(KeyError):
+    """
+    Raised when a model is requested which is not served by the registry
+    """
+
+    def __str__(self):
+        return str(self.args[0]) if self.args else ''
+
+
+def _artifact_signature(paths):
+    """
+    :return: A tuple identifying the current version of the given files: their inode, size and modification time
+    """
+    signature = []
+    for path in paths:
+        try:
+            status = os.stat(path)
+        except FileNotFoundError:
+            signature.append(None)
+        else:
+            signature.append((status.st_ino, status.st_size, status.st_mtime_ns))
+    return tuple(signature)
+
+
+@contextlib.contextmanager
+def _artifact_lock():
+    try:
+        import fcntl
+    except ImportError:
+        # No advisory file locks (Windows): the server runs a single process there, see server.serve
+        yield
+        return
+
+    with open(ARTIFACT_LOCK_FILE, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class ModelRegistry:
+    """
+    Holds one loaded classifier per model name, and replaces a classifier when its artifact files change.
+    A reload builds a complete new classifier next to the current one and then swaps the reference, so requests which already hold the old
+    classifier finish on it, and requests never wait for a reload. A reload which fails (e.g. while a training run has written only some of
+    the artifacts) keeps the current classifier, and is retried once the artifacts change again.
+    """
+
+    def __init__(self, models=None, default=DEFAULT_MODEL, poll_interval=DEFAULT_POLL_INTERVAL, watch=True):
+        """
+        :param models: The names of the models to be served, keys of MODELS; defaults to all of them
+        :param string default: The model used by requests which do not name one
+        :param poll_interval: Seconds between two checks of the model artifacts for changes
+        :param bool watch: Flag indicating whether the artifacts are watched for changes by a background thread
+        """
+        self.__names = list(models) if models is not None else list(MODELS)
+        for name in self.__names:
+            if name not in MODELS:
+                raise UnknownModelError(f"Unknown model '{name}', expected one of {sorted(MODELS)}")
+        if default not in self.__names:
+            raise UnknownModelError(f"The default model '{default}' is not served, expected one of {self.__names}")
+
+        self.default = default
+        self.__poll_interval = poll_interval
+        self.__watch = watch
+        self.__classifiers = {}
+        self.__signatures = {}
+
+        # Names of the models whose current classifier was loaded from its artifacts by the registry, and not given through put()
+        self.__loaded = set()
+
+        # Signature of the artifacts of the last failed reload of each model, so that a broken artifact is reported once and not on every check
+        self.__failed_signatures = {}
+
+        # Functions called with every classifier loaded by a reload, before it is swapped in
+        self.__reload_hooks = []
+
+        # Serializes reloads, saves and the updates run through update(); only taken on the request path by feedback requests
+        self.__reload_lock = threading.Lock()
+        self.__watcher_lock = threading.Lock()
+
+        # The watcher thread is started lazily by the process which serves requests: threads do not survive a fork, so a registry created
+        # before the server forks its workers starts one watcher in each worker
+        self.__watcher_pid = None
+        self.__stopped = threading.Event()
+
+    def load_all(self):
+        for name in self.__names:
+            self.reload(name)
+        return self
+
+    def put(self, name, classifier):
+        """
+        Serve an already loaded classifier under the given name
+        """
+        self.__signatures[name] = _artifact_signature(classifier.artifact_files)
+        self.__classifiers = {**self.__classifiers, name: classifier}
+        self.__loaded.discard(name)
+        if name not in self.__names:
+            self.__names.append(name)
+
+    @property
+    def names(self):
+        return list(self.__names)
+
+    def get(self, name=None):
+        """
+        :param string name: The name of the model; defaults to the default model
+        :return: The current classifier of the model; callers keep using this object for the whole request, even if it is replaced meanwhile
+        """
+        if self.__watch and self.__watcher_pid != os.getpid():
+            self.__start_watcher()
+
+        classifier = self.__classifiers.get(name or self.default)
+        if classifier is None:
+            raise UnknownModelError(f"Unknown model '{name}', expected one of {self.__names}")
+        return classifier
+
+    def classifiers(self):
+        """
+        :return: A dictionary mapping each model name to its current classifier; unlike get, it never starts the watcher thread
+        """
+        return dict(self.__classifiers)
+
+    def versions(self):
+        """
+        :return: A dictionary mapping each model name to the version of its current classifier
+        """
+        return {name: classifier.model_version for name, classifier in self.__classifiers.items()}
+
+    def add_reload_hook(self, hook):
+        """
+        :param hook: A function called with the name and the classifier of every reload, once the classifier is loaded from its artifacts and
+                     before it is swapped in (e.g. to apply changes which are not in the artifacts yet)
+        """
+        self.__reload_hooks.append(hook)
+
+    def update(self, function):
+        """
+        Run a function changing the current classifiers in place (e.g. online updates), while no reload can swap them
+        :param function: A function called with the dictionary mapping each model name to its current classifier
+        :return: The result of the function
+        """
+        with self.__reload_lock:
+            return function(dict(self.__classifiers))
+
+    def reload(self, name):
+        """
+        Load the model from its artifacts into a new classifier, and swap it in
+        """
+        with self.__reload_lock:
+            self.__reload(name)
+
+    def __reload(self, name):
+        classifier = MODELS[name]()
+        signature = _artifact_signature(classifier.artifact_files)
+        classifier.load()
+        for hook in self.__reload_hooks:
+            hook(name, classifier)
+
+        # Copy-on-write swap of the whole dictionary: readers see either the old or the new mapping, never a partially updated one
+        self.__classifiers = {**self.__classifiers, name: classifier}
+        self.__signatures[name] = signature
+        self.__loaded.add(name)
+
+    def save(self, names=None, rebase=None):
+        """
+        Write the current classifiers into their artifacts (e.g. to snapshot online updates). The artifacts written this way are not reloaded
+        by the watcher, since they hold the classifiers already in use.
+        With a rebase function, each model loaded by the registry is first loaded again from its artifacts, which may hold the changes
+        written meanwhile by other processes; rebase(name, classifier) applies the changes of this process to the loaded classifier, which is
+        then written and swapped in. The whole read, update and write sequence holds a file lock, so processes saving at the same time never
+        overwrite each other's changes
+        :param names: The names of the models to be saved; defaults to all loaded models
+        :param rebase: A function called with the name and the freshly loaded classifier of every saved model
+        """
+        with self.__reload_lock, _artifact_lock():
+            classifiers = self.__classifiers
+            names = [name for name in (names if names is not None else self.__names) if name in classifiers]
+            for name in names:
+                classifier = classifiers[name]
+                if rebase is not None and name in self.__loaded:
+                    classifier = MODELS[name]()
+                    classifier.load()
+                    rebase(name, classifier)
+                classifier.save()
+                self.__classifiers = {**self.__classifiers, name: classifier}
+                self.__signatures[name] = _artifact_signature(classifier.artifact_files)
+
+    def check_for_updates(self):
+        """
+        Reload every model whose artifact files changed since it was loaded
+        :return: The names of the reloaded models
+        """
+        reloaded = []
+        for name in self.__names:
+            if name not in MODELS:
+                continue
+            with self.__reload_lock:
+                signature = _artifact_signature(MODELS[name].artifact_files)
+                if signature == self.__signatures.get(name) or signature == self.__failed_signatures.get(name):
+                    continue
+                try:
+                    self.__reload(name)
+                except Exception as error:
+                    self.__failed_signatures[name] = signature
+                    print(f"Reloading the model '{name}' failed, the current version stays in use: {error}", file=sys.stderr)
+                else:
+                    reloaded.append(name)
+        return reloaded
+
+    def __start_watcher(self):
+        with self.__watcher_lock:
+            if self.__watcher_pid == os.getpid():
+                return
+            self.__watcher_pid = os.getpid()
+            self.__stopped = threading.Event()
+            threading.Thread(target=self.__watch_artifacts, name='model-registry-watcher', daemon=True).start()
+
+    def __watch_artifacts(self):
+        while not self.__stopped.wait(self.__poll_interval):
+            self.check_for_updates()
+
+    def stop(self):
+        self.__stopped.set()
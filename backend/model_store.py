@@ -0,0 +1,157 @@
+import json
+import os
+import struct
+import numpy as np
+
+# On-disk layout of a model artifact (all integers little-endian):
+#   - magic:          8 bytes, MAGIC
+#   - version:        uint32, FORMAT_VERSION
+#   - header length:  uint32, length in bytes of the JSON header that follows
+#   - header:         UTF-8 JSON object {"metadata": {...}, "arrays": {name: {"dtype", "shape", "offset"}}}
+#   - array data:     the raw bytes of every array, each one starting at an offset aligned to ALIGNMENT bytes
+# Since the arrays are stored raw and aligned, the file can be opened with np.memmap and every array used in place, without deserialization.
+MAGIC = b'SNTMODEL'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sII')
+
+
+class ModelFormatError(ValueError):
+    """
+    Raised when a model artifact is missing, corrupted, or written with an unsupported format version
+    """
+
+
+class ModelArtifact:
+    """
+    A loaded model artifact: a metadata dictionary and a dictionary of named, read-only numpy arrays
+    """
+
+    def __init__(self, metadata, arrays):
+        self.metadata = metadata
+        self.arrays = arrays
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_model(path, arrays, metadata=None):
+    """
+    Write the given arrays into a model artifact. The file is written to a temporary path first and then moved into place, so that readers
+    never observe a partially written artifact.
+    :param string path: The path of the artifact
+    :param arrays: A dictionary mapping each array name to a numpy array
+    :param metadata: An optional JSON-serializable dictionary stored in the header
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # The offsets depend on the header length, and the header contains the offsets -> grow the reserved header room until everything fits
+    header = {'metadata': metadata or {}, 'arrays': {}}
+    data_start = 0
+    while True:
+        offset = data_start
+        for name, array in arrays.items():
+            header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset = _aligned(offset + array.nbytes)
+        header_bytes = json.dumps(header).encode('utf-8')
+
+        required_start = _aligned(_PREAMBLE.size + len(header_bytes))
+        if required_start <= data_start:
+            break
+        data_start = required_start
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        file.write(header_bytes)
+        for name, array in arrays.items():
+            file.write(b'\0' * (header['arrays'][name]['offset'] - file.tell()))
+            file.write(array.tobytes())
+    os.replace(temp_path, path)
+
+
+def load_model(path, mmap=True):
+    """
+    Open a model artifact. With mmap enabled the arrays are read-only views into a memory map of the file, so the operating system pages them
+    in on demand and processes opening the same file share one page-cached copy.
+    :param string path: The path of the artifact
+    :param bool mmap: Flag indicating whether to memory-map the file instead of reading it into memory
+    :return ModelArtifact: The metadata and the arrays of the artifact
+    """
+    if not os.path.exists(path):
+        raise ModelFormatError(f"Model artifact '{path}' does not exist")
+
+    with open(path, 'rb') as file:
+        preamble = file.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ModelFormatError(f"'{path}' is not a model artifact")
+        magic, version, header_length = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ModelFormatError(f"'{path}' is not a model artifact")
+        if version != FORMAT_VERSION:
+            raise ModelFormatError(f"'{path}' has format version {version}, but only version {FORMAT_VERSION} is supported")
+        header = json.loads(file.read(header_length).decode('utf-8'))
+
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        data = np.fromfile(path, dtype=np.uint8)
+        data.flags.writeable = False
+
+    arrays = {}
+    for name, descriptor in header['arrays'].items():
+        dtype = np.dtype(descriptor['dtype'])
+        shape = tuple(descriptor['shape'])
+        start = descriptor['offset']
+        end = start + dtype.itemsize * int(np.prod(shape))
+        if end > data.shape[0]:
+            raise ModelFormatError(f"Array '{name}' of '{path}' is truncated")
+        arrays[name] = np.asarray(data[start:end]).view(dtype).reshape(shape)
+
+    return ModelArtifact(header['metadata'], arrays)
+
+
+def encode_strings(strings):
+    """
+    Encode a list of strings into a string table
+    :param strings: The strings to be encoded
+    :return: offsets: An int64 array of length len(strings) + 1; string i occupies the bytes [offsets[i], offsets[i + 1]) of data
+             data: A uint8 array with the UTF-8 encoding of all strings, concatenated
+    """
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return offsets, data
+
+
+def decode_strings(offsets, data):
+    """
+    Decode a string table produced by encode_strings
+    :return: The list of strings
+    """
+    blob = data.tobytes()
+    bounds = offsets.tolist()
+    return [blob[start:end].decode('utf-8') for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def load_parameters(path, kind, vocab_checksum, mmap=True):
+    """
+    Open the parameter artifact of a classifier, checking that it was trained on the vocabulary the word frequency index was opened with
+    :param string path: The path of the artifact
+    :param string kind: The kind of classifier the parameters are expected to belong to
+    :param string vocab_checksum: The checksum of the loaded vocabulary
+    :param bool mmap: Flag indicating whether to memory-map the artifact
+    :return ModelArtifact: The metadata and the arrays of the artifact
+    """
+    artifact = load_model(path, mmap=mmap)
+    if artifact.metadata.get('kind') != kind:
+        raise ModelFormatError(f"'{path}' does not contain {kind} parameters")
+    if artifact.metadata.get('vocab_checksum') != vocab_checksum:
+        raise ModelFormatError(f"'{path}' was trained on a different vocabulary than the word frequency artifact it was loaded with; "
+                               f"retrain the model")
+    return artifact
@@ -1,15 +1,63 @@
-from nltk.corpus import twitter_samples
 import numpy as np
 import datetime
-from utils import preprocess_text, build_word_freq_dict
-import pickle
+import uuid
+from utils import preprocess_text, preprocess_corpus, twitter_sample_tweets
+from word_freq_index import WordFreqIndex, vocabulary_file, remove_unused_vocabularies
+from hashed_features import HashedFreqIndex, DEFAULT_BUCKETS, DEFAULT_NGRAM_RANGE
+from model_store import save_model, load_model, load_parameters
+from metrics import timed_stage
+from evaluation import evaluate, evaluate_corpus
+from corpus_readers import CorpusReader, ListCorpus, count_corpus, preprocess_chunks
+
+PARAMETERS_FILE = "naive_bayes.model"
+
+# Number of texts of the default training split of the NLTK sample
+DEFAULT_TRAINING_SIZE = 8000
+
+# Features the model can be trained on: the stemmed words of its vocabulary, or their unigrams and bigrams hashed into a fixed number
+# of buckets (see HashedFreqIndex)
+FEATURE_MODES = ('words', 'hashed')
 
 
 class NaiveBayes:
-    def __init__(self):
-        self.__word_freqs = {}
+    # Texts whose log odds of being positive are above this threshold are classified as positive
+    decision_threshold = 0.0
+
+    # The files watched by a model registry, which reloads the model when one of them changes; the vocabulary artifact named by the parameters
+    # is written before them and never changed afterwards, so it needs no watching
+    artifact_files = (PARAMETERS_FILE,)
+
+    def __init__(self, training_workers=None, features='words', n_buckets=DEFAULT_BUCKETS, ngram_range=DEFAULT_NGRAM_RANGE):
+        """
+        :param int training_workers: The number of processes used to preprocess the training corpus; defaults to the number of CPUs
+        :param string features: The features the model is trained on, 'words' or 'hashed'; a loaded model uses the features it was trained on
+        :param int n_buckets: The number of hash buckets of the 'hashed' features
+        :param ngram_range: The pair (shortest, longest) of n-gram lengths of the 'hashed' features
+        """
+        if features not in FEATURE_MODES:
+            raise ValueError(f"Unknown features '{features}', expected one of {FEATURE_MODES}")
+
+        # Identifies the trained / loaded parameters; changes every time the model is retrained or reloaded
+        self.__model_version = None
+        self.__training_workers = training_workers
+        self.__features = features
+        self.__n_buckets = n_buckets
+        self.__ngram_range = ngram_range
+
+        # Either a WordFreqIndex or a HashedFreqIndex: both map the tokens of a text to the ids (words or buckets) indexing the count arrays
+        self.__word_index = WordFreqIndex()
         self.__log_prior = 0
-        self.__log_likelihood = {}
+
+        # The log likelihood of a word is split into a term depending only on its own counts, stored at the position of the word id in the
+        # vocabulary index, and a normalizer shared by all words:
+        #   log((freq_pos + 1) / (n_pos + V)) - log((freq_neg + 1) / (n_neg + V))
+        #     = [log(freq_pos + 1) - log(freq_neg + 1)] + [log(n_neg + V) - log(n_pos + V)]
+        # so that an online update only recomputes the terms of the words it touches, plus the normalizer
+        self.__log_ratio = np.zeros(0)
+        self.__normalizer = 0.0
+
+        # The number of negative and positive training texts, from which the log prior is computed
+        self.__document_counts = np.zeros(2, dtype=np.int64)
 
     @staticmethod
     def lookup(freqs, word, label):
@@ -28,92 +76,146 @@ class NaiveBayes:
 
         return word_freqs
 
-    def __train_model(self):
+    def __train_model(self, train_x=None, train_y=None):
         # Create a file for writing the results of the training; also mark the results with a timestamp, to keep track of trainings
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         result_file = open("training_results.txt", "a")
         result_file.write("Naive Bayes Regression Training - " + timestamp + "\n")
 
-        # Retrieve the lists of positive and negative tweets from the NLTK sample
-        all_positive_tweets = twitter_samples.strings('positive_tweets.json')
-        all_negative_tweets = twitter_samples.strings('negative_tweets.json')
-
-        # Get the dataset for training
-        train_positive = all_positive_tweets[:4000]
-        train_negative = all_negative_tweets[:4000]
-
-        # Create training sets:
-        #   - train_x = the list of actual tweets used for training
-        #   - train_y = the labels for the tweets used for training (0 for negative and 1 for positive)
-        train_x = train_positive + train_negative
-        train_y = np.append(np.ones((len(train_positive), 1)), np.zeros((len(train_negative), 1)), axis=0)
-        result_file.write("train_y.shape = " + str(train_y.shape) + "\n")
+        if isinstance(train_x, CorpusReader):
+            # Out-of-core training: count the words (or the hashed n-grams) of the corpus in a streaming pass
+            document_counts = self.__count_corpus(train_x)
+            result_file.write("Corpus documents (negative, positive) = " + str(tuple(document_counts.tolist())) + "\n")
+            d_neg, d_pos = document_counts.astype(np.float64)
+        else:
+            if train_x is None:
+                # Retrieve the lists of positive and negative tweets from the NLTK sample
+                all_positive_tweets, all_negative_tweets = twitter_sample_tweets()
+
+                # Get the dataset for training
+                train_positive = all_positive_tweets[:4000]
+                train_negative = all_negative_tweets[:4000]
+
+                # Create training sets:
+                #   - train_x = the list of actual tweets used for training
+                #   - train_y = the labels for the tweets used for training (0 for negative and 1 for positive)
+                train_x = train_positive + train_negative
+                train_y = np.append(np.ones((len(train_positive), 1)), np.zeros((len(train_negative), 1)), axis=0)
+            else:
+                # Labels given by the caller (0 for negative and 1 for positive) -> Reshape them into a column vector
+                train_y = np.reshape(np.asarray(train_y, dtype=np.float64), (-1, 1))
+            result_file.write("train_y.shape = " + str(train_y.shape) + "\n")
+
+            if self.__features == 'hashed':
+                # Count the hashed n-grams chunk by chunk, like for a streamed corpus: the dictionary of (word, label) pairs, which grows with
+                # the corpus, is never built
+                self.__count_corpus(ListCorpus(train_x, train_y))
+            else:
+                # Preprocess every tweet in parallel, and convert the resulting word frequency dictionary into the compact vocabulary index
+                _, word_freqs = preprocess_corpus(train_x, train_y, workers=self.__training_workers)
+                self.__word_index = WordFreqIndex.from_freq_dict(word_freqs)
 
-        self.__word_freqs = build_word_freq_dict(train_x, train_y)
-        result_file.write("Word Frequency Dictionary size: " + str(len(self.__word_freqs.keys())) + "\n")
+            # Calculate the number of documents
+            d = len(train_y)
 
-        # Calculate the number of unique words in the vocabulary
-        vocab = set([pair[0] for pair in self.__word_freqs.keys()])
-        vocab_size = len(vocab)
+            # Calculate the number of positive texts -> Since train_y contains a value 0 or a value 1 for each document in the training set
+            #   -> we can get the number of positive documents by adding up the 1 values
+            d_pos = sum(train_y)
 
-        # Calculate the number of positive and negative words in the training set
-        n_pos = n_neg = 0
-        for pair in self.__word_freqs.keys():
-            # If the label is a positive number, greater than 0 -> The word is considered to have a positive sentiment
-            if pair[1] > 0:
-                n_pos += self.__word_freqs.get(pair, 1)
-            else:
-                # Otherwise, when the label < 0 -> The word is considered to have a negative sentiment
-                n_neg += self.__word_freqs.get(pair, 1)
+            # Calculate the number of negative texts -> Total texts - Positive texts
+            d_neg = d - d_pos
 
-        # Calculate the number of documents
-        d = len(train_y)
+        if self.__features == 'hashed':
+            result_file.write("Hashed n-gram buckets used: " + str(self.__word_index.vocabulary_size) + " / " + str(self.__n_buckets) + "\n")
+        else:
+            result_file.write("Word Frequency Dictionary size: " + str(self.__word_index.pair_count()) + "\n")
 
-        # Calculate the number of positive texts -> Since train_y contains a value 0 or a value 1 for each document in the training set
-        #   -> we can get the number of positive documents by adding up the 1 values
-        d_pos = sum(train_y)
+        # Calculate the number of unique words (or hashed n-grams) in the vocabulary
+        vocab_size = self.__word_index.vocabulary_size
 
-        # Calculate the number of negative texts -> Total texts - Positive texts
-        d_neg = d - d_pos
+        # Calculate the number of positive and negative words in the training set
+        freq_pos = self.__word_index.pos_counts
+        freq_neg = self.__word_index.neg_counts
+        n_pos = int(freq_pos.sum())
+        n_neg = int(freq_neg.sum())
 
         # Calculate log_prior
+        self.__document_counts = np.reshape([d_neg, d_pos], -1).astype(np.int64)
         self.__log_prior = np.log(d_pos) - np.log(d_neg)
 
-        # Calculate log_likelihood for each word in the vocabulary
-        self.__log_likelihood = {}
-        for word in vocab:
-            # Get the positive and negative frequency of the word
-            freq_pos = self.__word_freqs.get((word, 1), 0)
-            freq_neg = self.__word_freqs.get((word, 0), 0)
-
-            # Calculate the probability that the word is positive...
-            prob_word_pos = (freq_pos + 1) / (n_pos + vocab_size)
-
-            # ...and the probability that the word is negative
-            prob_word_neg = (freq_neg + 1) / (n_neg + vocab_size)
-
-            # Calculate the log likelihood of the word
-            self.__log_likelihood[word] = np.log(prob_word_pos / prob_word_neg)
+        # Calculate log_likelihood for all the words in the vocabulary at once, as the per-word log ratio plus the shared normalizer
+        self.__log_ratio = np.log(freq_pos + 1) - np.log(freq_neg + 1)
+        self.__normalizer = float(np.log(n_neg + vocab_size) - np.log(n_pos + vocab_size))
 
         result_file.write("\n")
         result_file.close()
 
+    def __count_corpus(self, corpus):
+        """
+        :param CorpusReader corpus: The training corpus, counted into a new word (or hashed n-gram) index
+        :return: The number of negative and of positive texts of the corpus
+        """
+        if self.__features == 'hashed':
+            # The buckets are fixed -> The counts of each chunk are added to them directly
+            self.__word_index = HashedFreqIndex(self.__n_buckets, self.__ngram_range)
+            document_counts = np.zeros(2, dtype=np.int64)
+            for token_lists, labels in preprocess_chunks(corpus, workers=self.__training_workers):
+                self.__word_index.update(token_lists, labels)
+                positive = sum(1 for label in labels if label > 0)
+                document_counts += (len(labels) - positive, positive)
+            return document_counts
+
+        self.__word_index, document_counts = count_corpus(corpus, workers=self.__training_workers)
+        return document_counts
+
     def __predict_text(self, text):
         text_clean = preprocess_text(text)
 
-        # Initialize the prediction with value 0
-        pred = 0
+        with timed_stage('score'):
+            # Initialize the prediction with value 0
+            pred = 0
+
+            # Add the log_prior value
+            pred += self.__log_prior
+
+            # Add the log_likelihood values of all the words which exist in the vocabulary, gathered through their ids
+            token_ids = self.__word_index.token_ids(text_clean)
+            pred += self.__log_ratio[token_ids].sum() + len(token_ids) * self.__normalizer
 
-        # Add the log_prior value
-        pred += self.__log_prior
+            return pred
 
-        for word in text_clean:
-            # Check if each word exists in the log_likelihood dictionary
-            if word in self.__log_likelihood:
-                # If so, add the value of the log_likelihood for the specific word to the probability
-                pred += self.__log_likelihood[word]
+    def __predict_batch(self, texts):
+        token_lists = [preprocess_text(text) for text in texts]
 
-        return pred
+        with timed_stage('score_batch'):
+            token_ids, rows = self.__word_index.batch_token_ids(token_lists)
+
+            # Build one score vector for the whole batch, then add the normalizer of every token and the log_prior value to all scores at once
+            scores = np.bincount(rows, weights=self.__log_ratio[token_ids], minlength=len(texts))
+            return scores + np.bincount(rows, minlength=len(texts)) * self.__normalizer + self.__log_prior
+
+    def explain(self, text):
+        """
+        :param string text: The text to be classified
+        :return: The explanation of the polarity of the text (see main.get_text_polarity), whose score is the log odds of the text being
+                 positive, whose intercept is the log prior and whose tokens are the words (or hashed n-grams) of the text
+        """
+        log_prior = float(np.squeeze(self.__log_prior))
+        features = []
+        for feature, feature_id in self.__word_index.feature_ids(preprocess_text(text)):
+            contribution = float(self.__log_ratio[feature_id]) + self.__normalizer if feature_id is not None else 0.0
+            features.append({'token': feature, 'contribution': contribution})
+
+        log_odds = log_prior + sum(feature['contribution'] for feature in features)
+        return {'polarity': "POSITIVE" if log_odds > 0 else "NEGATIVE", 'score': log_odds, 'score_kind': 'log_odds', 'intercept': log_prior,
+                'tokens': features}
+
+    def predict_scores(self, texts):
+        """
+        :param texts: A list of texts to be scored
+        :return: A vector with the log odds of each text being positive, in the same order as the input
+        """
+        return self.__predict_batch(texts)
 
     def predict_text_polarity(self, text):
         prediction = self.__predict_text(text)
@@ -123,63 +225,172 @@ class NaiveBayes:
         else:
             return "NEGATIVE"
 
+    def predict_batch(self, texts):
+        """
+        :param texts: A list of texts to be classified
+        :return: A list with the polarity of each text, in the same order as the input
+        """
+        predictions = self.__predict_batch(texts)
+        return np.where(predictions > 0, "POSITIVE", "NEGATIVE").tolist()
+
     def __write_results_to_file(self):
-        # Write the word frequency dictionary into a separate json file
-        pickle.dump(self.__word_freqs, open("word_freqs_naive_bayes.json", "wb"))
+        params = {
+            'log_prior': np.atleast_1d(np.asarray(self.__log_prior, dtype=np.float64)),
+            'log_likelihood': self.__log_ratio + self.__normalizer,
+            'document_counts': self.__document_counts,
+        }
+
+        if self.__features == 'hashed':
+            # The hashed counts are written into the parameter artifact, next to the log likelihoods indexed by their buckets; no
+            # vocabulary artifact is written
+            params['pos_counts'] = self.__word_index.pos_counts
+            params['neg_counts'] = self.__word_index.neg_counts
+            metadata = {'kind': 'naive_bayes', 'features': 'hashed', 'n_buckets': self.__word_index.n_buckets,
+                        'ngram_range': list(self.__word_index.ngram_range), 'vocab_checksum': self.__word_index.checksum}
+            save_model(PARAMETERS_FILE, params, metadata)
+        else:
+            # Write the word frequency index into its vocabulary artifact, shared with the other classifier when both hold the same counts
+            vocabulary_name = self.__word_index.save_shared()
 
-        # Write the prediction parameters into a separate file
-        params = {'log_prior': self.__log_prior, 'log_likelihood': self.__log_likelihood}
-        pickle.dump(params, open("parameters_naive_bayes.json", "wb"))
+            # Write the prediction parameters into a separate artifact, tied to the vocabulary they were trained on
+            metadata = {'kind': 'naive_bayes', 'vocab_checksum': self.__word_index.checksum, 'vocabulary_file': vocabulary_name}
+            save_model(PARAMETERS_FILE, params, metadata)
+        remove_unused_vocabularies()
 
-    def execute(self):
-        self.__train_model()
+    def execute(self, train_x=None, train_y=None):
+        """
+        Train the model and write it into the model artifacts
+        :param train_x: The texts used for training, or a CorpusReader streaming them from disk (see corpus_readers); defaults to the first 4000
+                        positive and 4000 negative tweets of the NLTK sample
+        :param train_y: A list corresponding to the sentiment of each training text (0 for negative and 1 for positive); not used with a
+                        CorpusReader
+        """
+        self.__train_model(train_x, train_y)
         self.__write_results_to_file()
+        self.__model_version = uuid.uuid4().hex
 
     def __load_data_from_files(self):
-        # Read the word frequency dictionary from the json file
-        self.__word_freqs = pickle.load(open("word_freqs_naive_bayes.json", "rb"))
+        # A model trained on hashed features holds its counts in its parameter artifact; otherwise open its word frequency index. In both cases
+        # the counts are memory-mapped, not deserialized
+        artifact = load_model(PARAMETERS_FILE)
+        metadata = artifact.metadata
+        if metadata.get('features') == 'hashed':
+            self.__word_index = HashedFreqIndex(metadata['n_buckets'], metadata['ngram_range'], artifact['pos_counts'], artifact['neg_counts'])
+            self.__features = 'hashed'
+        else:
+            self.__word_index = WordFreqIndex.load(vocabulary_file(PARAMETERS_FILE, metadata))
+            self.__features = 'words'
 
-        # Read the parameters from the appropriate file
-        params = pickle.load(open("parameters_naive_bayes.json", "rb"))
+        # Read the parameters from the appropriate artifact; the log likelihood of each word is stored at the position of its id
+        params = load_parameters(PARAMETERS_FILE, 'naive_bayes', self.__word_index.checksum)
         self.__log_prior = params['log_prior']
-        self.__log_likelihood = params['log_likelihood']
+
+        # Split the log likelihoods into the per-word log ratios and the normalizer of the vocabulary
+        vocab_size = self.__word_index.vocabulary_size
+        n_pos = int(self.__word_index.pos_counts.sum())
+        n_neg = int(self.__word_index.neg_counts.sum())
+        self.__normalizer = float(np.log(n_neg + vocab_size) - np.log(n_pos + vocab_size))
+        self.__log_ratio = params['log_likelihood'] - self.__normalizer
+
+        # Models saved before online learning do not store their document counts -> Recover them from the log prior, for the size of the
+        # default training split (8000 tweets)
+        if 'document_counts' in params.arrays:
+            self.__document_counts = np.array(params['document_counts'], dtype=np.int64)
+        else:
+            d_pos = int(round(DEFAULT_TRAINING_SIZE / (1 + np.exp(-float(self.__log_prior[0])))))
+            self.__document_counts = np.array([DEFAULT_TRAINING_SIZE - d_pos, d_pos], dtype=np.int64)
 
     def load(self):
         self.__load_data_from_files()
+        self.__model_version = uuid.uuid4().hex
 
-    def test_model(self):
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        result_file = open("testing_results.txt", "a")
-        result_file.write("Naive Bayes Testing - " + timestamp + "\n")
+    def save(self):
+        """
+        Write the current state of the model (e.g. after online updates) into the model artifacts
+        """
+        self.__write_results_to_file()
 
-        # Retrieve the lists of positive and negative tweets from the NLTK sample
-        all_positive_tweets = twitter_samples.strings('positive_tweets.json')
-        all_negative_tweets = twitter_samples.strings('negative_tweets.json')
+    def partial_fit(self, texts, labels):
+        """
+        Update the model with new labelled texts, without retraining: the word counts are updated in place, and only the log ratios of the
+        words of the texts, the normalizer and the log prior are recomputed. Words seen for the first time are added to the vocabulary.
+        Not thread-safe with respect to other updates; predictions may run concurrently.
+        :param texts: A list of texts
+        :param labels: A list corresponding to the sentiment of each text (0 for negative and 1 for positive)
+        """
+        token_lists = [preprocess_text(text) for text in texts]
+        labels = np.reshape(np.asarray(labels, dtype=np.float64), -1)
 
-        # Split the data into data for testing
-        test_positive = all_positive_tweets[4000:]
-        test_negative = all_negative_tweets[4000:]
+        # Extend the log ratios before the vocabulary, so that predictions never see a word id without its log ratio
+        new_words = len(self.__word_index.unseen_words(token_lists))
+        if new_words:
+            self.__log_ratio = np.concatenate([self.__log_ratio, np.zeros(new_words)])
+        elif not self.__log_ratio.flags.writeable:
+            self.__log_ratio = np.array(self.__log_ratio)
 
-        test_x = test_positive + test_negative
-        test_y = np.append(np.ones((len(test_positive), 1)), np.zeros((len(test_negative), 1)), axis=0)
-        result_file.write("test_y.shape = " + str(test_y.shape) + "\n")
+        touched = self.__word_index.update(token_lists, labels)
 
-        # Create a list for storing prediction results
-        y_hat = []
+        # Recompute the log ratios of the touched words only
+        freq_pos = self.__word_index.pos_counts
+        freq_neg = self.__word_index.neg_counts
+        self.__log_ratio[touched] = np.log(freq_pos[touched] + 1) - np.log(freq_neg[touched] + 1)
 
-        for text in test_x:
-            if self.__predict_text(text) > 0:
-                y_hat.append(1)
-            else:
-                y_hat.append(0)
+        # Recompute the global terms: the normalizer (from the total counts and the vocabulary size) and the log prior
+        vocab_size = self.__word_index.vocabulary_size
+        n_pos = int(freq_pos.sum())
+        n_neg = int(freq_neg.sum())
+        self.__normalizer = float(np.log(n_neg + vocab_size) - np.log(n_pos + vocab_size))
 
-        error = np.mean(np.absolute(y_hat - test_y))
-        accuracy = 1 - error
+        d_pos = int(np.count_nonzero(labels > 0))
+        self.__document_counts = self.__document_counts + np.array([len(labels) - d_pos, d_pos], dtype=np.int64)
+        self.__log_prior = np.log(self.__document_counts[1]) - np.log(self.__document_counts[0])
 
-        result_file.write("Accuracy: " + str(accuracy) + "\n")
-        result_file.close()
+        self.__model_version = uuid.uuid4().hex
+
+    @property
+    def model_version(self):
+        """
+        :return string: The version of the parameters currently used for prediction; used to invalidate cached predictions
+        """
+        return self.__model_version
+
+    def test_model(self, test_x=None, test_y=None, workers=None):
+        """
+        Test the accuracy of the trained Naive Bayes algorithm
+        :param test_x: The texts used for testing, or a CorpusReader streaming them; defaults to the tweets of the NLTK sample which are not used
+                       for training
+        :param test_y: A list corresponding to the sentiment of each testing text (0 for negative and 1 for positive)
+        :param int workers: The number of processes scoring the test set; defaults to the number of CPUs
+        :return: accuracy: The proportion of correctly classified texts out of the entire sample size
+        """
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        result_file = open("testing_results.txt", "a")
+        result_file.write("Naive Bayes Testing - " + timestamp + "\n")
+
+        if isinstance(test_x, CorpusReader):
+            # Score a test corpus streamed from disk; only the scores and the labels are kept in memory
+            report = evaluate_corpus(self, test_x, workers=workers)
+        else:
+            if test_x is None:
+                # Retrieve the lists of positive and negative tweets from the NLTK sample
+                all_positive_tweets, all_negative_tweets = twitter_sample_tweets()
+
+                # Split the data into data for testing
+                test_positive = all_positive_tweets[4000:]
+                test_negative = all_negative_tweets[4000:]
 
-        return accuracy
+                test_x = test_positive + test_negative
+                test_y = np.append(np.ones((len(test_positive), 1)), np.zeros((len(test_negative), 1)), axis=0)
+            else:
+                test_y = np.reshape(np.asarray(test_y, dtype=np.float64), (-1, 1))
 
+            # Score the whole test set through batched prediction, in parallel chunks; the predictions are compared with the labels as vectors of
+            # the same shape, so the memory used grows linearly with the size of the test set
+            report = evaluate(self, test_x, test_y, workers=workers)
+        result_file.write("test_y.shape = " + str((report.size, 1)) + "\n")
 
+        for line in report.report_lines():
+            result_file.write(line + "\n")
+        result_file.close()
 
+        return report.accuracy
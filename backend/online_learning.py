@@ -0,0 +1,160 @@
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+# Number of pending feedback texts which triggers an update before the flush interval is over
+DEFAULT_BATCH_SIZE = 64
+
+# Seconds a feedback text waits at most before it is applied to the models
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+# Seconds between two snapshots of the updated models to the model artifacts
+DEFAULT_SNAPSHOT_INTERVAL = 300.0
+
+
+class OnlineLearner:
+    """
+    Collects labelled feedback texts and applies them to every model of a model registry in batches, through the partial_fit method of the
+    classifiers, from a background thread. The updated models are snapshotted into their artifacts periodically.
+    With several worker processes, each worker applies the feedback it receives itself, and keeps the batches applied since its last snapshot.
+    A snapshot never overwrites the feedback of the other workers: the models are loaded again from their artifacts (holding the snapshots of
+    the other workers) and the kept batches are replayed on them before they are written, under a file lock. When a worker reloads a model
+    written by another worker (or by a new training), the kept batches are replayed as well, so no feedback is lost before it is snapshotted.
+    The kept batches are only released by a snapshot, so with snapshots disabled they grow with the received feedback.
+    """
+
+    def __init__(self, model_registry, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL, clock=time.monotonic):
+        """
+        :param ModelRegistry model_registry: The registry holding the models to be updated
+        :param int batch_size: Number of pending texts which triggers an update
+        :param flush_interval: Seconds a pending text waits at most before it is applied
+        :param snapshot_interval: Seconds between two snapshots of the updated models; None disables the snapshots
+        :param clock: Function returning the current time, in seconds
+        """
+        self.__registry = model_registry
+        self.__batch_size = batch_size
+        self.__flush_interval = flush_interval
+        self.__snapshot_interval = snapshot_interval
+        self.__clock = clock
+
+        self.__pending_texts = []
+        self.__pending_labels = []
+        self.__condition = threading.Condition()
+
+        # The batches (texts, labels) applied to the models since the last snapshot, replayed on every model loaded from its artifacts; the
+        # updates, replays and snapshots run under the lock of the registry, so they never run concurrently on the same classifiers
+        self.__unsnapshotted = []
+        self.__unsnapshotted_lock = threading.Lock()
+        self.__last_snapshot = clock()
+        model_registry.add_reload_hook(self.__replay)
+
+        self.__applied = 0
+        self.__batches = 0
+        self.__snapshots = 0
+
+        # Like the watcher of the model registry, the updating thread is started by the process which receives the feedback
+        self.__worker_pid = None
+
+    def submit(self, texts, labels):
+        """
+        Queue labelled texts for the next update
+        :param texts: A list of texts
+        :param labels: A list corresponding to the sentiment of each text (0 for negative and 1 for positive)
+        :return int: The number of texts waiting for an update
+        """
+        if len(texts) != len(labels):
+            raise ValueError(f"Got {len(texts)} texts and {len(labels)} labels")
+
+        if self.__worker_pid != os.getpid():
+            self.__start_worker()
+
+        with self.__condition:
+            self.__pending_texts.extend(texts)
+            self.__pending_labels.extend(labels)
+            pending = len(self.__pending_texts)
+            if pending >= self.__batch_size:
+                self.__condition.notify()
+        return pending
+
+    def flush(self):
+        """
+        Apply all pending texts to the models now, and snapshot the models when the snapshot interval is over
+        :return: A dictionary mapping each model name to its version after the update
+        """
+        with self.__condition:
+            texts, labels = self.__pending_texts, self.__pending_labels
+            self.__pending_texts, self.__pending_labels = [], []
+
+        if texts:
+            self.__registry.update(lambda classifiers: self.__apply(classifiers, texts, np.asarray(labels, dtype=np.float64)))
+
+        with self.__unsnapshotted_lock:
+            snapshot_due = self.__unsnapshotted and self.__snapshot_interval is not None and \
+                self.__clock() - self.__last_snapshot >= self.__snapshot_interval
+        if snapshot_due:
+            self.snapshot()
+
+        return self.__registry.versions()
+
+    def __apply(self, classifiers, texts, labels):
+        # The classifiers currently served are updated in place; a classifier swapped in later by a reload gets the batch through __replay
+        for classifier in classifiers.values():
+            classifier.partial_fit(texts, labels)
+        with self.__unsnapshotted_lock:
+            self.__unsnapshotted.append((texts, labels))
+            self.__applied += len(texts)
+            self.__batches += 1
+
+    def __replay(self, name, classifier):
+        """
+        Apply the batches which are not snapshotted yet to a classifier loaded from its artifacts
+        :return int: The number of replayed batches
+        """
+        with self.__unsnapshotted_lock:
+            batches = list(self.__unsnapshotted)
+        for texts, labels in batches:
+            classifier.partial_fit(texts, labels)
+        return len(batches)
+
+    def snapshot(self):
+        """
+        Write the updated models into their artifacts now, on top of the feedback snapshotted meanwhile by other processes
+        """
+        replayed = []
+        self.__registry.save(rebase=lambda name, classifier: replayed.append(self.__replay(name, classifier)))
+
+        # The registry lock is held during the whole save, so every model replayed the same batches; the batches applied since then are kept
+        with self.__unsnapshotted_lock:
+            del self.__unsnapshotted[:max(replayed, default=0)]
+            self.__last_snapshot = self.__clock()
+            self.__snapshots += 1
+
+    def stats(self):
+        """
+        :return: A dictionary with the number of pending and applied texts, of update batches, of batches not snapshotted yet and of snapshots
+        """
+        with self.__condition:
+            pending = len(self.__pending_texts)
+        with self.__unsnapshotted_lock:
+            return {'pending': pending, 'applied': self.__applied, 'batches': self.__batches, 'unsnapshotted': len(self.__unsnapshotted),
+                    'snapshots': self.__snapshots}
+
+    def __start_worker(self):
+        with self.__condition:
+            if self.__worker_pid == os.getpid():
+                return
+            self.__worker_pid = os.getpid()
+            threading.Thread(target=self.__run, name='online-learner', daemon=True).start()
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                if len(self.__pending_texts) < self.__batch_size:
+                    self.__condition.wait(self.__flush_interval)
+            try:
+                self.flush()
+            except Exception as error:
+                print(f"Applying the feedback to the models failed: {error}", file=sys.stderr)
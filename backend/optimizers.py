@@ -0,0 +1,222 @@
+import numpy as np
+
+
+def sigmoid(z):
+    """
+    :param z: A real number, in the range [-infinite, +infinite]
+    :return: A value between [0, 1]
+    """
+    return 1 / (1 + np.exp(-z))
+
+
+def cost(x, y, theta):
+    """
+    Logistic regression cost (mean cross-entropy), computed as log(1 + e^z) - y * z, which is the same value as
+    -(y * log(h) + (1 - y) * log(1 - h)) but does not overflow when h saturates to 0 or 1
+    :param x: Matrix of features
+    :param y: Corresponding labels of the input matrix x
+    :param theta: Weight vector
+    :return: The cost J
+    """
+    z = np.dot(x, theta)
+    return float(np.mean(np.logaddexp(0, z) - y * z))
+
+
+class FeatureScaler:
+    """
+    Standardization of the feature matrix: every column except the bias column is shifted to zero mean and scaled to unit variance.
+    Standardized features keep the cost function well conditioned, so the optimizers can use a normal learning rate instead of a tiny one.
+    """
+
+    def __init__(self, mean=None, scale=None):
+        """
+        :param mean: The value subtracted from each column
+        :param scale: The value each column is divided by, after subtracting the mean
+        """
+        self.mean = mean
+        self.scale = scale
+
+    @classmethod
+    def identity(cls, num_features):
+        """
+        :return FeatureScaler: A scaler which leaves the features unchanged
+        """
+        return cls(np.zeros(num_features), np.ones(num_features))
+
+    def fit(self, x):
+        """
+        Compute the mean and the standard deviation of each column; column 0 is the bias term and is left unchanged
+        :param x: Matrix of features
+        :return FeatureScaler: The scaler itself
+        """
+        self.mean = x.mean(axis=0)
+        self.scale = x.std(axis=0)
+        self.mean[0] = 0
+        self.scale[0] = 1
+
+        # Constant columns would be divided by 0 -> leave them unscaled
+        self.scale[self.scale == 0] = 1
+        return self
+
+    def transform(self, x):
+        """
+        :param x: Matrix (or row vector) of features
+        :return: The standardized features
+        """
+        return (x - self.mean) / self.scale
+
+
+class GradientDescent:
+    """
+    Full-batch gradient descent with a fixed learning rate; the original training routine of the logistic regression classifier
+    """
+    name = "Gradient Descent"
+
+    def __init__(self, alpha=1e-9, num_iterations=1500, tol=None, cost_interval=None):
+        """
+        :param alpha: Learning rate
+        :param num_iterations: Maximum number of iterations the model is trained for
+        :param tol: Training stops early once the cost decreases by less than tol between two cost evaluations; None disables early stopping
+        :param cost_interval: Number of iterations between two cost evaluations; None only evaluates the cost after the last iteration
+        """
+        self.alpha = alpha
+        self.num_iterations = num_iterations
+        self.tol = tol
+        self.cost_interval = cost_interval
+
+    def minimize(self, x, y, theta):
+        """
+        :param x: Matrix of features
+        :param y: Corresponding labels of the input matrix x / target variable
+        :param theta: Initial weight vector
+        :return: J: The final cost
+                 theta: The adjusted / final weight vector
+                 iterations: The number of iterations performed
+        """
+        m = x.shape[0]
+        previous_cost = None
+        iteration = 0
+        for iteration in range(1, self.num_iterations + 1):
+            h = sigmoid(np.dot(x, theta))
+
+            # Update the weights theta
+            theta = theta - (self.alpha / m) * np.dot(x.transpose(), (h - y))
+
+            if self.cost_interval and iteration % self.cost_interval == 0:
+                current_cost = cost(x, y, theta)
+                if self.tol is not None and previous_cost is not None and previous_cost - current_cost < self.tol:
+                    break
+                previous_cost = current_cost
+
+        return cost(x, y, theta), theta, iteration
+
+
+class MiniBatchSGD:
+    """
+    Mini-batch stochastic gradient descent: the training set is shuffled every epoch and the weights are updated after every batch
+    """
+    name = "Mini-Batch SGD"
+
+    def __init__(self, learning_rate=0.5, batch_size=256, max_epochs=100, tol=1e-4, cost_interval=1, seed=0):
+        """
+        :param learning_rate: Learning rate (the features are expected to be standardized)
+        :param batch_size: Number of samples in every batch
+        :param max_epochs: Maximum number of passes over the training set
+        :param tol: Training stops early once the cost changes by less than tol between two cost evaluations; None disables early stopping
+        :param cost_interval: Number of epochs between two cost evaluations
+        :param seed: Seed of the random generator used to shuffle the training set, so that training is reproducible
+        """
+        self.learning_rate = learning_rate
+        self.batch_size = batch_size
+        self.max_epochs = max_epochs
+        self.tol = tol
+        self.cost_interval = cost_interval
+        self.seed = seed
+
+    def minimize(self, x, y, theta):
+        """
+        :param x: Matrix of features
+        :param y: Corresponding labels of the input matrix x / target variable
+        :param theta: Initial weight vector
+        :return: J: The final cost
+                 theta: The adjusted / final weight vector
+                 iterations: The number of epochs performed
+        """
+        m = x.shape[0]
+        generator = np.random.default_rng(self.seed)
+        previous_cost = None
+        epoch = 0
+        for epoch in range(1, self.max_epochs + 1):
+            order = generator.permutation(m)
+            for start in range(0, m, self.batch_size):
+                batch = order[start:start + self.batch_size]
+                x_batch = x[batch]
+                h = sigmoid(np.dot(x_batch, theta))
+                theta = theta - (self.learning_rate / len(batch)) * np.dot(x_batch.transpose(), (h - y[batch]))
+
+            if self.cost_interval and epoch % self.cost_interval == 0:
+                current_cost = cost(x, y, theta)
+                if self.tol is not None and previous_cost is not None and abs(previous_cost - current_cost) < self.tol:
+                    break
+                previous_cost = current_cost
+
+        return cost(x, y, theta), theta, epoch
+
+
+class NewtonSolver:
+    """
+    Newton's method with a backtracking line search: every iteration solves a (features x features) linear system with the Hessian of the
+    cost, so it converges in a handful of iterations for the small number of features used by the classifier
+    """
+    name = "Newton"
+
+    def __init__(self, max_iterations=100, tol=1e-10, cost_interval=1, l2=1e-8):
+        """
+        :param max_iterations: Maximum number of Newton iterations
+        :param tol: Training stops once the cost decreases by less than tol between two cost evaluations
+        :param cost_interval: Number of iterations between two cost evaluations
+        :param l2: Small ridge term added to the Hessian, keeping the linear system solvable when the classes are separable
+        """
+        self.max_iterations = max_iterations
+        self.tol = tol
+        self.cost_interval = cost_interval
+        self.l2 = l2
+
+    def minimize(self, x, y, theta):
+        """
+        :param x: Matrix of features
+        :param y: Corresponding labels of the input matrix x / target variable
+        :param theta: Initial weight vector
+        :return: J: The final cost
+                 theta: The adjusted / final weight vector
+                 iterations: The number of iterations performed
+        """
+        m = x.shape[0]
+        identity = np.eye(x.shape[1])
+        current_cost = cost(x, y, theta)
+        previous_cost = current_cost
+        iteration = 0
+        for iteration in range(1, self.max_iterations + 1):
+            h = sigmoid(np.dot(x, theta))
+            gradient = np.dot(x.transpose(), (h - y)) / m
+            hessian = np.dot(x.transpose() * (h * (1 - h)).reshape(-1), x) / m + self.l2 * identity
+            step = np.linalg.solve(hessian, gradient)
+
+            # Backtracking line search: halve the step until the cost satisfies the Armijo condition
+            step_size = 1.0
+            decrease = float(np.dot(gradient.transpose(), step))
+            while True:
+                candidate = theta - step_size * step
+                candidate_cost = cost(x, y, candidate)
+                if candidate_cost <= current_cost - 1e-4 * step_size * decrease or step_size < 1e-10:
+                    break
+                step_size /= 2
+            theta = candidate
+            current_cost = candidate_cost
+
+            if self.cost_interval and iteration % self.cost_interval == 0:
+                if previous_cost - current_cost < self.tol:
+                    break
+                previous_cost = current_cost
+
+        return current_cost, theta, iteration
@@ -0,0 +1,142 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Fixed per-entry overhead (key, timestamps, OrderedDict node) added to the size of each cached value when enforcing the byte limit
+_ENTRY_OVERHEAD = 200
+
+
+def normalize_text(text):
+    """
+    Normalize a text before it is used as a cache key. Only transformations which cannot change the preprocessed tokens are applied:
+    Windows line endings are converted to Unix line endings.
+    :param string text: The text to be normalized
+    :return string: The normalized text
+    """
+    return text.replace('\r\n', '\n')
+
+
+class PredictionCache:
+    """
+    Thread-safe, bounded LRU cache with a time-to-live for prediction results.
+    Entries are keyed by a hash of the normalized input together with the version of the model which produced the result, so results of a
+    model which has since been retrained or reloaded are never returned. The cache is limited both by its number of entries and by the
+    approximate number of bytes held by the entries; the least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=16 * 1024 * 1024, ttl=3600, clock=time.monotonic):
+        """
+        :param int max_entries: Maximum number of entries held by the cache
+        :param int max_bytes: Maximum approximate size, in bytes, of all entries
+        :param ttl: Number of seconds after which an entry expires; None keeps entries until they are evicted
+        :param clock: Function returning the current time in seconds
+        """
+        self.__max_entries = max_entries
+        self.__max_bytes = max_bytes
+        self.__ttl = ttl
+        self.__clock = clock
+
+        # Maps each key to a tuple (value, size, expiry time), ordered from the least to the most recently used
+        self.__entries = OrderedDict()
+        self.__bytes = 0
+        self.__lock = threading.Lock()
+
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__expirations = 0
+
+    @staticmethod
+    def make_key(text, model_version, namespace='text'):
+        """
+        :param string text: The input the result was computed for
+        :param string model_version: The version of the model which computed the result
+        :param string namespace: Separates results of different kinds of input (e.g. texts and image URLs)
+        :return bytes: The cache key
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(namespace.encode('utf-8') + b'\0' + str(model_version).encode('utf-8') + b'\0')
+        digest.update(normalize_text(text).encode('utf-8', 'surrogatepass'))
+        return digest.digest()
+
+    def get(self, key):
+        """
+        :param bytes key: The key of the entry
+        :return: The cached value, or None when there is no valid entry for the key
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.__misses += 1
+                return None
+
+            value, size, expiry = entry
+            if expiry is not None and expiry <= self.__clock():
+                self.__remove(key)
+                self.__expirations += 1
+                self.__misses += 1
+                return None
+
+            self.__entries.move_to_end(key)
+            self.__hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entries when a limit is exceeded
+        :param bytes key: The key of the entry
+        :param value: The value to be cached (must not be None)
+        """
+        size = len(key) + sys.getsizeof(value) + _ENTRY_OVERHEAD
+        if size > self.__max_bytes:
+            return
+
+        expiry = self.__clock() + self.__ttl if self.__ttl is not None else None
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+            self.__entries[key] = (value, size, expiry)
+            self.__bytes += size
+
+            while len(self.__entries) > self.__max_entries or self.__bytes > self.__max_bytes:
+                self.__remove(next(iter(self.__entries)))
+                self.__evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        :param bytes key: The key of the entry
+        :param compute: Function without arguments computing the value on a cache miss
+        :return: The cached or the newly computed value
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+
+    def stats(self):
+        """
+        :return: A dictionary with the hit, miss, eviction and expiration counters, and the current number of entries and bytes
+        """
+        with self.__lock:
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'evictions': self.__evictions,
+                'expirations': self.__expirations,
+                'entries': len(self.__entries),
+                'bytes': self.__bytes,
+                'max_entries': self.__max_entries,
+                'max_bytes': self.__max_bytes,
+            }
+
+    def __remove(self, key):
+        _, size, _ = self.__entries.pop(key)
+        self.__bytes -= size
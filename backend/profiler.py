@@ -0,0 +1,64 @@
+import os
+import sys
+import threading
+from collections import Counter
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a single thread: a background thread periodically samples the call stack of the target thread and counts
+    how often each stack is seen. Nothing is traced between samples, so the profiled code runs at (almost) full speed.
+    The result is reported in the collapsed-stack format read by flame graph tools: "outer;inner;innermost count".
+    """
+
+    def __init__(self, thread_id=None, interval=0.001, max_depth=64):
+        """
+        :param thread_id: The identifier of the thread to be profiled; defaults to the calling thread
+        :param interval: Seconds between two samples
+        :param int max_depth: Maximum number of frames recorded per sample
+        """
+        self.__thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.__interval = interval
+        self.__max_depth = max_depth
+        self.__samples = Counter()
+        self.__stopped = threading.Event()
+        self.__sampler = None
+
+    def start(self):
+        self.__sampler = threading.Thread(target=self.__sample, name='sampling-profiler', daemon=True)
+        self.__sampler.start()
+        return self
+
+    def stop(self):
+        self.__stopped.set()
+        self.__sampler.join()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __sample(self):
+        while not self.__stopped.wait(self.__interval):
+            frame = sys._current_frames().get(self.__thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None and len(stack) < self.__max_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.__samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """
+        :return: The sampled stacks in collapsed-stack format, most frequent first
+        """
+        return [f"{stack} {count}" for stack, count in self.__samples.most_common()]
+
+    @property
+    def sample_count(self):
+        return sum(self.__samples.values())
@@ -0,0 +1,109 @@
+import codecs
+import re
+
+# Default maximum length of a segment, in characters; longer sentences are split at the last whitespace before the limit
+DEFAULT_MAX_CHARS = 1000
+
+# Size of the blocks read from a byte stream; a read waits until a whole block is received, so small blocks let the segments of a document
+# which is still being uploaded be analysed early
+READ_BLOCK_SIZE = 4096
+
+# End of a sentence: terminal punctuation (with any closing quotes or brackets) followed by whitespace, or a line break
+_SENTENCE_BOUNDARY = re.compile(r'[.!?…]+[\"\')\]”’]*\s+|\n+')
+_WHITESPACE = re.compile(r'\s')
+
+SEGMENTATION_MODES = ('sentence', 'chunk')
+
+
+def _find_cut(buffer, position, mode, max_chars, final):
+    """
+    :param int position: The start, in the buffer, of the text which is not segmented yet
+    :return: The position in the buffer where the next segment ends, or None when more text is needed to decide
+    """
+    limit = position + max_chars
+    if mode == 'sentence':
+        match = _SENTENCE_BOUNDARY.search(buffer, position, limit + 1)
+
+        # A boundary touching the end of the buffer might continue in the next block (e.g. more whitespace) -> wait for it, unless it is final
+        if match is not None and (match.end() < len(buffer) or final):
+            return match.end()
+
+    if len(buffer) > limit:
+        # Too long for one segment: cut at the last whitespace before the limit, so that no word is split, or at the limit itself
+        last_space = None
+        for last_space in _WHITESPACE.finditer(buffer, position, limit):
+            pass
+        return last_space.end() if last_space is not None and last_space.end() > position else limit
+
+    return len(buffer) if final and len(buffer) > position else None
+
+
+def iter_segments(blocks, mode='sentence', max_chars=DEFAULT_MAX_CHARS):
+    """
+    Split a text, received as a sequence of blocks, into sentences or fixed-size chunks. Segments are produced as soon as their end is seen, and
+    only the text of the current, unfinished segment is kept in memory, so arbitrarily long texts are split in bounded memory.
+    :param blocks: An iterable of strings which, concatenated, form the text
+    :param string mode: 'sentence' to split at the end of each sentence, 'chunk' to split into chunks of max_chars characters
+    :param int max_chars: The maximum length of a segment
+    :return: An iterator of tuples (start, end, segment), where start and end are the character offsets of the segment in the text; the
+             whitespace around the segments is left out, and empty segments are skipped
+    """
+    # Validate the arguments now, and not when the first segment is requested
+    if mode not in SEGMENTATION_MODES:
+        raise ValueError(f"Unknown segmentation mode '{mode}', expected one of {SEGMENTATION_MODES}")
+    if max_chars < 1:
+        raise ValueError(f"The maximum length of a segment must be positive, got {max_chars}")
+    return _split(iter(blocks), mode, max_chars)
+
+
+def _split(blocks, mode, max_chars):
+    # The segments are found by moving a position through the buffer; the segmented text is only dropped from the buffer when the next
+    # block is appended, so a text received as a single block is never copied
+    buffer = ''
+    position = 0
+    offset = 0
+    final = False
+    while not final:
+        block = next(blocks, None)
+        if block is None:
+            final = True
+        else:
+            offset += position
+            buffer = buffer[position:] + block
+            position = 0
+
+        while True:
+            cut = _find_cut(buffer, position, mode, max_chars, final)
+            if cut is None:
+                break
+
+            segment = buffer[position:cut]
+            stripped = segment.strip()
+            if stripped:
+                start = offset + position + len(segment) - len(segment.lstrip())
+                yield start, start + len(stripped), stripped
+
+            position = cut
+
+
+def iter_decoded(stream, encoding='utf-8', block_size=READ_BLOCK_SIZE):
+    """
+    :param stream: A binary file-like object (e.g. the body of a request)
+    :param string encoding: The encoding of the stream; an unknown encoding raises a LookupError at once, not when the first block is requested
+    :return: A generator of the decoded text of the stream, block by block; a character split between two blocks is decoded with the next one
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    return _decode(stream, decoder, block_size)
+
+
+def _decode(stream, decoder, block_size):
+    while True:
+        data = stream.read(block_size)
+        if not data:
+            break
+        text = decoder.decode(data)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
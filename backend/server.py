@@ -0,0 +1,86 @@
+import gc
+import os
+import signal
+import socket
+from werkzeug.serving import make_server
+
+
+def _listen(host, port, backlog=512):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(backlog)
+    listener.set_inheritable(True)
+    return listener
+
+
+def _run_worker(app, host, port, listener):
+    # Default signal handling in the worker: SIGTERM from the parent stops it
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+    server.serve_forever()
+
+
+def serve(app, host='127.0.0.1', port=5000, workers=1):
+    """
+    Serve the application from a pre-forked pool of worker processes sharing one listening socket.
+    The application (and so the loaded model) is created in the parent process before forking, so its memory pages are shared copy-on-write
+    between the workers; each worker serves requests with a thread per connection. Workers which die are replaced.
+    :param app: The WSGI application
+    :param string host: Interface to listen on
+    :param int port: Port to listen on
+    :param int workers: Number of worker processes; 1 serves from the current process
+    """
+    listener = _listen(host, port)
+
+    if workers <= 1 or not hasattr(os, 'fork'):
+        make_server(host, port, app, threaded=True, fd=listener.fileno()).serve_forever()
+        return
+
+    # Move every object created so far into the permanent generation, so that garbage collection in the workers does not write to (and so
+    # copy) the pages holding the model
+    gc.collect()
+    gc.freeze()
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app, host, port, listener)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        spawn()
+    print(f"Serving on http://{host}:{port} with {workers} worker processes")
+
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            spawn()
+
+    listener.close()
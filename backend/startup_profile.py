@@ -0,0 +1,104 @@
+"""
+Profile the cold start of the server: the import time of every module imported by main (measured with "python -X importtime" in a fresh
+interpreter), the time needed to load each model from its artifacts and the duration of each phase of the warm-up.
+Run from the backend directory:
+
+    python startup_profile.py                    # the 15 slowest imports, the model loads and the warm-up
+    python startup_profile.py --top 0            # every imported module
+    python startup_profile.py --json             # the same report as JSON
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+# Module imported by the profiled interpreter; importing it is what a starting worker does before it loads the models
+DEFAULT_ENTRY_MODULE = 'main'
+
+
+def import_times(module=DEFAULT_ENTRY_MODULE):
+    """
+    Import the module in a fresh interpreter with "-X importtime", so that no module is already cached
+    :param string module: The module to import
+    :return: A list of dictionaries, one per imported module in import order, with its name, its nesting depth, and its own and cumulative
+             (including the modules it imports) import time in seconds
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing '{module}' failed:\n{completed.stderr}")
+
+    modules = []
+    for line in completed.stderr.splitlines():
+        # Lines look like "import time:       236 |      65273 |       flask.globals", the indentation of the name giving the nesting depth
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative_time, name = line[len('import time:'):].split('|')
+        modules.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_seconds': int(self_time) / 1e6,
+            'cumulative_seconds': int(cumulative_time) / 1e6,
+        })
+    return modules
+
+
+def load_times():
+    """
+    Import main and load every servable model in this process, timing each step like a starting worker
+    :return: A dictionary with the import time of main, the load time of each model and the duration of each warm-up phase, in seconds
+    """
+    start = time.perf_counter()
+    import main
+    from model_registry import ModelRegistry, MODELS
+    import_seconds = time.perf_counter() - start
+
+    model_registry = ModelRegistry(watch=False)
+    models = {}
+    for name, model_class in MODELS.items():
+        start = time.perf_counter()
+        classifier = model_class()
+        classifier.load()
+        models[name] = time.perf_counter() - start
+        model_registry.put(name, classifier)
+
+    return {'import_seconds': import_seconds, 'models': models, 'warm_up': main.warm_up(model_registry)}
+
+
+def _format_milliseconds(seconds):
+    return f"{seconds * 1000:9.1f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup profile of the sentiment analysis server")
+    parser.add_argument('--module', default=DEFAULT_ENTRY_MODULE, help="Module whose imports are profiled (default: %(default)s)")
+    parser.add_argument('--top', type=int, default=15, help="Number of slowest imports listed, 0 listing all of them (default: %(default)s)")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    modules = import_times(args.module)
+    report = {'imports': modules, **load_times()}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    slowest = sorted(modules, key=lambda module: module['cumulative_seconds'], reverse=True)
+    if args.top:
+        slowest = slowest[:args.top]
+    print(f"{'Import':48s} {'self':>12s} {'cumulative':>12s}")
+    for module in slowest:
+        print(f"{module['module']:48s} {_format_milliseconds(module['self_seconds'])} {_format_milliseconds(module['cumulative_seconds'])}")
+
+    total = report['import_seconds'] + sum(report['models'].values()) + sum(report['warm_up'].values())
+    print()
+    print(f"{'Startup phase':48s} {'time':>12s}")
+    print(f"{'import ' + args.module:48s} {_format_milliseconds(report['import_seconds'])}")
+    for name, seconds in report['models'].items():
+        print(f"{'load ' + name:48s} {_format_milliseconds(seconds)}")
+    for phase, seconds in report['warm_up'].items():
+        print(f"{'warm up ' + phase:48s} {_format_milliseconds(seconds)}")
+    print(f"{'total':48s} {_format_milliseconds(total)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+import os
+import sys
+import pytest
+
+# The backend modules are imported as top-level modules, like when the server runs from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+
+
+@pytest.fixture(autouse=True)
+def preprocessor():
+    """
+    Preprocess the texts of the tests without stop words, so that the tests do not need the NLTK stopword corpus
+    """
+    previous = utils._default_preprocessor
+    utils.set_default_preprocessor(utils.Preprocessor(stop_words=()))
+    yield utils.get_default_preprocessor()
+    utils.set_default_preprocessor(previous)
@@ -0,0 +1,37 @@
+import pytest
+from main import create_app
+
+
+class FakeClassifier:
+    """
+    Classifier labelling the texts containing "good" as positive
+    """
+    artifact_files = ()
+    model_version = 'fake'
+
+    def predict_batch(self, texts):
+        return ['POSITIVE' if 'good' in text else 'NEGATIVE' for text in texts]
+
+
+@pytest.fixture
+def client():
+    app = create_app(classifier=FakeClassifier(), model='logistic_regression', poll_interval=0, snapshot_interval=0, max_batch_size=1)
+    return app.test_client()
+
+
+def test_batch_is_scored_in_order(client):
+    response = client.post('/api/get_text_polarity_batch', json={'texts': ["a good day", "a bad day"]})
+    assert response.status_code == 200
+    assert response.get_json() == {'polarities': ['POSITIVE', 'NEGATIVE']}
+
+
+@pytest.mark.parametrize('data_json', [
+    {'texts': "a good day"},
+    {'texts': ["a good day", 3]},
+    {'text': "a good day"},
+    ["a good day"],
+])
+def test_invalid_batch_is_rejected(client, data_json):
+    response = client.post('/api/get_text_polarity_batch', json=data_json)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,92 @@
+import os
+import pytest
+from corpus_readers import ListCorpus, CsvCorpus, JsonlCorpus, count_corpus, CorpusFormatError
+from utils import parse_label, build_word_freq_dict
+
+TEXTS = [
+    "I love this movie, it is great",
+    "What a terrible and boring film",
+    "Great acting and a great story",
+    "I hated every minute of it",
+    "Lovely music, lovely people",
+    "Boring, boring, boring",
+    "The best film of the year",
+    "The worst film of the year",
+]
+LABELS = [1, 0, 1, 0, 1, 0, 1, 0]
+
+
+@pytest.fixture
+def corpus():
+    return ListCorpus(TEXTS, LABELS)
+
+
+def test_spilled_counts_match_in_memory_counts(corpus, tmp_path):
+    in_memory, documents = count_corpus(corpus, workers=1, chunk_size=2)
+    spilled, spilled_documents = count_corpus(corpus, workers=1, chunk_size=2, max_pairs=5, spill_directory=str(tmp_path))
+
+    assert spilled.to_freq_dict() == in_memory.to_freq_dict()
+    assert spilled_documents.tolist() == documents.tolist() == [4, 4]
+    assert in_memory.to_freq_dict() == build_word_freq_dict(TEXTS, LABELS)
+    # The merged vocabulary is sorted, and the spilled runs are removed
+    assert spilled.words == sorted(spilled.words)
+    assert os.listdir(tmp_path) == []
+
+
+def test_min_count_prunes_the_same_words_with_and_without_spilling(corpus, tmp_path):
+    in_memory, _ = count_corpus(corpus, workers=1, chunk_size=3, min_count=2)
+    spilled, _ = count_corpus(corpus, workers=1, chunk_size=3, max_pairs=1, min_count=2, spill_directory=str(tmp_path))
+
+    assert spilled.to_freq_dict() == in_memory.to_freq_dict()
+    assert all(pos + neg >= 2 for pos, neg in zip(spilled.pos_counts.tolist(), spilled.neg_counts.tolist()))
+    assert 'great' in spilled and 'movi' not in spilled
+
+
+def test_split_partitions_the_corpus(corpus):
+    train, test = corpus.split(test_fraction=0.5, seed=3)
+    train_records, test_records = list(train), list(test)
+
+    assert sorted(train_records + test_records) == sorted(corpus)
+    assert not set(train_records) & set(test_records)
+    # The assignment only depends on the texts and the seed
+    assert list(corpus.split(test_fraction=0.5, seed=3)[1]) == test_records
+
+
+def test_split_keeps_duplicates_together():
+    corpus = ListCorpus(TEXTS * 3, LABELS * 3)
+    train, test = corpus.split(test_fraction=0.5)
+    assert not {text for text, _ in train} & {text for text, _ in test}
+
+
+def test_split_limits(corpus):
+    assert list(corpus.split(test_fraction=0)[1]) == []
+    assert list(corpus.split(test_fraction=1)[0]) == []
+    with pytest.raises(ValueError):
+        corpus.split(test_fraction=1.5)
+
+
+def test_file_readers(tmp_path):
+    csv_path = tmp_path / 'corpus.csv'
+    csv_path.write_text('text,label\n"good, really good",positive\nbad,NEG\n', encoding='utf-8')
+    assert list(CsvCorpus(str(csv_path))) == [('good, really good', 1.0), ('bad', 0.0)]
+
+    jsonl_path = tmp_path / 'corpus.jsonl'
+    jsonl_path.write_text('{"message": "good", "sentiment": 1}\n\n{"message": "bad", "sentiment": "false"}\n', encoding='utf-8')
+    assert list(JsonlCorpus(str(jsonl_path), text_field='message', label_field='sentiment')) == [('good', 1.0), ('bad', 0.0)]
+
+    jsonl_path.write_text('{"text": "good", "label": "maybe"}\n', encoding='utf-8')
+    with pytest.raises(CorpusFormatError):
+        list(JsonlCorpus(str(jsonl_path)))
+
+
+@pytest.mark.parametrize('value, expected', [
+    (1, 1.0), (0, 0.0), (True, 1.0), (1.0, 1.0), ('1', 1.0), ('POSITIVE', 1.0), ('negative', 0.0), (' pos ', 1.0), ('False', 0.0),
+])
+def test_parse_label(value, expected):
+    assert parse_label(value) == expected
+
+
+@pytest.mark.parametrize('value', [2, -1, 0.5, 'maybe', '', None, [1]])
+def test_parse_label_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        parse_label(value)
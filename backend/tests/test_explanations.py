@@ -0,0 +1,17 @@
+import os
+import pytest
+from model_registry import MODELS
+
+BACKEND_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('name, score_kind', [('logistic_regression', 'probability'), ('naive_bayes', 'log_odds')])
+def test_every_model_explains_with_the_same_fields(monkeypatch, name, score_kind):
+    monkeypatch.chdir(BACKEND_DIRECTORY)
+    classifier = MODELS[name]()
+    classifier.load()
+
+    explanation = classifier.explain("I love this great day :)")
+    assert sorted(explanation) == ['intercept', 'polarity', 'score', 'score_kind', 'tokens']
+    assert explanation['score_kind'] == score_kind
+    assert [sorted(token) for token in explanation['tokens']] == [['contribution', 'token']] * len(explanation['tokens'])
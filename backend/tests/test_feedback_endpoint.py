@@ -0,0 +1,29 @@
+import pytest
+from main import feedback_from_json
+
+
+@pytest.mark.parametrize('data_json, expected', [
+    ({'text': "great", 'label': 'POSITIVE'}, (["great"], [1.0])),
+    ({'texts': ["great", "awful"], 'labels': [1, 'neg']}, (["great", "awful"], [1.0, 0.0])),
+    ({'texts': [], 'labels': []}, ([], [])),
+])
+def test_feedback_from_json(data_json, expected):
+    assert feedback_from_json(data_json) == expected
+
+
+@pytest.mark.parametrize('data_json', [
+    None,
+    ["great"],
+    {'text': "great"},
+    {'label': 1},
+    {'texts': ["great"]},
+    {'labels': [1]},
+    {'texts': "great", 'labels': [1, 1, 1, 1, 1]},
+    {'texts': ["great"], 'labels': 1},
+    {'texts': ["great", 3], 'labels': [1, 0]},
+    {'texts': ["great", "awful"], 'labels': [1]},
+    {'text': "great", 'label': 'maybe'},
+])
+def test_invalid_feedback_is_rejected(data_json):
+    with pytest.raises(ValueError):
+        feedback_from_json(data_json)
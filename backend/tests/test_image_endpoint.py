@@ -0,0 +1,25 @@
+import image_scanner
+from main import create_app
+
+
+class FakeClassifier:
+    """
+    Classifier labelling the texts containing "good" as positive
+    """
+    artifact_files = ()
+    model_version = 'fake'
+
+    def predict_text_polarity(self, text):
+        return 'POSITIVE' if 'good' in text else 'NEGATIVE'
+
+
+def test_image_behind_a_url_is_scanned_again(monkeypatch):
+    app = create_app(classifier=FakeClassifier(), model='logistic_regression', poll_interval=0, snapshot_interval=0, max_batch_size=1)
+    client = app.test_client()
+
+    # The image served at the URL changes between the two requests
+    texts = iter(["a good day", "a bad day"])
+    monkeypatch.setattr(image_scanner.ImageScanner, 'get_text_from_image', lambda scanner: next(texts))
+    polarities = [client.post('/api/get_image_text_polarity', json={'image_url': "http://images.test/a.png"}).get_json()['polarity']
+                  for _ in range(2)]
+    assert polarities == ['POSITIVE', 'NEGATIVE']
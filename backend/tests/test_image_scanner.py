@@ -0,0 +1,126 @@
+import io
+import os
+import time
+import pytest
+import pytesseract
+from PIL import Image
+from benchmarks.fixture_server import FixtureServer, FIXTURE_IMAGES_DIRECTORY
+from image_scanner import ImageScanner, ImageDownloadError, ImageFormatError, ImageTooLargeError, recognize_text
+
+
+class FakeResponse:
+    """
+    Streamed response whose chunks each take one second of a fake clock
+    """
+
+    def __init__(self, chunks, clock):
+        self.headers = {}
+        self.raw = self
+        self.__chunks = iter(chunks)
+        self.__clock = clock
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def read1(self, amt, decode_content):
+        chunk = next(self.__chunks, b'')
+        if chunk:
+            self.__clock.now += 1
+        return chunk
+
+
+class FakeSession:
+    def __init__(self, chunks, clock):
+        self.__chunks = chunks
+        self.__clock = clock
+
+    def get(self, url, timeout, stream):
+        return FakeResponse(self.__chunks, self.__clock)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def scanner(chunks, **options):
+    clock = FakeClock()
+    return ImageScanner('http://images.test/image.png', session=FakeSession(chunks, clock), clock=clock, cache=None, **options)
+
+
+def test_download_within_the_deadline():
+    assert scanner([b'ab', b'cd'], deadline=2).download_image() == b'abcd'
+
+
+def test_download_exceeding_the_deadline_is_aborted():
+    with pytest.raises(ImageDownloadError, match='within 2 s'):
+        scanner([b'a'] * 10, deadline=2).download_image()
+
+
+def test_download_exceeding_the_size_limit_is_aborted():
+    with pytest.raises(ImageTooLargeError):
+        scanner([b'abc', b'def'], max_bytes=4).download_image()
+
+
+@pytest.mark.parametrize('content', [b'not an image', b''])
+def test_content_which_is_not_an_image_is_rejected(content):
+    with pytest.raises(ImageFormatError):
+        recognize_text(content)
+
+
+def test_truncated_image_is_rejected():
+    encoded = io.BytesIO()
+    Image.new('RGB', (64, 64), 'white').save(encoded, format='PNG')
+    with pytest.raises(ImageFormatError):
+        recognize_text(encoded.getvalue()[:60])
+
+
+@pytest.fixture(scope='module')
+def fixture_server():
+    # Local stand-in for the image hosts: the real HTTP session, streaming and timeouts of the scanner are exercised offline
+    with FixtureServer(delay=1.0, large_size=1024 * 1024, trickle_interval=0.05) as server:
+        yield server
+
+
+def test_fixture_image_is_downloaded(fixture_server):
+    with open(os.path.join(FIXTURE_IMAGES_DIRECTORY, 'positive_caption.png'), 'rb') as file:
+        expected = file.read()
+    assert ImageScanner(fixture_server.url('positive_caption.png'), cache=None).download_image() == expected
+
+
+def test_oversized_response_is_aborted(fixture_server):
+    with pytest.raises(ImageTooLargeError):
+        ImageScanner(fixture_server.url('large'), max_bytes=256 * 1024, cache=None).download_image()
+
+
+def test_response_slower_than_the_read_timeout_is_aborted(fixture_server):
+    start = time.monotonic()
+    with pytest.raises(ImageDownloadError):
+        ImageScanner(fixture_server.url('slow/positive_caption.png'), timeout=(1.0, 0.2), cache=None).download_image()
+    assert time.monotonic() - start < 1.0
+
+
+def test_trickling_response_is_aborted_at_the_deadline(fixture_server):
+    # Every chunk arrives within the read timeout, so only the deadline ends the download
+    start = time.monotonic()
+    with pytest.raises(ImageDownloadError, match='within 0.3 s'):
+        ImageScanner(fixture_server.url('trickle'), timeout=(1.0, 1.0), deadline=0.3, cache=None).download_image()
+    assert time.monotonic() - start < 1.0
+
+
+def test_fixture_image_is_recognized(fixture_server):
+    try:
+        pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError:
+        pytest.skip("The tesseract binary is not installed")
+    text = ImageScanner(fixture_server.url('positive_caption.png'), cache=None).get_text_from_image()
+    assert text.strip()
@@ -0,0 +1,131 @@
+import threading
+import time
+import pytest
+from micro_batching import MicroBatcher
+
+# Seconds a test waits at most for the scoring thread
+RESULT_TIMEOUT = 5
+
+
+class FakeClassifier:
+    """
+    Classifier returning the texts in upper case, recording how they were scored
+    """
+
+    def __init__(self, error=None, result=None, release=None):
+        self.batches = []
+        self.single = []
+        self.__error = error
+        self.__result = result
+        self.__release = release
+
+    def predict_batch(self, texts):
+        if self.__release is not None:
+            self.__release.wait(RESULT_TIMEOUT)
+        self.batches.append(list(texts))
+        if self.__error is not None:
+            raise self.__error
+        return self.__result if self.__result is not None else [text.upper() for text in texts]
+
+    def predict_text_polarity(self, text):
+        # Texts named 'slow', and every text scored by the scoring thread, are blocked until the release
+        blocked = text == 'slow' or threading.current_thread().name == 'micro-batcher'
+        if blocked and self.__release is not None:
+            self.__release.wait(RESULT_TIMEOUT)
+        self.single.append(text)
+        return text.upper()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_full_batch_is_flushed_without_waiting():
+    classifier = FakeClassifier()
+    batcher = MicroBatcher(max_batch_size=4, max_wait=60)
+    futures = [batcher.submit(classifier, text) for text in ['a', 'b', 'c', 'd']]
+
+    assert [future.result(RESULT_TIMEOUT) for future in futures] == ['A', 'B', 'C', 'D']
+    assert classifier.batches == [['a', 'b', 'c', 'd']]
+    assert batcher.stats()['full_batches'] == 1
+
+
+def test_partial_batch_is_flushed_when_its_wait_is_over():
+    clock = FakeClock()
+    batcher = MicroBatcher(max_batch_size=8, max_wait=5, clock=clock)
+    first, second, third = FakeClassifier(), FakeClassifier(), FakeClassifier()
+
+    waiting = batcher.submit(first, 'a')
+    time.sleep(0.05)
+    assert not waiting.done()
+
+    # The first text of another queue wakes the scoring thread, which finds the wait of the first queue over
+    clock.now = 5
+    later = batcher.submit(second, 'b')
+    assert waiting.result(RESULT_TIMEOUT) == 'A'
+    # A batch of one text is scored through the single-text path
+    assert first.single == ['a'] and first.batches == []
+    assert not later.done()
+
+    # The previous batch was 1/8 full, so the next text only waits 5/8 s
+    clock.now = 5.7
+    batcher.submit(third, 'c')
+    assert later.result(RESULT_TIMEOUT) == 'B'
+
+
+def test_scoring_error_is_raised_to_every_text_of_the_batch():
+    error = RuntimeError("scoring failed")
+    batcher = MicroBatcher(max_batch_size=2, max_wait=60)
+    failing = FakeClassifier(error=error)
+    futures = [batcher.submit(failing, text) for text in ['a', 'b']]
+    for future in futures:
+        assert future.exception(RESULT_TIMEOUT) is error
+
+    # The scoring thread survives the error
+    classifier = FakeClassifier()
+    futures = [batcher.submit(classifier, text) for text in ['c', 'd']]
+    assert [future.result(RESULT_TIMEOUT) for future in futures] == ['C', 'D']
+
+
+@pytest.mark.parametrize('result', [['A'], 42])
+def test_malformed_batch_result_fails_the_batch_and_not_the_thread(result):
+    batcher = MicroBatcher(max_batch_size=2, max_wait=60)
+    broken = FakeClassifier(result=result)
+    futures = [batcher.submit(broken, text) for text in ['a', 'b']]
+    for future in futures:
+        assert isinstance(future.exception(RESULT_TIMEOUT), (TypeError, ValueError))
+
+    classifier = FakeClassifier()
+    futures = [batcher.submit(classifier, text) for text in ['c', 'd']]
+    assert [future.result(RESULT_TIMEOUT) for future in futures] == ['C', 'D']
+
+
+def test_text_arriving_alone_skips_the_queue():
+    classifier = FakeClassifier()
+    batcher = MicroBatcher(max_batch_size=4, max_wait=60)
+
+    assert batcher.predict(classifier, 'a') == 'A'
+    assert classifier.single == ['a'] and classifier.batches == []
+    assert batcher.stats()['direct'] == 1
+
+
+def test_text_is_scored_by_the_caller_when_the_batch_result_is_late():
+    release = threading.Event()
+    classifier = FakeClassifier(release=release)
+    batcher = MicroBatcher(max_batch_size=4, max_wait=0)
+
+    # A call in flight makes the next one go through the queue, whose batch is blocked until the release
+    in_flight = threading.Thread(target=batcher.predict, args=(classifier, 'slow'))
+    in_flight.start()
+    try:
+        while batcher.stats()['direct'] == 0:
+            time.sleep(0.001)
+        assert batcher.predict(classifier, 'b', timeout=0.05) == 'B'
+        assert classifier.single == ['b']
+    finally:
+        release.set()
+        in_flight.join(RESULT_TIMEOUT)
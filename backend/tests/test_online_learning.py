@@ -0,0 +1,69 @@
+import glob
+import os
+import shutil
+import numpy as np
+import pytest
+from model_registry import ModelRegistry
+from naive_bayes import NaiveBayes
+from online_learning import OnlineLearner
+
+BACKEND_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FEEDBACK_A = (["I love it", "what a great day", "this is awful"], [1, 1, 0])
+FEEDBACK_B = (["so sad and bored", "never again", "really nice people", "hate this"], [0, 0, 1, 0])
+TEXTS = ["I love this great day", "awful, sad and bored", "nice people, never again", "hate it"]
+
+
+@pytest.fixture(autouse=True)
+def artifacts(tmp_path, monkeypatch):
+    # The tests read and write copies of the model artifacts of the project
+    for path in glob.glob(os.path.join(BACKEND_DIRECTORY, '*.model')):
+        shutil.copy(path, tmp_path)
+    monkeypatch.chdir(tmp_path)
+
+
+def start_worker():
+    # Each worker process has its own registry and online learner, reading and writing the same artifacts
+    model_registry = ModelRegistry(['naive_bayes'], default='naive_bayes', watch=False).load_all()
+    return model_registry, OnlineLearner(model_registry, snapshot_interval=None)
+
+
+def test_snapshots_of_several_workers_keep_all_feedback():
+    expected = NaiveBayes()
+    expected.load()
+    expected.partial_fit(*FEEDBACK_A)
+    expected.partial_fit(*FEEDBACK_B)
+
+    registry_a, learner_a = start_worker()
+    registry_b, learner_b = start_worker()
+    learner_a.submit(*FEEDBACK_A)
+    learner_a.flush()
+    learner_b.submit(*FEEDBACK_B)
+    learner_b.flush()
+
+    # Worker B reloads the snapshot of worker A, and replays its own feedback on it
+    learner_a.snapshot()
+    assert registry_b.check_for_updates() == ['naive_bayes']
+    assert np.array_equal(registry_b.get().predict_scores(TEXTS), expected.predict_scores(TEXTS))
+    assert learner_b.stats()['unsnapshotted'] == 1
+
+    # The snapshot of worker B is written on top of the one of worker A
+    learner_b.snapshot()
+    assert learner_b.stats()['unsnapshotted'] == 0
+    assert registry_a.check_for_updates() == ['naive_bayes']
+    assert np.array_equal(registry_a.get().predict_scores(TEXTS), expected.predict_scores(TEXTS))
+
+    snapshotted = NaiveBayes()
+    snapshotted.load()
+    assert np.array_equal(snapshotted.predict_scores(TEXTS), expected.predict_scores(TEXTS))
+
+
+def test_snapshot_keeps_the_served_model():
+    model_registry, learner = start_worker()
+    learner.submit(*FEEDBACK_A)
+    learner.flush()
+    scores = model_registry.get().predict_scores(TEXTS)
+
+    learner.snapshot()
+    assert np.array_equal(model_registry.get().predict_scores(TEXTS), scores)
+    assert learner.stats() == {'pending': 0, 'applied': 3, 'batches': 1, 'unsnapshotted': 0, 'snapshots': 1}
@@ -0,0 +1,37 @@
+import io
+import pytest
+from segmentation import iter_segments, iter_decoded
+
+TEXT = "First sentence. Second one!  Third line\nwith a break\nA \"quoted one.\" A very long sentence without any end " * 20
+
+
+def blocks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize('mode, max_chars', [('sentence', 1000), ('sentence', 25), ('chunk', 40), ('chunk', 7)])
+def test_segments_do_not_depend_on_the_blocks(mode, max_chars):
+    expected = list(iter_segments([TEXT], mode, max_chars))
+    for size in (1, 3, 64, 4096):
+        assert list(iter_segments(blocks(TEXT, size), mode, max_chars)) == expected
+
+    for start, end, segment in expected:
+        assert TEXT[start:end] == segment
+        assert len(segment) <= max_chars
+
+
+def test_sentences():
+    assert list(iter_segments(["Hello there. How are ", "you?  Fine\n\nthanks"])) == [
+        (0, 12, "Hello there."), (13, 25, "How are you?"), (27, 31, "Fine"), (33, 39, "thanks")]
+
+
+def test_decoding_keeps_characters_split_between_blocks():
+    data = "Ça va très bien. Merci !".encode('utf-8')
+    assert ''.join(iter_decoded(io.BytesIO(data), block_size=1)) == "Ça va très bien. Merci !"
+
+
+def test_unknown_encoding_is_rejected_before_reading():
+    with pytest.raises(LookupError):
+        iter_decoded(io.BytesIO(b"text"), 'no-such-charset')
+    with pytest.raises(ValueError):
+        iter_segments(["text"], mode='paragraph')
@@ -0,0 +1,35 @@
+import threading
+from metrics import STAGE_SECONDS, set_stage_timing, stage_timing_enabled, timed_stage
+from utils import get_default_preprocessor
+
+
+def test_stages_are_only_timed_when_enabled():
+    preprocessor = get_default_preprocessor()
+    clean_count, score_count = STAGE_SECONDS.count('clean'), STAGE_SECONDS.count('score')
+
+    assert not stage_timing_enabled()
+    preprocessor.preprocess("what a great day")
+    with timed_stage('score'):
+        pass
+    assert (STAGE_SECONDS.count('clean'), STAGE_SECONDS.count('score')) == (clean_count, score_count)
+
+    assert set_stage_timing(True) is False
+    try:
+        assert preprocessor.preprocess("what a great day") == ["what", "a", "great", "day"]
+        with timed_stage('score'):
+            pass
+    finally:
+        set_stage_timing(False)
+    assert (STAGE_SECONDS.count('clean'), STAGE_SECONDS.count('score')) == (clean_count + 1, score_count + 1)
+
+
+def test_stage_timing_is_per_thread():
+    set_stage_timing(True)
+    try:
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(stage_timing_enabled()))
+        thread.start()
+        thread.join()
+        assert seen == [False]
+    finally:
+        set_stage_timing(False)
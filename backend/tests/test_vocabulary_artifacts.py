@@ -0,0 +1,56 @@
+import glob
+import os
+import shutil
+import numpy as np
+import pytest
+from logistic_regression import LogisticRegression
+from model_registry import ModelRegistry
+from naive_bayes import NaiveBayes
+from word_freq_index import remove_unused_vocabularies
+
+BACKEND_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TRAIN_X = ["I love this great day", "what a nice surprise", "awful, sad and bored", "I hate it"]
+TRAIN_Y = [1, 1, 0, 0]
+
+
+@pytest.fixture(autouse=True)
+def artifacts(tmp_path, monkeypatch):
+    for path in glob.glob(os.path.join(BACKEND_DIRECTORY, '*.model')):
+        shutil.copy(path, tmp_path)
+    monkeypatch.chdir(tmp_path)
+
+
+def vocabularies():
+    return sorted(glob.glob('vocabulary.*.model'))
+
+
+def test_classifiers_share_one_vocabulary_artifact():
+    shared = vocabularies()
+    assert len(shared) == 1
+
+    # Writing both models back with the same counts writes no new vocabulary
+    ModelRegistry(watch=False).load_all().save()
+    assert vocabularies() == shared
+
+
+def test_retraining_one_classifier_keeps_the_vocabulary_of_the_other():
+    shared = vocabularies()
+    NaiveBayes(training_workers=1).execute(TRAIN_X, TRAIN_Y)
+    assert len(vocabularies()) == 2
+
+    # Logistic regression still loads the vocabulary it was trained on
+    ModelRegistry(watch=False).load_all()
+    logistic_regression = LogisticRegression()
+    logistic_regression.load()
+
+    # Once logistic regression is retrained as well, the old vocabulary is unused, and removed after the grace period
+    LogisticRegression(training_workers=1).execute(TRAIN_X, TRAIN_Y)
+    assert set(shared) < set(vocabularies())
+    assert remove_unused_vocabularies() == []
+    assert remove_unused_vocabularies(grace_period=-1) == [os.path.join('.', shared[0])]
+    assert len(vocabularies()) == 1
+
+    naive_bayes = NaiveBayes()
+    naive_bayes.load()
+    assert np.all(np.isfinite(naive_bayes.predict_scores(TRAIN_X)))
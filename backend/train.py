@@ -0,0 +1,69 @@
+"""
+Train a classifier on labelled corpus files, streamed from disk (see corpus_readers), and test it on a held-out part of the corpus.
+The trained model is written into its own model artifacts in the current directory, from which running servers reload it; the artifacts of
+the other model are left untouched. Run from the backend directory, e.g.:
+
+    python train.py messages.csv --text-column message --label-column sentiment
+    python train.py positive.txt:1 negative.txt:0 --model naive_bayes --features hashed --test-fraction 0.1
+    python train.py train.jsonl --test test.jsonl
+"""
+import argparse
+from corpus_readers import open_corpus, ChainedCorpus, DEFAULT_TEST_FRACTION
+from logistic_regression import LogisticRegression
+from naive_bayes import NaiveBayes, FEATURE_MODES
+
+
+def _open(argument, options):
+    # Plain text files take their label after the last colon of the argument, e.g. "positive.txt:1"
+    path, separator, label = argument.rpartition(':')
+    if separator and path.lower().endswith(('.txt', '.txt.gz')):
+        return open_corpus(path, label=label, **options)
+    return open_corpus(argument, **options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train a sentiment classifier on corpus files")
+    parser.add_argument('corpus', nargs='+', help="Training corpus files (.csv, .tsv, .jsonl, .ndjson, or .txt followed by ':<label>')")
+    parser.add_argument('--test', nargs='*', default=None, help="Test corpus files; by default a part of the training corpus is held out")
+    parser.add_argument('--model', choices=('logistic_regression', 'naive_bayes'), default='logistic_regression',
+                        help="The classifier to be trained (default: %(default)s)")
+    parser.add_argument('--features', choices=FEATURE_MODES, default='words', help="Features of the Naive Bayes model (default: %(default)s)")
+    parser.add_argument('--test-fraction', type=float, default=DEFAULT_TEST_FRACTION,
+                        help="Proportion of the training corpus held out for testing when no test corpus is given (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the train/test split (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: the number of CPUs)")
+    parser.add_argument('--text-column', default='text', help="Column (or JSON key) of the texts (default: %(default)s)")
+    parser.add_argument('--label-column', default='label', help="Column (or JSON key) of the labels (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    def open_all(arguments):
+        corpora = []
+        for argument in arguments:
+            if argument.lower().endswith(('.jsonl', '.ndjson', '.jsonl.gz', '.ndjson.gz')):
+                options = {'text_field': args.text_column, 'label_field': args.label_column}
+            elif argument.lower().endswith(('.csv', '.tsv', '.csv.gz', '.tsv.gz')):
+                options = {'text_column': args.text_column, 'label_column': args.label_column}
+            else:
+                options = {}
+            corpora.append(_open(argument, options))
+        return corpora[0] if len(corpora) == 1 else ChainedCorpus(*corpora)
+
+    corpus = open_all(args.corpus)
+    if args.test:
+        train_corpus, test_corpus = corpus, open_all(args.test)
+    else:
+        train_corpus, test_corpus = corpus.split(args.test_fraction, args.seed)
+
+    if args.model == 'naive_bayes':
+        classifier = NaiveBayes(training_workers=args.workers, features=args.features)
+    else:
+        classifier = LogisticRegression(training_workers=args.workers)
+
+    classifier.execute(train_corpus)
+    print(f"Trained {args.model}; the training results are in training_results.txt")
+    if args.test or args.test_fraction > 0:
+        print(f"Test accuracy: {classifier.test_model(test_corpus, workers=args.workers):.6f}")
+
+
+if __name__ == '__main__':
+    main()
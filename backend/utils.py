@@ -1,11 +1,140 @@
+import functools
+import os
 import re
 import string
 import ssl
-import nltk
+import threading
+from collections import Counter
+from time import perf_counter
 import numpy as np
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
-from nltk.tokenize import TweetTokenizer
+from metrics import observe_stage, stage_timing_enabled
+
+
+def _punctuation_substrings():
+    """
+    Build the set of all substrings of string.punctuation.
+    The original filter used "word not in string.punctuation", which is a substring test on a str object, so tokens such as "()" or "..." are
+    filtered only when they appear contiguously in string.punctuation. Precomputing every substring keeps that exact behaviour with an O(1) set
+    lookup.
+    :return frozenset: All substrings (including the empty one) of string.punctuation
+    """
+    punctuation = string.punctuation
+    return frozenset(punctuation[i:j] for i in range(len(punctuation) + 1) for j in range(i, len(punctuation) + 1))
+
+
+class Preprocessor:
+    """
+    Reusable preprocessing engine; all resources (compiled patterns, tokenizer, stopword set, stemmer) are built once, and stems are memoized in
+    a bounded LRU cache. The output is token-for-token identical to the original per-call implementation of preprocess_text.
+    """
+
+    def __init__(self, stem_cache_size=65536, stop_words=None):
+        """
+        :param int stem_cache_size: Maximum number of distinct words whose stems are kept in memory
+        :param stop_words: Optional iterable of stop words; defaults to the NLTK English stopword corpus
+        """
+        # NLTK takes a large part of the startup time -> It is only imported when the first preprocessor is built (see warm_up in main)
+        from nltk.corpus import stopwords
+        from nltk.stem import PorterStemmer
+        from nltk.tokenize import TweetTokenizer
+
+        # Remove Twitter Stock Market Tickers like $GE
+        self.__ticker_pattern = re.compile(r'\$\w*')
+
+        # Remove Retweet text like "RT"
+        self.__retweet_pattern = re.compile(r'^RT[\s]+')
+
+        # Remove Hyperlinks
+        self.__hyperlink_pattern = re.compile(r'https?:\/\/.*[\r\n]*')
+
+        # Remove the Hashtag symbol -> Hashtag keywords are still kept, only # symbol is removed
+        self.__hashtag_pattern = re.compile(r'#')
+
+        # Use the Tweet Tokenizer to split the text into tokens
+        #       - preserve_case: Flag indicating whether to preserve the capitalisation of the text
+        #       - strip_handles: Flag indicating whether to remove Twitter handles in the text
+        #       - reduce_len: Flag indicating whether to replace repeated character sequences of length 3 or greater with sequences of length 3
+        self.__tokenizer = TweetTokenizer(preserve_case=False, strip_handles=True, reduce_len=True)
+
+        if stop_words is None:
+            stop_words = stopwords.words('english')
+
+        # Stop words and punctuation are merged into a single set, so that each token is checked with one hash lookup
+        self.__ignored_tokens = frozenset(stop_words) | _punctuation_substrings()
+
+        # The stemmer is deterministic, so the stem of each word only needs to be computed once
+        self.__stem = functools.lru_cache(maxsize=stem_cache_size)(PorterStemmer().stem)
+
+    def clean(self, text):
+        """
+        Remove Stock Market Tickers, Retweet marks, Hyperlinks and Hashtag symbols from the text
+        :param string text: The text to be cleaned
+        :return string: The cleaned text
+        """
+        text = self.__ticker_pattern.sub('', text)
+        text = self.__retweet_pattern.sub('', text)
+        text = self.__hyperlink_pattern.sub('', text)
+        return self.__hashtag_pattern.sub('', text)
+
+    def preprocess(self, text):
+        """
+        Preprocess the given text, removing URLs, Links, Retweets and Hashtags, ignoring stopwords and punctuation, and stemming each word
+        :param string text: The text to be preprocessed
+        :return []: A list of all tokens from the input string
+        """
+        # Outside of requests (training, evaluation, benchmarks), the stages are not timed
+        if not stage_timing_enabled():
+            return self.__filter_and_stem(self.__tokenizer.tokenize(self.clean(text)))
+
+        start = perf_counter()
+        text = self.clean(text)
+        cleaned = perf_counter()
+        text_tokens = self.__tokenizer.tokenize(text)
+        tokenized = perf_counter()
+        text_clean = self.__filter_and_stem(text_tokens)
+
+        observe_stage('clean', cleaned - start)
+        observe_stage('tokenize', tokenized - cleaned)
+        observe_stage('stem', perf_counter() - tokenized)
+        return text_clean
+
+    def __filter_and_stem(self, text_tokens):
+        # Remove stop words and punctuation
+        ignored_tokens = self.__ignored_tokens
+        stem = self.__stem
+        return [stem(word) for word in text_tokens if word not in ignored_tokens]
+
+    def stem_cache_info(self):
+        """
+        :return: The hit / miss / size statistics of the stem memo
+        """
+        return self.__stem.cache_info()
+
+
+_default_preprocessor = None
+_default_preprocessor_lock = threading.Lock()
+
+
+def get_default_preprocessor():
+    """
+    :return Preprocessor: The process-wide preprocessor, created on first use
+    """
+    global _default_preprocessor
+    if _default_preprocessor is None:
+        with _default_preprocessor_lock:
+            if _default_preprocessor is None:
+                _default_preprocessor = Preprocessor()
+    return _default_preprocessor
+
+
+def set_default_preprocessor(preprocessor):
+    """
+    Replace the process-wide preprocessor (e.g. with one using a custom stopword list)
+    :param Preprocessor preprocessor: The preprocessor to be used by preprocess_text
+    """
+    global _default_preprocessor
+    with _default_preprocessor_lock:
+        _default_preprocessor = preprocessor
 
 
 def preprocess_text(text):
@@ -14,35 +143,23 @@ def preprocess_text(text):
     :param string text: The text to be preprocessed
     :return []: A list of all tokens from the input string
     """
-    # Remove Twitter Stock Market Tickers like $GE
-    text = re.sub(r'\$\w*', '', text)
-
-    # Remove Retweet text like "RT"
-    text = re.sub(r'^RT[\s]+', '', text)
-
-    # Remove Hyperlinks
-    text = re.sub(r'https?:\/\/.*[\r\n]*', '', text)
+    return get_default_preprocessor().preprocess(text)
 
-    # Remove the Hashtag symbol -> Hashtag keywords are still kept, only # symbol is removed
-    text = re.sub(r'#', '', text)
 
-    # Use the Tweet Tokenizer to split the text into tokens
-    #       - preserve_case: Flag indicating whether to preserve the capitalisation of the text
-    #       - strip_handles: Flag indicating whether to remove Twitter handles in the text
-    #       - reduce_len: Flag indicating whether to replace repeated character sequences of length 3 or greater with sequences of length 3
-    tokenizer = TweetTokenizer(preserve_case=False, strip_handles=True, reduce_len=True)
-    text_tokens = tokenizer.tokenize(text)
+# Spellings of the labels accepted from corpus files and from the feedback endpoint, compared in lower case
+_LABELS = {'1': 1.0, '0': 0.0, 'positive': 1.0, 'negative': 0.0, 'pos': 1.0, 'neg': 0.0, 'true': 1.0, 'false': 0.0}
 
-    stopwords_english = stopwords.words('english')
-    stemmer = PorterStemmer()
 
-    # Remove stop words and punctuation
-    text_clean = []
-    for word in text_tokens:
-        if word not in stopwords_english and word not in string.punctuation:
-            text_clean.append(stemmer.stem(word))
-
-    return text_clean
+def parse_label(value):
+    """
+    :param value: 1, 0, True, False, or one of the strings "1", "0", "positive", "negative", "pos", "neg", "true", "false" (in any case)
+    :return float: 1.0 for a positive label, 0.0 for a negative one
+    """
+    if isinstance(value, (bool, int, float)) and value in (0, 1):
+        return float(value)
+    if isinstance(value, str) and value.strip().lower() in _LABELS:
+        return _LABELS[value.strip().lower()]
+    raise ValueError(f"Invalid label {value!r}, expected 1, 0, 'POSITIVE', 'NEGATIVE' or one of {sorted(_LABELS)}")
 
 
 def download_nltk_samples():
@@ -59,29 +176,121 @@ def download_nltk_samples():
     else:
         ssl._create_default_https_context = _create_unverified_https_context
 
+    import nltk
     nltk.download('twitter_sample')
     nltk.download('stopwords')
 
 
-def build_word_freq_dict(texts, labels):
+def twitter_sample_tweets():
     """
-    Take a list of texts, clean all of them through the preprocessing function, and return a frequency dictionary for all the words
-    :param texts: A list of texts to be processed
-    :param labels:  A list corresponding to the sentiment of each text (0 for negative and 1 for positive)
-    :return: A dictionary mapping each pair (word, label) to its frequency
+    Training and testing only: the NLTK corpus readers are imported on first use, so that serving predictions never loads them
+    :return: positive_tweets: The list of positive tweets of the NLTK Twitter sample
+             negative_tweets: The list of negative tweets of the NLTK Twitter sample
+    """
+    from nltk.corpus import twitter_samples
+    return twitter_samples.strings('positive_tweets.json'), twitter_samples.strings('negative_tweets.json')
+
+
+def _count_shard(shard):
     """
+    Preprocess one shard of the corpus and count its (word, label) pairs; executed inside the worker processes of preprocess_corpus
+    :param shard: A pair (texts, labels)
+    :return: token_lists: The preprocessed tokens of every text in the shard
+             word_freqs: A Counter mapping each pair (word, label) to its frequency in the shard
+    """
+    texts, labels = shard
+    token_lists = [preprocess_text(text) for text in texts]
+
+    word_freqs = Counter()
+    for label, tokens in zip(labels, token_lists):
+        word_freqs.update([(word, label) for word in tokens])
+
+    return token_lists, word_freqs
+
+
+def _merge_shards(results):
+    # The shards are merged in corpus order, so the resulting dictionary has the same key order as a serial pass over the corpus
+    token_lists = []
+    word_freqs = Counter()
+    for shard_token_lists, shard_word_freqs in results:
+        token_lists.extend(shard_token_lists)
+        word_freqs.update(shard_word_freqs)
+    return token_lists, word_freqs
 
+
+def preprocess_corpus(texts, labels, workers=None, chunk_size=500):
+    """
+    Preprocess a whole training corpus once, splitting it into shards which are processed by a pool of worker processes
+    :param texts: A list of texts to be processed
+    :param labels: A list corresponding to the sentiment of each text (0 for negative and 1 for positive)
+    :param int workers: The number of worker processes; defaults to the number of CPUs, and 1 processes the corpus in the current process
+    :param int chunk_size: The number of texts in each shard
+    :return: token_lists: The preprocessed tokens of every text, in the order of the input, so they can be reused for feature extraction
+             word_freqs: A dictionary mapping each pair (word, label) to its frequency
+    """
     # Convert NP Array to List since the ZIP function requires an iterable structure
-    labels_list = np.squeeze(labels).tolist()
-
-    # Start with an empty dictionary and populate it by looping over the all the texts in the list, and then in every word from each text
-    word_freqs = {}
-    for label, text in zip(labels_list, texts):
-        for word in preprocess_text(text):
-            pair = (word, label)
-            if pair in word_freqs:
-                word_freqs[pair] += 1
-            else:
-                word_freqs[pair] = 1
-
-    return word_freqs
+    labels_list = np.reshape(labels, -1).tolist()
+
+    shards = [(texts[i:i + chunk_size], labels_list[i:i + chunk_size]) for i in range(0, len(texts), chunk_size)]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(shards))
+
+    if workers <= 1:
+        results = map(_count_shard, shards)
+        token_lists, word_freqs = _merge_shards(results)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            token_lists, word_freqs = _merge_shards(executor.map(_count_shard, shards))
+
+    return token_lists, dict(word_freqs)
+
+
+def map_bounded(function, items, workers=None, initializer=None, initargs=(), max_pending=None):
+    """
+    Apply a function to the items of an iterable in a pool of worker processes. Unlike Executor.map, which consumes the whole iterable before
+    returning, at most max_pending items are submitted ahead of the results, so an iterable streamed from disk is never held in memory at once.
+    :param function: A module-level function, called with one item
+    :param items: An iterable of picklable items
+    :param int workers: The number of worker processes; defaults to the number of CPUs, and 1 applies the function in the current process
+    :param initializer: A function called once in each worker (and in the current process when workers is 1) before the first item
+    :param initargs: The arguments of the initializer
+    :param int max_pending: The maximum number of items submitted but not yet returned; defaults to twice the number of workers
+    :return: A generator of the results, in the order of the items
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from map(function, items)
+        return
+
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    max_pending = max_pending or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def build_word_freq_dict(texts, labels=None, workers=1):
+    """
+    Take a list of texts, clean all of them through the preprocessing function, and return a frequency dictionary for all the words
+    :param texts: A list of texts to be processed, or a CorpusReader whose texts are counted in a streaming pass (see count_corpus)
+    :param labels:  A list corresponding to the sentiment of each text (0 for negative and 1 for positive); not used with a CorpusReader
+    :param int workers: The number of worker processes used for preprocessing (see preprocess_corpus)
+    :return: A dictionary mapping each pair (word, label) to its frequency
+    """
+    from corpus_readers import CorpusReader, count_corpus
+    if isinstance(texts, CorpusReader):
+        return count_corpus(texts, workers=workers)[0].to_freq_dict()
+    return preprocess_corpus(texts, labels, workers=workers)[1]
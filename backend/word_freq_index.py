@@ -0,0 +1,323 @@
+import glob
+import hashlib
+import os
+import time
+import numpy as np
+from model_store import save_model, load_model, encode_strings, decode_strings, ModelFormatError
+
+# The vocabulary artifacts are named after a digest of their content (vocabulary and word counts): classifiers trained on the same corpus share
+# one file, and retraining one classifier writes a new file, without changing the vocabulary the other classifier was trained on
+VOCABULARY_FILE_PATTERN = "vocabulary.{digest}.model"
+
+# Seconds a vocabulary artifact which no parameter artifact references is kept: a training run writes its vocabulary before its parameters
+UNUSED_VOCABULARY_GRACE_PERIOD = 3600
+
+
+def vocabulary_file(parameters_path, metadata):
+    """
+    :param string parameters_path: The path of the parameter artifact of a classifier
+    :param metadata: The metadata of the parameter artifact
+    :return string: The path of the vocabulary artifact the parameters were trained on
+    """
+    name = metadata.get('vocabulary_file')
+    if not name:
+        raise ModelFormatError(f"'{parameters_path}' does not name the vocabulary artifact it was trained on; retrain the model")
+    return os.path.join(os.path.dirname(parameters_path), name)
+
+
+def remove_unused_vocabularies(directory='.', grace_period=UNUSED_VOCABULARY_GRACE_PERIOD):
+    """
+    Remove the vocabulary artifacts of a directory which no parameter artifact references anymore (e.g. after a retraining or a snapshot)
+    :param string directory: The directory of the model artifacts
+    :param grace_period: Seconds an unreferenced vocabulary artifact is kept after it was written
+    :return: The list of removed artifacts
+    """
+    vocabularies = set(glob.glob(os.path.join(directory, VOCABULARY_FILE_PATTERN.format(digest='*'))))
+    referenced = set()
+    for path in set(glob.glob(os.path.join(directory, '*.model'))) - vocabularies:
+        try:
+            referenced.add(load_model(path).metadata.get('vocabulary_file'))
+        except (OSError, ModelFormatError):
+            # An artifact which cannot be read (e.g. being replaced) might reference any of the vocabularies -> keep them all
+            return []
+
+    removed = []
+    now = time.time()
+    for path in sorted(vocabularies):
+        if os.path.basename(path) in referenced:
+            continue
+        try:
+            if now - os.path.getmtime(path) > grace_period:
+                os.remove(path)
+                removed.append(path)
+        except FileNotFoundError:
+            # Removed meanwhile by another process
+            pass
+    return removed
+
+
+class WordFreqIndex:
+    """
+    Compact representation of a word frequency dictionary: a vocabulary index mapping each word to an integer id, plus contiguous numpy arrays
+    holding the positive and negative count of every word. Feature extraction becomes an array gather over the ids of the tokens of a text.
+    """
+
+    def __init__(self, words=(), pos_counts=None, neg_counts=None):
+        """
+        :param words: The vocabulary, in id order
+        :param pos_counts: The number of times each word appears in positive texts
+        :param neg_counts: The number of times each word appears in negative texts
+        """
+        self.__words = list(words)
+
+        # The mapping word -> id is built on the first lookup; an index opened from a model artifact only decodes its string table at that point
+        self.__ids = None
+        self.__string_table = None
+        self.__checksum = None
+
+        vocab_size = len(self.__words)
+        self.__pos_counts = np.zeros(vocab_size, dtype=np.int64) if pos_counts is None else np.asarray(pos_counts, dtype=np.int64)
+        self.__neg_counts = np.zeros(vocab_size, dtype=np.int64) if neg_counts is None else np.asarray(neg_counts, dtype=np.int64)
+
+    @classmethod
+    def from_freq_dict(cls, word_freqs):
+        """
+        :param word_freqs: A dictionary mapping each pair (word, label) to its frequency, as returned by build_word_freq_dict
+        :return WordFreqIndex: The equivalent index
+        """
+        words = list(dict.fromkeys(pair[0] for pair in word_freqs.keys()))
+        index = cls(words)
+        ids = index.__vocabulary()
+
+        for (word, label), freq in word_freqs.items():
+            word_id = ids[word]
+            # A label greater than 0 marks a positive text, otherwise the text is negative
+            if label > 0:
+                index.__pos_counts[word_id] += freq
+            else:
+                index.__neg_counts[word_id] += freq
+
+        return index
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Open an index saved with save(); the count arrays are memory-mapped and the vocabulary is only decoded on the first lookup
+        :param string path: The path of the model artifact
+        :param bool mmap: Flag indicating whether to memory-map the artifact
+        :return WordFreqIndex: The index
+        """
+        artifact = load_model(path, mmap=mmap)
+        if artifact.metadata.get('kind') != 'word_freqs':
+            raise ModelFormatError(f"'{path}' does not contain a word frequency index")
+
+        index = cls(pos_counts=artifact['pos_counts'], neg_counts=artifact['neg_counts'])
+        index.__string_table = (artifact['vocab_offsets'], artifact['vocab_data'])
+        index.__checksum = artifact.metadata['vocab_checksum']
+        return index
+
+    def save(self, path):
+        """
+        Write the index into a model artifact: the vocabulary as a string table, and the count arrays
+        :param string path: The path of the model artifact
+        :return string: The checksum of the vocabulary, used by the classifier parameters to check they were trained on the same vocabulary
+        """
+        offsets, data = encode_strings(self.words)
+        arrays = {'vocab_offsets': offsets, 'vocab_data': data, 'pos_counts': self.__pos_counts, 'neg_counts': self.__neg_counts}
+        save_model(path, arrays, {'kind': 'word_freqs', 'vocab_checksum': self.checksum})
+        return self.checksum
+
+    def save_shared(self, directory='.'):
+        """
+        Write the index into the vocabulary artifact named after its content, unless a classifier already wrote the same one
+        :param string directory: The directory of the model artifacts
+        :return string: The file name of the vocabulary artifact, recorded in the parameter artifact of the classifier
+        """
+        name = VOCABULARY_FILE_PATTERN.format(digest=self.content_digest)
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            # Refresh the modification time, so that the artifact is not removed as unused before the new parameters reference it
+            os.utime(path)
+        else:
+            self.save(path)
+        return name
+
+    @property
+    def content_digest(self):
+        """
+        :return string: A digest of the vocabulary and of the word counts
+        """
+        digest = hashlib.blake2b(self.checksum.encode('ascii'), digest_size=16)
+        digest.update(np.ascontiguousarray(self.__pos_counts, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(self.__neg_counts, dtype=np.int64).tobytes())
+        return digest.hexdigest()
+
+    @property
+    def checksum(self):
+        """
+        :return string: A digest of the vocabulary, identifying the order of the word ids
+        """
+        if self.__checksum is None:
+            offsets, data = encode_strings(self.words)
+            self.__checksum = hashlib.blake2b(offsets.tobytes() + data.tobytes(), digest_size=16).hexdigest()
+        return self.__checksum
+
+    def __vocabulary(self):
+        if self.__ids is None:
+            if self.__string_table is not None:
+                self.__words = decode_strings(*self.__string_table)
+                self.__string_table = None
+            self.__ids = {word: word_id for word_id, word in enumerate(self.__words)}
+        return self.__ids
+
+    def to_freq_dict(self):
+        """
+        :return: A dictionary mapping each pair (word, label) to its frequency, only containing the pairs with a non-zero frequency
+        """
+        word_freqs = {}
+        for word, pos_count, neg_count in zip(self.words, self.__pos_counts.tolist(), self.__neg_counts.tolist()):
+            if pos_count:
+                word_freqs[(word, 1.0)] = pos_count
+            if neg_count:
+                word_freqs[(word, 0.0)] = neg_count
+        return word_freqs
+
+    def __len__(self):
+        return self.__pos_counts.shape[0]
+
+    @property
+    def vocabulary_size(self):
+        """
+        :return: The number of words in the vocabulary (the Laplace smoothing of the classifiers counts every word once)
+        """
+        return len(self)
+
+    def __contains__(self, word):
+        return word in self.__vocabulary()
+
+    @property
+    def words(self):
+        self.__vocabulary()
+        return self.__words
+
+    @property
+    def pos_counts(self):
+        return self.__pos_counts
+
+    @property
+    def neg_counts(self):
+        return self.__neg_counts
+
+    def pair_count(self):
+        """
+        :return: The number of (word, label) pairs with a non-zero frequency, i.e. the size of the equivalent frequency dictionary
+        """
+        return int(np.count_nonzero(self.__pos_counts) + np.count_nonzero(self.__neg_counts))
+
+    def word_id(self, word):
+        """
+        :return: The id of the word, or None when the word is not in the vocabulary
+        """
+        return self.__vocabulary().get(word)
+
+    def unseen_words(self, token_lists):
+        """
+        :param token_lists: A list of lists of preprocessed tokens
+        :return: The tokens which are not part of the vocabulary, in the order in which update() assigns them their ids
+        """
+        ids = self.__vocabulary()
+        return list(dict.fromkeys(token for tokens in token_lists for token in tokens if token not in ids))
+
+    def update(self, token_lists, labels):
+        """
+        Add the tokens of new labelled texts to the counts, extending the vocabulary with the words seen for the first time.
+        Concurrent readers always see a consistent index: the count arrays are extended before the new words are given their ids, so every id
+        returned by a lookup is valid in the arrays. Memory-mapped (read-only) counts are copied into memory on the first update.
+        :param token_lists: A list of lists of preprocessed tokens
+        :param labels: A list corresponding to the sentiment of each text (0 for negative and 1 for positive)
+        :return: The ids of the words whose counts changed
+        """
+        ids = self.__vocabulary()
+        new_words = self.unseen_words(token_lists)
+        new_ids = {word: len(self.__words) + i for i, word in enumerate(new_words)}
+
+        token_ids = []
+        positive = []
+        for tokens, label in zip(token_lists, np.reshape(labels, -1).tolist()):
+            for token in tokens:
+                word_id = ids.get(token)
+                token_ids.append(word_id if word_id is not None else new_ids[token])
+                positive.append(label > 0)
+        token_ids = np.array(token_ids, dtype=np.intp)
+        positive = np.array(positive, dtype=bool)
+
+        pos_counts = self.__pos_counts
+        neg_counts = self.__neg_counts
+        if new_words or not pos_counts.flags.writeable:
+            pos_counts = np.concatenate([pos_counts, np.zeros(len(new_words), dtype=np.int64)])
+            neg_counts = np.concatenate([neg_counts, np.zeros(len(new_words), dtype=np.int64)])
+
+        np.add.at(pos_counts, token_ids[positive], 1)
+        np.add.at(neg_counts, token_ids[~positive], 1)
+        self.__pos_counts = pos_counts
+        self.__neg_counts = neg_counts
+
+        # Publish the new words only now that the arrays are large enough for their ids; the vocabulary changed, so its checksum is recomputed
+        if new_words:
+            self.__words.extend(new_words)
+            ids.update(new_ids)
+            self.__checksum = None
+
+        return np.unique(token_ids)
+
+    def feature_ids(self, tokens):
+        """
+        :param tokens: A list of preprocessed tokens
+        :return: A list of pairs (token, id), the id being None for the tokens which are not part of the vocabulary
+        """
+        ids = self.__vocabulary()
+        return [(token, ids.get(token)) for token in tokens]
+
+    def token_ids(self, tokens):
+        """
+        :param tokens: A list of preprocessed tokens
+        :return: The ids of the tokens which are part of the vocabulary (out-of-vocabulary tokens are skipped), in order
+        """
+        ids = self.__vocabulary()
+        return np.fromiter((ids[token] for token in tokens if token in ids), dtype=np.intp)
+
+    def batch_token_ids(self, token_lists):
+        """
+        :param token_lists: A list of lists of preprocessed tokens
+        :return: ids: The ids of all in-vocabulary tokens, concatenated
+                 rows: The position in token_lists of the text each id belongs to
+        """
+        ids = self.__vocabulary()
+        flat_ids = []
+        rows = []
+        for row, tokens in enumerate(token_lists):
+            for token in tokens:
+                word_id = ids.get(token)
+                if word_id is not None:
+                    flat_ids.append(word_id)
+                    rows.append(row)
+        return np.array(flat_ids, dtype=np.intp), np.array(rows, dtype=np.intp)
+
+    def features(self, tokens):
+        """
+        :param tokens: A list of preprocessed tokens
+        :return: The total positive and the total negative frequency of the tokens
+        """
+        token_ids = self.token_ids(tokens)
+        return float(self.__pos_counts[token_ids].sum()), float(self.__neg_counts[token_ids].sum())
+
+    def batch_features(self, token_lists):
+        """
+        :param token_lists: A list of lists of preprocessed tokens
+        :return: A matrix of dimension (len(token_lists), 2) with the total positive and negative frequency of the tokens of each text
+        """
+        token_ids, rows = self.batch_token_ids(token_lists)
+        features = np.zeros((len(token_lists), 2))
+        features[:, 0] = np.bincount(rows, weights=self.__pos_counts[token_ids], minlength=len(token_lists))
+        features[:, 1] = np.bincount(rows, weights=self.__neg_counts[token_ids], minlength=len(token_lists))
+        return features
@@ -0,0 +1,8 @@
+"""
+WSGI entry point for external servers, e.g.:  gunicorn --preload --workers 4 wsgi:app
+Both models are served; the default one is selected through the SENTIMENT_MODEL environment variable (logistic_regression or naive_bayes).
+"""
+from main import create_app, warm_up
+
+app = create_app()
+warm_up(app.config['MODEL_REGISTRY'])